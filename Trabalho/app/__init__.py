@@ -1,35 +1,79 @@
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager
 import click
 from getpass import getpass
 import os 
+from .config import configs
+from . import database
+from .caching import Cache
+from .live import Broker
+from .metrics import Metricas
+from .passwords import Senhas
+from .ratelimit import Limitador
+from .tenancy import Organizacoes
 
-db = SQLAlchemy()
+db = database.BancoDeDados()
 bcrypt = Bcrypt()
 login_manager = LoginManager()
+cache = Cache()
+broker = Broker()
+metricas = Metricas()
+senhas = Senhas()
+limitador = Limitador()
+organizacoes = Organizacoes()
 login_manager.login_view = 'main.login'
 login_manager.login_message_category = 'info'
 login_manager.login_message = 'Por favor, faça login para acessar esta página.'
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
-    app.config['SECRET_KEY'] = 'chave-super-secreta'
-    
-    basedir = os.path.abspath(os.path.dirname(__file__))
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'site.db')
+
+    if config is None:
+        config = os.environ.get('SIGTO_CONFIG', 'development')
+    if isinstance(config, str):
+        config = configs[config]
+    app.config.from_object(config)
+    app.config.from_prefixed_env('SIGTO')
+
+    engine_options = database.opcoes_engine(app.config)
+    engine_options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
 
     db.init_app(app)
     bcrypt.init_app(app)
     login_manager.init_app(app)
+    cache.init_app(app)
+    broker.init_app(app)
+    metricas.init_app(app)
+    senhas.init_app(app)
+    limitador.init_app(app)
     
     with app.app_context():
-        from . import models  
+        from . import models, auth, tarefas
+        from .jobs import fila
+        fila.init_app(app)
+        organizacoes.init_app(app, db)
+        cache.espaco = broker.espaco = organizacoes.espaco
+        database.configurar_engine(db.catalogo, app.config)
+        if app.config['METRICAS_ATIVAS']:
+            metricas.instrumentar_engine(db.catalogo)
 
     from .routes import main
     app.register_blueprint(main)
 
+    from .api import api
+    app.register_blueprint(api)
+
+    from .metrics import painel
+    app.register_blueprint(painel)
+
+    from .serving import configurar_estaticos
+    configurar_estaticos(app)
+
+    from .commands import register_commands
+    register_commands(app)
+
     @app.cli.command('create-admin')
     def create_admin_command():
 
@@ -52,7 +96,7 @@ def create_app():
             return
 
         try:
-            hashed_password = bcrypt.generate_password_hash(password_str).decode('utf-8')
+            hashed_password = senhas.gerar_hash(password_str)
             admin_user = Usuario(
                 nome=nome,
                 email=email,
@@ -61,6 +105,9 @@ def create_app():
             )
             db.session.add(admin_user)
             db.session.commit()
+            organizacao = organizacoes.atual()
+            if organizacao.supremo_id is None:
+                organizacoes.definir_supremo(organizacao.id, admin_user.id)
             print(f"\nSucesso! Administrador '{nome}' criado com o email '{email}'.")
         
         except Exception as e:
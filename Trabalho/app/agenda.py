@@ -0,0 +1,159 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload
+from . import db
+from .models import Jogo
+
+FEED_DIAS_PASSADOS = 30
+MAX_CONFLITOS = 5
+
+
+def janela():
+    return timedelta(minutes=current_app.config['AGENDA_JANELA_MINUTOS'])
+
+
+def _do_time(time_ids):
+    return or_(Jogo.time_casa_id.in_(time_ids), Jogo.time_visitante_id.in_(time_ids))
+
+
+def conflitos(time_ids, data_hora, ignorar_id=None):
+    # Cada jogo ocupa [data_hora, data_hora + janela): dois jogos se sobrepõem quando as datas
+    # distam menos que a janela, então basta um intervalo nos índices (time, data_hora).
+    time_ids = list(set(time_ids))
+    consulta = db.select(Jogo.id, Jogo.data_hora, Jogo.time_casa_id, Jogo.time_visitante_id).where(
+        _do_time(time_ids),
+        Jogo.data_hora > data_hora - janela(),
+        Jogo.data_hora < data_hora + janela(),
+    )
+    if ignorar_id is not None:
+        consulta = consulta.where(Jogo.id != ignorar_id)
+    return db.session.execute(consulta.order_by(Jogo.data_hora).limit(MAX_CONFLITOS)).all()
+
+
+def conflitos_lote(jogos):
+    limite = janela()
+    por_time = defaultdict(list)
+    for numero, jogo in jogos:
+        for campo in ('time_casa_id', 'time_visitante_id'):
+            por_time[jogo[campo]].append((jogo['data_hora'], numero))
+
+    erros = {}
+    for time_id, agenda in por_time.items():
+        agenda.sort()
+        existentes = db.session.execute(
+            db.select(Jogo.data_hora).where(
+                _do_time([time_id]),
+                Jogo.data_hora > agenda[0][0] - limite,
+                Jogo.data_hora < agenda[-1][0] + limite,
+            ).order_by(Jogo.data_hora)
+        ).scalars().all()
+
+        for posicao, (data_hora, numero) in enumerate(agenda):
+            if posicao and data_hora - agenda[posicao - 1][0] < limite:
+                erros.setdefault(numero, f'Time {time_id} tem outro jogo do arquivo em '
+                                         f'{agenda[posicao - 1][0]:%d/%m/%Y %H:%M}.')
+            vizinho = bisect_right(existentes, data_hora - limite)
+            if vizinho < len(existentes) and existentes[vizinho] < data_hora + limite:
+                erros.setdefault(numero, f'Time {time_id} já tem jogo em {existentes[vizinho]:%d/%m/%Y %H:%M}.')
+    return sorted(erros.items())
+
+
+def intervalo(de=None, ate=None, padrao_dias=7):
+    de = de or date.today()
+    ate = ate or de + timedelta(days=padrao_dias - 1)
+    maximo = current_app.config['AGENDA_MAX_DIAS']
+    if ate < de:
+        raise ValueError('A data final é anterior à inicial.')
+    if (ate - de).days >= maximo:
+        raise ValueError(f'Intervalo maior que {maximo} dias.')
+    return de, ate
+
+
+def jogos(de, ate, time_id=None, campeonato_id=None):
+    limite = current_app.config['AGENDA_MAX_JOGOS']
+    consulta = Jogo.query.filter(
+        Jogo.data_hora >= datetime.combine(de, datetime.min.time()),
+        Jogo.data_hora < datetime.combine(ate + timedelta(days=1), datetime.min.time()),
+    )
+    if time_id is not None:
+        consulta = consulta.filter(_do_time([time_id]))
+    if campeonato_id is not None:
+        consulta = consulta.filter(Jogo.campeonato_id == campeonato_id)
+
+    resultado = consulta.options(
+        joinedload(Jogo.campeonato),
+        joinedload(Jogo.time_casa),
+        joinedload(Jogo.time_visitante),
+    ).order_by(Jogo.data_hora, Jogo.id).limit(limite + 1).all()
+    return resultado[:limite], len(resultado) > limite
+
+
+def dominio_ical():
+    # O UID dos eventos não pode depender do host que atendeu o pedido, senão cada proxy duplica o calendário.
+    dominio = current_app.config.get('AGENDA_ICAL_DOMINIO') or current_app.config.get('SERVER_NAME') or 'sigto'
+    return dominio.split(':')[0]
+
+
+def intervalo_do_feed():
+    de = date.today() - timedelta(days=FEED_DIAS_PASSADOS)
+    return de, de + timedelta(days=current_app.config['AGENDA_MAX_DIAS'] - 1)
+
+
+def _texto(valor):
+    return (str(valor).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _dobrar(linha):
+    if len(linha.encode('utf-8')) <= 75:
+        return linha
+    partes, atual = [], ''
+    for caractere in linha:
+        if len((atual + caractere).encode('utf-8')) > (75 if not partes else 74):
+            partes.append(atual)
+            atual = ''
+        atual += caractere
+    partes.append(atual)
+    return '\r\n '.join(partes)
+
+
+def _data(valor):
+    return valor.strftime('%Y%m%dT%H%M%S')
+
+
+def _utc(valor):
+    return valor.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def icalendar(nome, lista, dominio):
+    agora = _utc(datetime.now())
+    duracao = janela()
+    linhas = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//SIGTO//Agenda de Jogos//PT-BR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_texto(nome)}',
+    ]
+    for jogo in lista:
+        resumo = f'{jogo.time_casa.nome} x {jogo.time_visitante.nome}'
+        if jogo.status != 'Agendado':
+            resumo = f'{jogo.time_casa.nome} {jogo.placar_casa} x {jogo.placar_visitante} {jogo.time_visitante.nome}'
+        linhas += [
+            'BEGIN:VEVENT',
+            f'UID:jogo-{jogo.id}@{dominio}',
+            f'DTSTAMP:{agora}',
+            f'DTSTART:{_data(jogo.data_hora)}',
+            f'DTEND:{_data(jogo.data_hora + duracao)}',
+            f'LAST-MODIFIED:{_utc(jogo.atualizado_em)}',
+            f'SEQUENCE:{jogo.versao}',
+            f'SUMMARY:{_texto(resumo)}',
+            f'DESCRIPTION:{_texto(f"{jogo.campeonato.nome} - {jogo.status}")}',
+            'END:VEVENT',
+        ]
+    linhas.append('END:VCALENDAR')
+    return ''.join(_dobrar(linha) + '\r\n' for linha in linhas)
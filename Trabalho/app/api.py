@@ -0,0 +1,290 @@
+import json
+from datetime import date, datetime
+from flask import Blueprint, request, abort, current_app, stream_with_context
+from flask_login import current_user
+from sqlalchemy.orm import aliased
+from .models import Time, Campeonato, Jogo
+from .decorators import e_admin
+from . import db, cache, standings, queries, historico, busca, estatisticas, eventos, agenda
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+TIMES_POR_PAGINA = 100
+TAMANHO_LOTE_EXPORTACAO = 1000
+
+
+def _serializar_valor(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f'Tipo não serializável: {type(valor).__name__}')
+
+
+def _dumps(dados):
+    return json.dumps(dados, separators=(',', ':'), ensure_ascii=False, default=_serializar_valor)
+
+
+def _campos():
+    campos = request.args.get('campos')
+    return {campo.strip() for campo in campos.split(',') if campo.strip()} if campos else None
+
+
+def _selecionar(item, campos):
+    if campos is None:
+        return item
+    return {chave: valor for chave, valor in item.items() if chave in campos}
+
+
+def _resposta(dados, status=200):
+    return current_app.response_class(_dumps(dados), status=status, mimetype='application/json')
+
+
+def _lista(itens, **extras):
+    campos = _campos()
+    return _resposta(dict(dados=[_selecionar(item, campos) for item in itens], **extras))
+
+
+def _item(item):
+    return _resposta(_selecionar(item, _campos()))
+
+
+def serializar_campeonato(campeonato):
+    return {
+        'id': campeonato.id,
+        'nome': campeonato.nome,
+        'data_inicio': campeonato.data_inicio,
+        'data_fim': campeonato.data_fim,
+        'regras': campeonato.regras,
+        'pontuacao': standings.pontuacao(campeonato)._asdict(),
+        'criterios_desempate': ['pontos', *standings.criterios(campeonato)],
+    }
+
+
+def serializar_time(time):
+    return {'id': time.id, 'nome': time.nome}
+
+
+def serializar_jogo(jogo):
+    return {
+        'id': jogo.id,
+        'campeonato_id': jogo.campeonato_id,
+        'campeonato': jogo.campeonato.nome,
+        'data_hora': jogo.data_hora,
+        'time_casa_id': jogo.time_casa_id,
+        'time_casa': jogo.time_casa.nome,
+        'time_visitante_id': jogo.time_visitante_id,
+        'time_visitante': jogo.time_visitante.nome,
+        'placar_casa': jogo.placar_casa,
+        'placar_visitante': jogo.placar_visitante,
+        'status': jogo.status,
+    }
+
+
+def _filtros_jogos():
+    return {
+        'campeonato_id': request.args.get('campeonato', type=int),
+        'time_id': request.args.get('time', type=int),
+        'status': request.args.get('status') or None,
+        'data_inicio': request.args.get('de', type=date.fromisoformat),
+        'data_fim': request.args.get('ate', type=date.fromisoformat),
+    }
+
+
+def _tags_jogos():
+    campeonato_id = request.args.get('campeonato', type=int)
+    return [f'campeonato:{campeonato_id}' if campeonato_id is not None else 'jogos', 'campeonatos', 'times']
+
+
+@api.errorhandler(400)
+@api.errorhandler(401)
+@api.errorhandler(404)
+def erro_api(erro):
+    return _resposta({'erro': erro.name, 'descricao': erro.description}, status=erro.code)
+
+
+@api.route('/campeonatos')
+@cache.pagina(tags=lambda: ['campeonatos'])
+def listar_campeonatos():
+    campeonatos = Campeonato.query.order_by(Campeonato.id).all()
+    return _lista(serializar_campeonato(campeonato) for campeonato in campeonatos)
+
+
+@api.route('/campeonatos/<int:id>')
+@cache.pagina(tags=lambda id: [f'campeonato:{id}'])
+def detalhar_campeonato(id):
+    campeonato = Campeonato.query.get_or_404(id)
+    dados = serializar_campeonato(campeonato)
+    dados['times'] = [serializar_time(time) for time in campeonato.times]
+    return _item(dados)
+
+
+@api.route('/campeonatos/<int:id>/tabela')
+@cache.pagina(tags=lambda id: [f'campeonato:{id}'])
+def tabela_campeonato(id):
+    Campeonato.query.get_or_404(id)
+    rodada = request.args.get('rodada', type=int)
+    data = request.args.get('data', type=date.fromisoformat)
+
+    if rodada is not None or data is not None:
+        referencia, tabela = historico.tabela_na_data(id, data, rodada)
+        if referencia is None:
+            abort(404, description='Não há classificação registrada para esta data ou rodada.')
+        return _lista(tabela, **referencia)
+
+    tabela = cache.memorizar(f'tabela:{id}', [f'campeonato:{id}'],
+                             lambda: standings.tabela_serializada(id))
+    return _lista([dict(linha, posicao=posicao) for posicao, linha in enumerate(tabela, start=1)])
+
+
+@api.route('/campeonatos/<int:id>/posicoes')
+@cache.pagina(tags=lambda id: [f'campeonato:{id}'])
+def posicoes_campeonato(id):
+    Campeonato.query.get_or_404(id)
+    time_ids = request.args.getlist('time', type=int)
+    return _resposta(historico.serie_de_posicoes(id, time_ids))
+
+
+@api.route('/times')
+@cache.pagina(tags=lambda: ['times'])
+def listar_times():
+    depois = request.args.get('depois', 0, type=int)
+    limite = max(1, min(request.args.get('limite', TIMES_POR_PAGINA, type=int), TIMES_POR_PAGINA))
+
+    times = Time.query.filter(Time.id > depois).order_by(Time.id).limit(limite + 1).all()
+    proximo = times[limite - 1].id if len(times) > limite else None
+    return _lista((serializar_time(time) for time in times[:limite]), proximo=proximo)
+
+
+@api.route('/times/<int:id>')
+@cache.pagina(tags=lambda id: ['times'])
+def detalhar_time(id):
+    return _item(serializar_time(Time.query.get_or_404(id)))
+
+
+@api.route('/times/<int:id>/estatisticas')
+@cache.pagina(tags=lambda id: ['times', 'campeonatos', 'jogos'])
+def estatisticas_time(id):
+    perfil = estatisticas.perfil_time(id)
+    if perfil is None:
+        abort(404)
+    return _item(perfil)
+
+
+@api.route('/confrontos/<int:time_id>/<int:adversario_id>')
+@cache.pagina(tags=lambda time_id, adversario_id: ['times', 'campeonatos', 'jogos'])
+def confronto(time_id, adversario_id):
+    dados = estatisticas.confronto(time_id, adversario_id)
+    if dados is None or time_id == adversario_id:
+        abort(404)
+    return _item(dados)
+
+
+@api.route('/jogos')
+@cache.pagina(tags=_tags_jogos)
+def listar_jogos():
+    limite = max(1, min(request.args.get('limite', queries.JOGOS_POR_PAGINA, type=int), queries.JOGOS_POR_PAGINA))
+    try:
+        pagina, proximo_cursor = queries.pagina_de_jogos(cursor=request.args.get('cursor'),
+                                                         limite=limite, **_filtros_jogos())
+    except ValueError as erro:
+        abort(400, str(erro))
+
+    return _lista((serializar_jogo(jogo) for jogo in pagina), proximo_cursor=proximo_cursor)
+
+
+@api.route('/jogos/<int:id>')
+@cache.pagina(tags=lambda id: ['jogos', 'times', 'campeonatos'])
+def detalhar_jogo(id):
+    return _item(serializar_jogo(Jogo.query.get_or_404(id)))
+
+
+def _agenda(**filtros):
+    # Sem data padrão: a resposta vai para o cache pela URL e "hoje" muda sem invalidar as tags.
+    de = request.args.get('de', type=date.fromisoformat)
+    if de is None:
+        abort(400, 'Informe a data inicial no parâmetro "de" (AAAA-MM-DD).')
+    try:
+        de, ate = agenda.intervalo(de, request.args.get('ate', type=date.fromisoformat))
+    except ValueError as erro:
+        abort(400, str(erro))
+
+    lista, truncado = agenda.jogos(de, ate, **filtros)
+    return _lista((serializar_jogo(jogo) for jogo in lista), de=de, ate=ate, truncado=truncado)
+
+
+@api.route('/agenda')
+@cache.pagina(tags=lambda: ['jogos', 'times', 'campeonatos'])
+def listar_agenda():
+    return _agenda(campeonato_id=request.args.get('campeonato', type=int),
+                   time_id=request.args.get('time', type=int))
+
+
+@api.route('/times/<int:id>/agenda')
+@cache.pagina(tags=lambda id: ['jogos', 'times', 'campeonatos'])
+def agenda_time(id):
+    Time.query.get_or_404(id)
+    return _agenda(time_id=id)
+
+
+@api.route('/campeonatos/<int:id>/agenda')
+@cache.pagina(tags=lambda id: [f'campeonato:{id}', 'times', 'campeonatos'])
+def agenda_campeonato(id):
+    Campeonato.query.get_or_404(id)
+    return _agenda(campeonato_id=id)
+
+
+@api.route('/busca')
+def buscar():
+    tipos = [tipo for tipo in request.args.getlist('tipo') if tipo in busca.TIPOS] or busca.TIPOS
+    limite = max(1, min(request.args.get('limite', busca.RESULTADOS, type=int), busca.RESULTADOS))
+    resultados = busca.buscar(request.args.get('q', ''), tipos, limite)
+
+    serializadores = {
+        'times': lambda linha: {'id': linha[0], 'nome': linha[1]},
+        'campeonatos': lambda linha: {'id': linha[0], 'nome': linha[1]},
+        'jogos': lambda linha: linha._asdict(),
+    }
+    return _resposta({tipo: [serializadores[tipo](item) for item in itens] for tipo, itens in resultados.items()})
+
+
+@api.route('/jogos/exportar')
+@cache.pagina(tags=_tags_jogos)
+def exportar_jogos():
+    campos = _campos()
+    casa = aliased(Time)
+    visitante = aliased(Time)
+
+    consulta = queries.filtrar_jogos(
+        db.session.query(Jogo.id, Jogo.campeonato_id, Campeonato.nome.label('campeonato'),
+                         Jogo.data_hora, Jogo.time_casa_id, casa.nome.label('time_casa'),
+                         Jogo.time_visitante_id, visitante.nome.label('time_visitante'),
+                         Jogo.placar_casa, Jogo.placar_visitante, Jogo.status),
+        **_filtros_jogos()
+    ).join(Campeonato, Jogo.campeonato_id == Campeonato.id) \
+     .join(casa, Jogo.time_casa_id == casa.id) \
+     .join(visitante, Jogo.time_visitante_id == visitante.id) \
+     .order_by(Jogo.data_hora, Jogo.id) \
+     .execution_options(yield_per=TAMANHO_LOTE_EXPORTACAO)
+
+    def gerar():
+        for linha in consulta:
+            yield _dumps(_selecionar(linha._asdict(), campos)) + '\n'
+
+    return current_app.response_class(stream_with_context(gerar()), mimetype='application/x-ndjson')
+
+
+@api.route('/eventos')
+def listar_eventos():
+    token = current_app.config.get('EVENTOS_TOKEN')
+    if not (token and request.headers.get('Authorization') == f'Bearer {token}') \
+            and not (current_user.is_authenticated and e_admin(current_user)):
+        abort(401)
+
+    desde = request.args.get('desde', 0, type=int)
+    limite = max(1, min(request.args.get('limite', eventos.LOTE, type=int), eventos.LOTE))
+    entidades = [entidade for entidade in request.args.get('entidade', '').split(',') if entidade] or None
+    lote = eventos.ler(desde, limite, entidades, request.args.get('id', type=int))
+
+    resposta = _lista([eventos.serializar(evento) for evento in lote],
+                      cursor=lote[-1].id if lote else desde, mais=len(lote) == limite)
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
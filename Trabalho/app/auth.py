@@ -0,0 +1,71 @@
+import time
+from flask import session, current_app
+from flask_login import UserMixin
+from . import db, cache, login_manager, organizacoes
+from .models import Usuario
+
+
+class Principal(UserMixin):
+
+    def __init__(self, id, nome, role):
+        self.id = id
+        self.nome = nome
+        self.role = role
+
+    def __repr__(self):
+        return f'<Principal {self.id} ({self.role})>'
+
+
+def _tag(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+def _carregar(usuario_id):
+    linha = db.session.execute(
+        db.select(Usuario.id, Usuario.nome, Usuario.role).where(Usuario.id == usuario_id)
+    ).first()
+    return tuple(linha) if linha is not None else None
+
+
+def buscar_principal(usuario_id):
+    dados = cache.memorizar(
+        _tag(usuario_id), [_tag(usuario_id)],
+        lambda: _carregar(usuario_id),
+        ttl=current_app.config['USUARIO_CACHE_TTL']
+    )
+    return Principal(*dados) if dados is not None else None
+
+
+def registrar_sessao(usuario):
+    versao, _ = cache.estado([_tag(usuario.id)])
+    session['principal'] = [usuario.id, usuario.nome, usuario.role, versao, int(time.time()),
+                            organizacoes.atual().id]
+
+
+def invalidar_usuario(usuario_id):
+    cache.invalidar(_tag(usuario_id))
+
+
+def encerrar_sessao():
+    session.pop('principal', None)
+
+
+@login_manager.user_loader
+def carregar_principal(user_id):
+    usuario_id = int(user_id)
+    claim = session.get('principal')
+
+    if claim and claim[0] == usuario_id:
+        if claim[5:] != [organizacoes.atual().id]:
+            return None
+        _, nome, role, versao, emitido_em, _ = claim
+        if time.time() - emitido_em < current_app.config['USUARIO_CACHE_TTL'] \
+                and cache.estado([_tag(usuario_id)])[0] == versao:
+            return Principal(usuario_id, nome, role)
+
+    principal = buscar_principal(usuario_id)
+    if principal is None:
+        encerrar_sessao()
+        return None
+    registrar_sessao(principal)
+    return principal
@@ -0,0 +1,213 @@
+import re
+from sqlalchemy import text, func, or_
+from sqlalchemy.orm import aliased
+from . import db, organizacoes
+from .models import Time, Campeonato, Jogo
+
+RESULTADOS = 20
+TIPOS = ('times', 'campeonatos', 'jogos')
+IGNORADOS = {'x', 'vs'}
+
+TOKENIZADOR = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+TABELAS = {
+    'busca_times': 'nome',
+    'busca_campeonatos': 'nome, regras',
+    'busca_jogos': 'times, campeonato',
+}
+
+JOGOS = '''
+    SELECT j.id, tc.nome || ' ' || tv.nome, c.nome
+    FROM jogo j
+    JOIN time tc ON tc.id = j.time_casa_id
+    JOIN time tv ON tv.id = j.time_visitante_id
+    JOIN campeonato c ON c.id = j.campeonato_id
+'''
+
+GATILHOS = {
+    'busca_time_ai': '''
+        AFTER INSERT ON time BEGIN
+            INSERT INTO busca_times(rowid, nome) VALUES (new.id, new.nome);
+        END''',
+    'busca_time_au': f'''
+        AFTER UPDATE OF nome ON time WHEN old.nome IS NOT new.nome BEGIN
+            INSERT OR REPLACE INTO busca_times(rowid, nome) VALUES (new.id, new.nome);
+            INSERT OR REPLACE INTO busca_jogos(rowid, times, campeonato)
+                {JOGOS} WHERE j.time_casa_id = new.id
+                UNION ALL {JOGOS} WHERE j.time_visitante_id = new.id;
+        END''',
+    'busca_time_ad': '''
+        AFTER DELETE ON time BEGIN
+            DELETE FROM busca_times WHERE rowid = old.id;
+        END''',
+    'busca_campeonato_ai': '''
+        AFTER INSERT ON campeonato BEGIN
+            INSERT INTO busca_campeonatos(rowid, nome, regras) VALUES (new.id, new.nome, coalesce(new.regras, ''));
+        END''',
+    'busca_campeonato_au': f'''
+        AFTER UPDATE OF nome, regras ON campeonato BEGIN
+            INSERT OR REPLACE INTO busca_campeonatos(rowid, nome, regras)
+                VALUES (new.id, new.nome, coalesce(new.regras, ''));
+            INSERT OR REPLACE INTO busca_jogos(rowid, times, campeonato)
+                {JOGOS} WHERE j.campeonato_id = new.id AND old.nome IS NOT new.nome;
+        END''',
+    'busca_campeonato_ad': '''
+        AFTER DELETE ON campeonato BEGIN
+            DELETE FROM busca_campeonatos WHERE rowid = old.id;
+        END''',
+    'busca_jogo_ai': f'''
+        AFTER INSERT ON jogo BEGIN
+            INSERT INTO busca_jogos(rowid, times, campeonato) {JOGOS} WHERE j.id = new.id;
+        END''',
+    'busca_jogo_au': f'''
+        AFTER UPDATE OF time_casa_id, time_visitante_id, campeonato_id ON jogo BEGIN
+            INSERT OR REPLACE INTO busca_jogos(rowid, times, campeonato) {JOGOS} WHERE j.id = new.id;
+        END''',
+    'busca_jogo_ad': '''
+        AFTER DELETE ON jogo BEGIN
+            DELETE FROM busca_jogos WHERE rowid = old.id;
+        END''',
+}
+
+CARGA = {
+    'busca_times': 'INSERT INTO busca_times(rowid, nome) SELECT id, nome FROM time',
+    'busca_campeonatos': "INSERT INTO busca_campeonatos(rowid, nome, regras) SELECT id, nome, coalesce(regras, '') FROM campeonato",
+    'busca_jogos': f'INSERT INTO busca_jogos(rowid, times, campeonato) {JOGOS}',
+}
+
+
+_disponivel = {}
+
+
+def termos(busca):
+    return [termo for termo in re.findall(r'\w+', busca.lower()) if termo not in IGNORADOS]
+
+
+def expressao(lista):
+    *completos, ultimo = lista
+    return ' '.join([*(f'"{termo}"' for termo in completos), f'"{ultimo}"*'])
+
+
+def indice_disponivel():
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+    # schema_version muda a cada DDL, inclusive de outro processo (flask db upgrade, reindexar-busca).
+    chave = str(engine.url)
+    with engine.connect() as conn:
+        versao = conn.execute(text('PRAGMA schema_version')).scalar()
+        if _disponivel.get(chave, (None,))[0] != versao:
+            _disponivel[chave] = (versao, all(
+                conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nome"),
+                             {'nome': tabela}).first() is not None
+                for tabela in TABELAS
+            ))
+    return _disponivel[chave][1]
+
+
+def remover_gatilhos(conn):
+    for nome in GATILHOS:
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {nome}'))
+
+
+def criar_indice(conn):
+    # Também é a migração 9. Se estas definições deixarem de servir ao esquema daquela versão,
+    # congele lá a cópia antiga em vez de alterar o histórico.
+    for tabela, colunas in TABELAS.items():
+        conn.execute(text(f'CREATE VIRTUAL TABLE IF NOT EXISTS {tabela} USING fts5({colunas}, {TOKENIZADOR})'))
+        conn.execute(text(f'DELETE FROM {tabela}'))
+        conn.execute(text(CARGA[tabela]))
+
+    remover_gatilhos(conn)
+    for nome, corpo in GATILHOS.items():
+        conn.execute(text(f'CREATE TRIGGER {nome} {corpo}'))
+
+
+def reindexar():
+    with db.engine.begin() as conn:
+        criar_indice(conn)
+
+
+def _consulta_jogos():
+    casa, visitante = aliased(Time), aliased(Time)
+    return db.select(Jogo.id, Jogo.campeonato_id, Campeonato.nome.label('campeonato'), Jogo.data_hora,
+                     Jogo.time_casa_id, casa.nome.label('time_casa'),
+                     Jogo.time_visitante_id, visitante.nome.label('time_visitante'),
+                     Jogo.placar_casa, Jogo.placar_visitante, Jogo.status) \
+        .join(Campeonato, Campeonato.id == Jogo.campeonato_id) \
+        .join(casa, casa.id == Jogo.time_casa_id) \
+        .join(visitante, visitante.id == Jogo.time_visitante_id), casa, visitante
+
+
+def _jogos_por_id(ids):
+    if not ids:
+        return []
+    consulta, _, _ = _consulta_jogos()
+    return db.session.execute(
+        consulta.where(Jogo.id.in_(ids)).order_by(Jogo.data_hora.desc(), Jogo.id.desc())
+    ).all()
+
+
+def _da_organizacao(indice, tabela):
+    # CROSS JOIN fixa o índice textual como laço externo; um IN sobre o rowid faria o FTS5
+    # repetir o MATCH para cada linha da organização.
+    return (f'FROM {indice} CROSS JOIN {tabela} ON {tabela}.id = {indice}.rowid '
+            f'WHERE {indice} MATCH :consulta AND {tabela}.organizacao_id = :organizacao')
+
+
+def _buscar_indice(consulta, tipos, limite):
+    parametros = {'consulta': consulta, 'limite': limite, 'organizacao': organizacoes.atual().id}
+    resultados = {}
+    if 'times' in tipos:
+        resultados['times'] = db.session.execute(text(
+            f'SELECT busca_times.rowid, busca_times.nome {_da_organizacao("busca_times", "time")} '
+            'ORDER BY busca_times.rank LIMIT :limite'
+        ), parametros).all()
+    if 'campeonatos' in tipos:
+        resultados['campeonatos'] = db.session.execute(text(
+            f'SELECT busca_campeonatos.rowid, busca_campeonatos.nome {_da_organizacao("busca_campeonatos", "campeonato")} '
+            'ORDER BY bm25(busca_campeonatos, 10.0, 1.0) LIMIT :limite'
+        ), parametros).all()
+    if 'jogos' in tipos:
+        resultados['jogos'] = _jogos_por_id(db.session.execute(text(
+            f'SELECT busca_jogos.rowid {_da_organizacao("busca_jogos", "jogo")} '
+            'ORDER BY busca_jogos.rowid DESC LIMIT :limite'
+        ), parametros).scalars().all())
+    return resultados
+
+
+def _contem(coluna, lista):
+    return [func.lower(coluna).contains(termo, autoescape=True) for termo in lista]
+
+
+def _buscar_like(lista, tipos, limite):
+    resultados = {}
+    if 'times' in tipos:
+        resultados['times'] = db.session.execute(
+            db.select(Time.id, Time.nome).where(*_contem(Time.nome, lista))
+            .order_by(func.length(Time.nome), Time.nome).limit(limite)
+        ).all()
+    if 'campeonatos' in tipos:
+        resultados['campeonatos'] = db.session.execute(
+            db.select(Campeonato.id, Campeonato.nome)
+            .where(*(or_(nome, regras) for nome, regras in zip(_contem(Campeonato.nome, lista),
+                                                                 _contem(Campeonato.regras, lista))))
+            .order_by(Campeonato.nome).limit(limite)
+        ).all()
+    if 'jogos' in tipos:
+        consulta, casa, visitante = _consulta_jogos()
+        texto = casa.nome + ' ' + visitante.nome + ' ' + Campeonato.nome
+        resultados['jogos'] = db.session.execute(
+            consulta.where(*_contem(texto, lista))
+            .order_by(Jogo.data_hora.desc(), Jogo.id.desc()).limit(limite)
+        ).all()
+    return resultados
+
+
+def buscar(busca, tipos=TIPOS, limite=RESULTADOS):
+    lista = termos(busca)
+    if not lista:
+        return {tipo: [] for tipo in tipos}
+    if indice_disponivel():
+        return _buscar_indice(expressao(lista), tipos, limite)
+    return _buscar_like(lista, tipos, limite)
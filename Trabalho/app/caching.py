@@ -0,0 +1,250 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from email.utils import formatdate
+
+from flask import request, session, make_response, current_app
+from markupsafe import Markup
+from flask_login import current_user
+
+
+class MemoriaBackend:
+
+    def __init__(self, max_itens=2048):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._tags = {}
+        self._trava = threading.Lock()
+        self._inicio = time.time()
+
+    def get(self, chave):
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em is not None and expira_em < time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor, ttl=None):
+        expira_em = time.monotonic() + ttl if ttl else None
+        with self._trava:
+            self._itens[chave] = (valor, expira_em)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def delete(self, chave):
+        with self._trava:
+            self._itens.pop(chave, None)
+
+    def clear(self):
+        with self._trava:
+            self._itens.clear()
+            self._tags.clear()
+
+    def estado_tag(self, tag):
+        with self._trava:
+            return self._tags.get(tag, (0, self._inicio))
+
+    def incrementar_tag(self, tag):
+        with self._trava:
+            versao, _ = self._tags.get(tag, (0, self._inicio))
+            self._tags[tag] = (versao + 1, time.time())
+
+
+class RedisBackend:
+
+    def __init__(self, url, prefixo='sigto:'):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefixo = prefixo
+        self._inicio = time.time()
+
+    def get(self, chave):
+        dados = self._redis.get(self._prefixo + chave)
+        return pickle.loads(dados) if dados is not None else None
+
+    def set(self, chave, valor, ttl=None):
+        self._redis.set(self._prefixo + chave, pickle.dumps(valor), ex=ttl or None)
+
+    def delete(self, chave):
+        self._redis.delete(self._prefixo + chave)
+
+    def clear(self):
+        chaves = list(self._redis.scan_iter(self._prefixo + '*'))
+        if chaves:
+            self._redis.delete(*chaves)
+
+    def estado_tag(self, tag):
+        versao, modificado_em = self._redis.hmget(self._prefixo + 'tag:' + tag, 'versao', 'modificado_em')
+        if versao is None:
+            return 0, self._inicio
+        return int(versao), float(modificado_em)
+
+    def incrementar_tag(self, tag):
+        chave = self._prefixo + 'tag:' + tag
+        pipe = self._redis.pipeline()
+        pipe.hincrby(chave, 'versao', 1)
+        pipe.hset(chave, 'modificado_em', time.time())
+        pipe.execute()
+
+
+class NuloBackend:
+
+    def get(self, chave):
+        return None
+
+    def set(self, chave, valor, ttl=None):
+        pass
+
+    def delete(self, chave):
+        pass
+
+    def clear(self):
+        pass
+
+    def estado_tag(self, tag):
+        return 0, time.time()
+
+    def incrementar_tag(self, tag):
+        pass
+
+
+class Cache:
+
+    def __init__(self, app=None):
+        self.backend = MemoriaBackend()
+        self.ttl = 300
+        self.ttl_fragmento = 3600
+        self.max_bytes_fluxo = 1024 * 1024
+        self.espaco = lambda: ''
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'memoria')
+        app.config.setdefault('CACHE_URL', None)
+        app.config.setdefault('CACHE_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ITENS', 2048)
+        app.config.setdefault('CACHE_FRAGMENTO_TTL', 3600)
+        app.config.setdefault('CACHE_FLUXO_MAX_BYTES', 1024 * 1024)
+
+        tipo = app.config['CACHE_BACKEND']
+        if tipo == 'memoria':
+            self.backend = MemoriaBackend(app.config['CACHE_MAX_ITENS'])
+        elif tipo == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_URL'])
+        elif tipo == 'nulo':
+            self.backend = NuloBackend()
+        else:
+            self.backend = tipo
+        self.ttl = app.config['CACHE_TTL']
+        self.ttl_fragmento = app.config['CACHE_FRAGMENTO_TTL']
+        self.max_bytes_fluxo = app.config['CACHE_FLUXO_MAX_BYTES']
+        app.jinja_env.globals['fragmento'] = self.fragmento
+
+    def invalidar(self, *tags):
+        espaco = self.espaco()
+        for tag in tags:
+            self.backend.incrementar_tag(espaco + tag)
+
+    def estado(self, tags):
+        espaco = self.espaco()
+        versoes = []
+        modificado_em = 0
+        for tag in tags:
+            versao, momento = self.backend.estado_tag(espaco + tag)
+            versoes.append(f'{tag}={versao}')
+            modificado_em = max(modificado_em, momento)
+        return ','.join(versoes), modificado_em
+
+    def memorizar(self, nome, tags, funcao, ttl=None):
+        versoes, _ = self.estado(tags)
+        chave = f'{self.espaco()}dados:{nome}|{versoes}'
+
+        valor = self.backend.get(chave)
+        if valor is None:
+            valor = funcao()
+            self.backend.set(chave, valor, ttl or self.ttl)
+        return valor
+
+    def fragmento(self, nome, *partes, caller):
+        chave = f'{self.espaco()}fragmento:{nome}:' + ':'.join(str(parte) for parte in partes)
+
+        html = self.backend.get(chave)
+        if html is None:
+            html = str(caller())
+            self.backend.set(chave, html, self.ttl_fragmento)
+        return Markup(html)
+
+    def _gravar_ao_final(self, resposta, chave, ttl):
+        original = resposta.response
+
+        def gerar():
+            partes, tamanho = [], 0
+            for parte in original:
+                parte = parte.encode() if isinstance(parte, str) else parte
+                tamanho += len(parte)
+                if partes is not None and tamanho <= self.max_bytes_fluxo:
+                    partes.append(parte)
+                else:
+                    partes = None
+                yield parte
+            if partes is not None:
+                self.backend.set(chave, (b''.join(partes), resposta.mimetype), ttl or self.ttl)
+
+        resposta.response = gerar()
+
+    def pagina(self, tags, ttl=None):
+
+        def decorator(f):
+
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or current_user.is_authenticated \
+                        or '_flashes' in session:
+                    return f(*args, **kwargs)
+
+                versoes, modificado_em = self.estado(tags(**kwargs))
+                chave = f'{self.espaco()}pagina:{request.full_path}|{versoes}'
+                em_cache = self.backend.get(chave)
+                etag = None
+
+                if em_cache is not None:
+                    # O ETag vem do corpo guardado, não das versões das tags: com o backend em memória,
+                    # uma invalidação feita em outro processo não chega aqui, e o corpo expira com o TTL.
+                    corpo, mimetype = em_cache
+                    etag = hashlib.sha1(corpo).hexdigest()
+                    if request.if_none_match.contains(etag):
+                        resposta = current_app.response_class(status=304)
+                    else:
+                        resposta = current_app.response_class(corpo, mimetype=mimetype)
+                else:
+                    resposta = make_response(f(*args, **kwargs))
+                    if resposta.status_code != 200:
+                        return resposta
+                    if resposta.is_streamed:
+                        self._gravar_ao_final(resposta, chave, ttl)
+                    else:
+                        corpo = resposta.get_data()
+                        etag = hashlib.sha1(corpo).hexdigest()
+                        self.backend.set(chave, (corpo, resposta.mimetype), ttl or self.ttl)
+
+                if etag is not None:
+                    resposta.set_etag(etag)
+                resposta.headers['Last-Modified'] = formatdate(modificado_em, usegmt=True)
+                resposta.headers['Cache-Control'] = 'public, no-cache'
+                resposta.vary.add('Cookie')
+                return resposta
+
+            return decorated_function
+
+        return decorator
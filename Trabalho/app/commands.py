@@ -0,0 +1,361 @@
+import re
+import signal
+import threading
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from . import db, cache, organizacoes
+from .models import Campeonato
+from . import standings, migrations, importacao, seed, serving, historico, busca, estatisticas, exportacao, eventos
+from .jobs import fila
+
+
+@click.command('rebuild-tabelas')
+@click.option('--campeonato', 'campeonato_id', type=int, default=None,
+              help='Processa apenas o campeonato informado.')
+@click.option('--verificar', is_flag=True,
+              help='Apenas verifica divergências, sem reconstruir.')
+@click.option('--historico', 'historico_rodadas', is_flag=True,
+              help='Também gera o histórico de classificação por rodada.')
+@with_appcontext
+def rebuild_tabelas_command(campeonato_id, verificar, historico_rodadas):
+    consulta = Campeonato.query.order_by(Campeonato.id)
+    if campeonato_id is not None:
+        consulta = consulta.filter_by(id=campeonato_id)
+
+    total_divergencias = 0
+    for campeonato in consulta:
+        divergencias = standings.verificar_tabela(campeonato)
+        total_divergencias += len(divergencias)
+
+        for time_id, esperado, armazenado in divergencias:
+            print(f"[{campeonato.nome}] time {time_id}: esperado={esperado} armazenado={armazenado}")
+
+        if not verificar:
+            standings.reconstruir_tabela(campeonato)
+            db.session.commit()
+            print(f"Tabela de '{campeonato.nome}' reconstruída.")
+
+        if historico_rodadas:
+            linhas = historico.atualizar_historico(campeonato.id)
+            db.session.commit()
+            print(f"Histórico de '{campeonato.nome}': {linhas} linha(s) gravada(s).")
+
+    if verificar:
+        print(f"{total_divergencias} divergência(s) encontrada(s).")
+        if total_divergencias:
+            raise SystemExit(1)
+
+
+@click.group('db')
+def db_command():
+    """Migrações do esquema do banco de dados."""
+
+
+@db_command.command('upgrade')
+@click.option('--versao', type=int, default=None, help='Versão alvo (padrão: a mais recente).')
+@click.option('--todas-organizacoes', is_flag=True, help='Também atualiza os bancos próprios das organizações.')
+@with_appcontext
+def db_upgrade_command(versao, todas_organizacoes):
+    versao_final = migrations.upgrade(db.engine, versao, informar=print)
+    print(f"Esquema na versão {versao_final}.")
+
+    if todas_organizacoes:
+        for registro in organizacoes.listar():
+            if registro.banco_url is not None:
+                versao_final = migrations.upgrade(organizacoes.motores.obter(registro.banco_url), versao)
+                print(f"[{registro.slug}] esquema na versão {versao_final}.")
+
+
+@db_command.command('downgrade')
+@click.option('--versao', type=int, default=None, help='Versão alvo (padrão: a anterior).')
+@with_appcontext
+def db_downgrade_command(versao):
+    if versao is None:
+        with db.engine.connect() as conn:
+            versao = max(migrations.versao_atual(conn) - 1, 0)
+    versao_final = migrations.downgrade(db.engine, versao, informar=print)
+    print(f"Esquema na versão {versao_final}.")
+
+
+@db_command.command('status')
+@with_appcontext
+def db_status_command():
+    with db.engine.connect() as conn:
+        atual = migrations.versao_atual(conn)
+
+    for migracao in migrations.carregar_migracoes():
+        marcador = 'x' if migracao.VERSAO <= atual else ' '
+        print(f"[{marcador}] {migracao.VERSAO:04d} {migracao.DESCRICAO}")
+
+
+@click.command('rebuild-estatisticas')
+@with_appcontext
+def rebuild_estatisticas_command():
+    estatisticas.reconstruir()
+    db.session.commit()
+    print("Estatísticas agregadas reconstruídas.")
+
+
+@click.command('reindexar-busca')
+@with_appcontext
+def reindexar_busca_command():
+    if db.engine.dialect.name != 'sqlite':
+        print("O índice de busca textual só é usado com SQLite.")
+        return
+    busca.reindexar()
+    print("Índice de busca textual reconstruído.")
+
+
+@click.command('import-jogos')
+@click.argument('arquivo', type=click.File('rb'))
+@with_appcontext
+def import_jogos_command(arquivo):
+    linhas = importacao.ler_arquivo(arquivo.read(), arquivo.name)
+
+    try:
+        jogos = importacao.importar_jogos(linhas)
+        db.session.commit()
+    except importacao.ErroImportacao as erro:
+        db.session.rollback()
+        for numero, mensagem in erro.erros:
+            print(f"Linha {numero}: {mensagem}")
+        print("Nenhum jogo foi importado.")
+        raise SystemExit(1)
+
+    importacao.publicar_importacao(jogos)
+    print(f"{len(jogos)} jogo(s) importado(s).")
+
+
+@click.group('organizacao')
+def organizacao_command():
+    """Organizações (ligas) atendidas por esta instalação."""
+
+
+@organizacao_command.command('criar')
+@click.argument('slug')
+@click.argument('nome')
+@click.option('--dominio', default=None, help='Host atendido por esta organização (ex.: liga.exemplo.com).')
+@click.option('--modo', type=click.Choice(['compartilhado', 'banco']), default=None,
+              help='compartilhado: mesmas tabelas das demais; banco: banco de dados próprio '
+                   '(padrão: ORGANIZACAO_MODO).')
+@click.option('--banco-url', default=None, help='URL do banco próprio (padrão: ORGANIZACAO_BANCO_URL).')
+@with_appcontext
+def organizacao_criar_command(slug, nome, dominio, modo, banco_url):
+    if not re.fullmatch(r'[a-z0-9][a-z0-9-]*', slug):
+        print("Erro: use apenas letras minúsculas, números e hífens no identificador.")
+        raise SystemExit(1)
+    if organizacoes.buscar(slug) is not None:
+        print(f"Erro: a organização '{slug}' já existe.")
+        raise SystemExit(1)
+
+    modo = modo or current_app.config['ORGANIZACAO_MODO']
+    if modo == 'banco' and banco_url is None:
+        banco_url = organizacoes.url_banco(slug)
+    if banco_url is not None:
+        migrations.upgrade(organizacoes.motores.obter(banco_url))
+
+    registro = organizacoes.criar(slug, nome, dominio=dominio, banco_url=banco_url)
+    print(f"Organização '{registro.slug}' criada (id {registro.id}, "
+          f"{'banco próprio' if banco_url else 'banco compartilhado'}).")
+    print(f"Crie o administrador com: SIGTO_ORGANIZACAO_PADRAO={registro.slug} flask create-admin")
+
+
+@organizacao_command.command('listar')
+@with_appcontext
+def organizacao_listar_command():
+    for registro in organizacoes.listar():
+        banco = registro.banco_url or 'compartilhado'
+        print(f"{registro.id:>4} {registro.slug:<20} {registro.nome:<30} {registro.dominio or '-':<30} {banco}")
+
+
+@click.command('export')
+@click.argument('arquivo', type=click.Path(dir_okay=False, writable=True))
+@click.option('--formato', type=click.Choice(exportacao.FORMATOS), default='colunar', show_default=True)
+@click.option('--lote', type=int, default=exportacao.LOTE, show_default=True, help='Linhas lidas por vez.')
+@with_appcontext
+def export_command(arquivo, formato, lote):
+    manifesto = exportacao.exportar_para_arquivo(arquivo, formato, lote)
+    for tabela, info in manifesto['tabelas'].items():
+        print(f"{tabela}: {info['linhas']} linha(s)")
+    print(f"Snapshot ({formato}) gravado em {arquivo}.")
+
+
+@click.command('restore')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--lote', type=int, default=exportacao.LOTE, show_default=True, help='Linhas inseridas por vez.')
+@with_appcontext
+def restore_command(arquivo, lote):
+    try:
+        manifesto = exportacao.restaurar(arquivo, lote, informar=print)
+    except exportacao.ErroSnapshot as erro:
+        print(f"Erro: {erro}")
+        raise SystemExit(1)
+
+    exportacao.reconstruir_derivados(informar=print)
+    cache.invalidar('times', 'campeonatos', 'jogos')
+    print(f"Snapshot de {manifesto['criado_em']} restaurado.")
+
+
+@click.group('eventos')
+def eventos_command():
+    """Registro de alterações (somente inserção) para sincronização incremental."""
+
+
+@eventos_command.command('ler')
+@click.option('--desde', type=int, default=0, show_default=True, help='Cursor: lê os eventos com id maior que este.')
+@click.option('--do-fim', is_flag=True, help='Começa após o último evento gravado (use com --seguir).')
+@click.option('--entidade', 'entidades', multiple=True,
+              type=click.Choice(['jogo', 'time', 'campeonato', 'inscricao', 'usuario', 'base', 'evento']))
+@click.option('--lote', type=int, default=eventos.LOTE, show_default=True, help='Eventos lidos por consulta.')
+@click.option('--seguir', is_flag=True, help='Continua aguardando novos eventos (como tail -f).')
+@click.option('--intervalo', type=float, default=1.0, show_default=True, help='Segundos entre consultas com --seguir.')
+@with_appcontext
+def eventos_ler_command(desde, do_fim, entidades, lote, seguir, intervalo):
+    if do_fim:
+        desde = eventos.ultimo()
+    try:
+        for linhas in eventos.seguir(desde, lote, entidades or None, acompanhar=seguir, intervalo=intervalo):
+            for evento in linhas:
+                print(eventos.dumps(eventos.serializar(evento)), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+@eventos_command.command('podar')
+@click.option('--dias', type=int, required=True, help='Remove os eventos mais antigos que este número de dias.')
+@with_appcontext
+def eventos_podar_command(dias):
+    removidos = eventos.podar(datetime.now() - timedelta(days=dias))
+    db.session.commit()
+    print(f"{removidos} evento(s) removido(s).")
+
+
+@click.command('gerar-jogos')
+@click.argument('campeonato_id', type=int)
+@click.option('--inicio', type=click.DateTime(formats=['%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M', '%Y-%m-%d']),
+              required=True, help='Data e hora da primeira rodada.')
+@click.option('--intervalo', type=int, default=7, show_default=True, help='Dias entre rodadas.')
+@click.option('--ida-volta', is_flag=True, help='Gera turno e returno.')
+@with_appcontext
+def gerar_jogos_command(campeonato_id, inicio, intervalo, ida_volta):
+    campeonato = db.session.get(Campeonato, campeonato_id)
+    if campeonato is None:
+        print(f"Erro: campeonato {campeonato_id} não encontrado.")
+        raise SystemExit(1)
+
+    linhas = importacao.gerar_tabela_de_jogos(campeonato, inicio, intervalo, ida_volta)
+    try:
+        jogos = importacao.importar_jogos(linhas)
+    except importacao.ErroImportacao as erro:
+        db.session.rollback()
+        for numero, mensagem in erro.erros:
+            print(f"Jogo {numero}: {mensagem}")
+        print("Nenhum jogo foi gerado.")
+        raise SystemExit(1)
+    db.session.commit()
+
+    importacao.publicar_importacao(jogos)
+    print(f"{len(jogos)} jogo(s) gerado(s) para '{campeonato.nome}'.")
+
+
+@click.command('seed')
+@click.option('--campeonatos', type=int, default=10, show_default=True)
+@click.option('--times', type=int, default=500, show_default=True)
+@click.option('--jogos', type=int, default=20000, show_default=True)
+@click.option('--usuarios', type=int, default=20, show_default=True)
+@click.option('--times-por-campeonato', type=int, default=20, show_default=True)
+@click.option('--semente', type=int, default=42, show_default=True, help='Semente do gerador aleatório.')
+@with_appcontext
+def seed_command(campeonatos, times, jogos, usuarios, times_por_campeonato, semente):
+    if not seed.banco_vazio():
+        print("Erro: o banco já possui times ou o administrador de teste. Use um banco vazio.")
+        raise SystemExit(1)
+
+    seed.gerar_dados(campeonatos=campeonatos, times=times, jogos=jogos, usuarios=usuarios,
+                     times_por_campeonato=times_por_campeonato, semente=semente, informar=print)
+    db.session.commit()
+    cache.invalidar('times', 'campeonatos', 'jogos')
+    print(f"Dados sintéticos gerados. Login: {seed.EMAIL_ADMIN} / {seed.SENHA_PADRAO}")
+
+
+@click.command('serve')
+@click.option('--host', default='0.0.0.0', show_default=True)
+@click.option('--port', 'porta', type=int, default=5000, show_default=True)
+@click.option('--servidor', type=click.Choice(['waitress', 'prefork']), default='waitress', show_default=True,
+              help='prefork: vários processos waitress compartilhando o mesmo socket (Linux/macOS).')
+@click.option('--workers', type=int, default=None, help='Processos no modo prefork (padrão: SERVIDOR_WORKERS).')
+@click.option('--threads', type=int, default=None, help='Threads por processo (padrão: SERVIDOR_THREADS).')
+@click.option('--conexoes', type=int, default=None, help='Limite de conexões simultâneas por processo.')
+@click.option('--keepalive', type=int, default=None, help='Segundos até fechar conexões ociosas.')
+@click.option('--porta-aovivo', type=int, default=None,
+              help='Porta do servidor SSE do placar ao vivo (padrão: AOVIVO_PORTA; 0 desativa).')
+@with_appcontext
+def serve_command(host, porta, servidor, workers, threads, conexoes, keepalive, porta_aovivo):
+    app = current_app._get_current_object()
+    opcoes = serving.opcoes_waitress(app, threads, conexoes, keepalive)
+    porta_aovivo = app.config['AOVIVO_PORTA'] if porta_aovivo is None else porta_aovivo
+
+    if servidor == 'prefork':
+        serving.servir_prefork(app, host, porta, workers or app.config['SERVIDOR_WORKERS'],
+                               porta_aovivo=porta_aovivo, **opcoes)
+    else:
+        serving.servir_waitress(app, host, porta, porta_aovivo=porta_aovivo, **opcoes)
+
+
+@click.command('aovivo')
+@click.option('--host', default='0.0.0.0', show_default=True)
+@click.option('--port', 'porta', type=int, default=None, help='Porta (padrão: AOVIVO_PORTA).')
+@with_appcontext
+def aovivo_command(host, porta):
+    app = current_app._get_current_object()
+    if app.config['AOVIVO_BACKEND'] == 'local':
+        print('Aviso: em um processo separado o placar ao vivo exige AOVIVO_BACKEND=redis.')
+    servidor = serving.iniciar_aovivo(app, host, porta or app.config['AOVIVO_PORTA'])
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(f'Encerrando ({servidor.abertas} conexão(ões) aberta(s)).')
+
+
+@click.command('comprimir-estaticos')
+@with_appcontext
+def comprimir_estaticos_command():
+    gerados = serving.comprimir_estaticos(current_app, informar=print)
+    print(f"{gerados} arquivo(s) comprimido(s).")
+
+
+@click.command('worker')
+@click.option('--processos', type=int, default=1, show_default=True, help='Processos executando tarefas.')
+@click.option('--intervalo', type=float, default=None, help='Segundos entre consultas à fila (padrão: TAREFAS_INTERVALO).')
+@click.option('--ate-esvaziar', is_flag=True, help='Executa as tarefas disponíveis e termina.')
+@with_appcontext
+def worker_command(processos, intervalo, ate_esvaziar):
+    app = current_app._get_current_object()
+
+    if ate_esvaziar or processos <= 1:
+        signal.signal(signal.SIGTERM, fila.parar)
+        executadas = fila.trabalhar(app, intervalo, ate_esvaziar=ate_esvaziar, informar=print)
+        print(f"{executadas} tarefa(s) executada(s).")
+    else:
+        print(f"Iniciando {processos} processos de tarefas.")
+        fila.trabalhar_em_processos(app, processos, intervalo)
+
+
+def register_commands(app):
+    app.cli.add_command(rebuild_tabelas_command)
+    app.cli.add_command(db_command)
+    app.cli.add_command(import_jogos_command)
+    app.cli.add_command(gerar_jogos_command)
+    app.cli.add_command(seed_command)
+    app.cli.add_command(serve_command)
+    app.cli.add_command(aovivo_command)
+    app.cli.add_command(comprimir_estaticos_command)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(reindexar_busca_command)
+    app.cli.add_command(rebuild_estatisticas_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(restore_command)
+    app.cli.add_command(organizacao_command)
+    app.cli.add_command(eventos_command)
@@ -0,0 +1,102 @@
+import os
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+class Config:
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'chave-super-secreta')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'site.db'))
+
+    SQLITE_JOURNAL_MODE = 'WAL'
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800
+
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memoria')
+    CACHE_URL = os.environ.get('CACHE_URL')
+    CACHE_TTL = 300
+    CACHE_MAX_ITENS = 2048
+    CACHE_FRAGMENTO_TTL = 3600
+    CACHE_FLUXO_MAX_BYTES = 1024 * 1024
+
+    AOVIVO_BACKEND = os.environ.get('AOVIVO_BACKEND', 'local')
+    AOVIVO_URL = os.environ.get('AOVIVO_URL')
+    AOVIVO_PORTA = int(os.environ.get('AOVIVO_PORTA', 5001))
+    AOVIVO_ENDERECO = os.environ.get('AOVIVO_ENDERECO')
+    AOVIVO_CONEXOES = 10000
+    AOVIVO_DURACAO_MAXIMA = 300
+    AOVIVO_HEARTBEAT = 10
+
+    METRICAS_ATIVAS = True
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+    METRICAS_PERFIL_LIMIAR = None
+    METRICAS_PERFIL_INTERVALO = 0.005
+
+    EVENTOS_TOKEN = os.environ.get('EVENTOS_TOKEN')
+
+    AGENDA_JANELA_MINUTOS = 180
+    AGENDA_MAX_DIAS = 400
+    AGENDA_MAX_JOGOS = 1000
+    AGENDA_ICAL_DOMINIO = os.environ.get('AGENDA_ICAL_DOMINIO')
+
+    BCRYPT_LOG_ROUNDS = 12
+    SENHAS_PROCESSOS = 2
+    SENHAS_FILA_MAXIMA = 32
+    SENHAS_TIMEOUT = 5
+    LOGIN_LIMITE_IP = (20, 10)
+    LOGIN_LIMITE_CONTA = (5, 2)
+    USUARIO_CACHE_TTL = 60
+
+    TAREFAS_MODO = 'fila'
+    TAREFAS_TENTATIVAS = 3
+    TAREFAS_ESPERA_BASE = 5
+    TAREFAS_INTERVALO = 1.0
+    TAREFAS_LEASE = 300
+
+    ORGANIZACAO_PADRAO = 'padrao'
+    ORGANIZACAO_RESOLUCAO = 'nenhuma'
+    ORGANIZACAO_DOMINIO = None
+    ORGANIZACAO_PREFIXO = '/o'
+    ORGANIZACAO_MODO = 'compartilhado'
+    ORGANIZACAO_BANCO_URL = 'sqlite:///' + os.path.join(basedir, 'organizacoes', '{slug}.db')
+    ORGANIZACAO_MAX_MOTORES = 32
+    ORGANIZACAO_POOL_SIZE = 2
+    ORGANIZACAO_MAX_OVERFLOW = 3
+    ORGANIZACAO_CACHE_TTL = 60
+
+    SERVIDOR_THREADS = 8
+    SERVIDOR_WORKERS = os.cpu_count() or 2
+    SERVIDOR_CONEXOES = 100
+    SERVIDOR_KEEPALIVE = 120
+    SERVIDOR_BACKLOG = 1024
+    ESTATICOS_MAX_AGE = 365 * 24 * 3600
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+    TEMPLATES_AUTO_RELOAD = False
+
+
+class TestingConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SENHAS_PROCESSOS = 0
+    TAREFAS_MODO = 'imediato'
+    TAREFAS_ESPERA_BASE = 0
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL', 'sqlite://')
+
+
+configs = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
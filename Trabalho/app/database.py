@@ -0,0 +1,117 @@
+import threading
+from collections import OrderedDict
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_sqlite_memoria(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def opcoes_engine(config, uri=None):
+    uri = uri or config['SQLALCHEMY_DATABASE_URI']
+
+    if is_sqlite(uri):
+        return {
+            'connect_args': {
+                'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+                'check_same_thread': False,
+            },
+        }
+
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def configurar_sqlite(engine, config):
+    memoria = is_sqlite_memoria(str(engine.url))
+
+    @event.listens_for(engine, 'connect')
+    def aplicar_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not memoria:
+            cursor.execute(f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}")
+            cursor.execute(f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}")
+        cursor.execute(f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.close()
+
+
+def configurar_engine(engine, config):
+    if engine.dialect.name == 'sqlite':
+        configurar_sqlite(engine, config)
+
+
+def _tabela_do_catalogo(mapper, clause):
+    if mapper is not None:
+        return sa.inspect(mapper).local_table.info.get('catalogo', False)
+    tabela = clause.table if isinstance(clause, sa.UpdateBase) else clause
+    return isinstance(tabela, sa.Table) and tabela.info.get('catalogo', False)
+
+
+class Sessao(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not _tabela_do_catalogo(mapper, clause):
+            motor = self._db.motor_organizacao()
+            if motor is not None:
+                return motor
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class BancoDeDados(SQLAlchemy):
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('session_options', {}).setdefault('class_', Sessao)
+        super().__init__(**kwargs)
+        self.motor_organizacao = lambda: None
+
+    @property
+    def engine(self):
+        return self.motor_organizacao() or super().engine
+
+    @property
+    def catalogo(self):
+        return super().engine
+
+
+class Motores:
+
+    def __init__(self, criar, maximo=32):
+        self.criar = criar
+        self.maximo = maximo
+        self._motores = OrderedDict()
+        self._trava = threading.Lock()
+
+    def obter(self, url):
+        with self._trava:
+            motor = self._motores.pop(url, None)
+            if motor is None:
+                motor = self.criar(url)
+            self._motores[url] = motor
+            while len(self._motores) > self.maximo:
+                _, antigo = self._motores.popitem(last=False)
+                antigo.dispose()
+        return motor
+
+    def descartar(self, fechar=True):
+        with self._trava:
+            for motor in self._motores.values():
+                motor.dispose(close=fechar)
+            self._motores.clear()
+
+    def __len__(self):
+        return len(self._motores)
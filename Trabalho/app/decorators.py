@@ -2,17 +2,30 @@ from functools import wraps
 from flask_login import current_user
 from flask import flash, redirect, url_for
 
-def admin_required(f):
+def e_admin(usuario):
+    return usuario.role == 'Admin'
 
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated:
-            flash('Por favor, faça login para acessar esta página.', 'info')
-            return redirect(url_for('main.login'))
-        
-        if current_user.role != 'Admin':
-            flash('Você não tem permissão para acessar esta página.', 'danger')
-            return redirect(url_for('main.home'))
-        
-        return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+def e_supremo(usuario):
+    from . import organizacoes
+    return usuario.id == organizacoes.atual().supremo_id
+
+def permissao_requerida(verificar, mensagem='Você não tem permissão para acessar esta página.'):
+
+    def decorator(f):
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_user.is_authenticated:
+                flash('Por favor, faça login para acessar esta página.', 'info')
+                return redirect(url_for('main.login'))
+            
+            if not verificar(current_user):
+                flash(mensagem, 'danger')
+                return redirect(url_for('main.home'))
+            
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+admin_required = permissao_requerida(e_admin)
+supremo_required = permissao_requerida(e_supremo, 'Apenas o Administrador Supremo pode aceder a esta página.')
\ No newline at end of file
@@ -0,0 +1,406 @@
+from sqlalchemy import update, insert, delete, or_, func, text
+from sqlalchemy.orm import aliased
+from . import db, standings
+from .models import EstatisticaTime, EstatisticaTemporada, EstatisticaConfronto, Jogo, Time, Campeonato
+
+COLUNAS = standings.DIVISAO + tuple(f'{coluna}_casa' for coluna in standings.DIVISAO)
+CONFRONTO = ('jogos_disputados', 'vitorias_a', 'vitorias_b', 'empates', 'gols_a', 'gols_b')
+CHAVES = {
+    EstatisticaTime: ('time_id',),
+    EstatisticaTemporada: ('campeonato_id', 'time_id'),
+    EstatisticaConfronto: ('time_a_id', 'time_b_id'),
+}
+
+ULTIMOS_CONFRONTOS = 5
+ADVERSARIOS = 10
+
+LADOS = '''
+    SELECT id, campeonato_id, time_casa_id AS time_id,
+           COALESCE(placar_casa, 0) AS gp, COALESCE(placar_visitante, 0) AS gc, 1 AS casa
+    FROM jogo WHERE status = 'Finalizado'
+    UNION ALL
+    SELECT id, campeonato_id, time_visitante_id AS time_id,
+           COALESCE(placar_visitante, 0) AS gp, COALESCE(placar_casa, 0) AS gc, 0 AS casa
+    FROM jogo WHERE status = 'Finalizado'
+'''
+
+SOMAS = {
+    'jogos_disputados': 'COUNT(*)',
+    'vitorias': 'SUM(CASE WHEN gp > gc THEN 1 ELSE 0 END)',
+    'empates': 'SUM(CASE WHEN gp = gc THEN 1 ELSE 0 END)',
+    'derrotas': 'SUM(CASE WHEN gp < gc THEN 1 ELSE 0 END)',
+    'gols_pro': 'SUM(gp)',
+    'gols_contra': 'SUM(gc)',
+    'jogos_disputados_casa': 'SUM(casa)',
+    'vitorias_casa': 'SUM(CASE WHEN casa = 1 AND gp > gc THEN 1 ELSE 0 END)',
+    'empates_casa': 'SUM(CASE WHEN casa = 1 AND gp = gc THEN 1 ELSE 0 END)',
+    'derrotas_casa': 'SUM(CASE WHEN casa = 1 AND gp < gc THEN 1 ELSE 0 END)',
+    'gols_pro_casa': 'SUM(casa * gp)',
+    'gols_contra_casa': 'SUM(casa * gc)',
+}
+
+TEMPORADAS = f'''
+    INSERT INTO estatistica_temporada (campeonato_id, time_id, {', '.join(COLUNAS)})
+    SELECT campeonato_id, time_id, {', '.join(SOMAS[coluna] for coluna in COLUNAS)}
+    FROM ({LADOS}) lados
+    GROUP BY campeonato_id, time_id
+'''
+
+TIMES = f'''
+    INSERT INTO estatistica_time (time_id, {', '.join(COLUNAS)})
+    SELECT time_id, {', '.join(f'SUM({coluna})' for coluna in COLUNAS)}
+    FROM estatistica_temporada
+    GROUP BY time_id
+'''
+
+CONFRONTOS = f'''
+    INSERT INTO estatistica_confronto (time_a_id, time_b_id, {', '.join(CONFRONTO)})
+    SELECT time_a_id, time_b_id, COUNT(*),
+           SUM(CASE WHEN gols_a > gols_b THEN 1 ELSE 0 END),
+           SUM(CASE WHEN gols_a < gols_b THEN 1 ELSE 0 END),
+           SUM(CASE WHEN gols_a = gols_b THEN 1 ELSE 0 END),
+           SUM(gols_a), SUM(gols_b)
+    FROM (
+        SELECT CASE WHEN time_casa_id < time_visitante_id THEN time_casa_id ELSE time_visitante_id END AS time_a_id,
+               CASE WHEN time_casa_id < time_visitante_id THEN time_visitante_id ELSE time_casa_id END AS time_b_id,
+               CASE WHEN time_casa_id < time_visitante_id THEN COALESCE(placar_casa, 0)
+                    ELSE COALESCE(placar_visitante, 0) END AS gols_a,
+               CASE WHEN time_casa_id < time_visitante_id THEN COALESCE(placar_visitante, 0)
+                    ELSE COALESCE(placar_casa, 0) END AS gols_b
+        FROM jogo WHERE status = 'Finalizado'
+    ) pares
+    GROUP BY time_a_id, time_b_id
+'''
+
+RECORDES = f'''
+    SELECT time_id, id FROM (
+        SELECT time_id, id, ROW_NUMBER() OVER (
+            PARTITION BY time_id ORDER BY {{margem}} DESC, {{gols}} DESC, id DESC) AS ordem
+        FROM ({LADOS}) lados
+        WHERE {{margem}} > 0
+    ) candidatos
+    WHERE ordem = 1
+'''
+
+
+
+def _finalizado(res):
+    return res is not None and res.status == 'Finalizado'
+
+
+def _lados(res):
+    return ((res.time_casa_id, res.placar_casa, res.placar_visitante, True),
+            (res.time_visitante_id, res.placar_visitante, res.placar_casa, False))
+
+
+def _delta_time(gols_pro, gols_contra, casa):
+    delta = standings.contribuicao(gols_pro, gols_contra, casa=casa)
+    return {coluna: delta[coluna] for coluna in COLUNAS}
+
+
+def _par(casa_id, visitante_id, placar_casa, placar_visitante):
+    if casa_id < visitante_id:
+        return (casa_id, visitante_id), placar_casa, placar_visitante
+    return (visitante_id, casa_id), placar_visitante, placar_casa
+
+
+def _delta_confronto(res):
+    chave, gols_a, gols_b = _par(res.time_casa_id, res.time_visitante_id, res.placar_casa, res.placar_visitante)
+    return chave, {
+        'jogos_disputados': 1, 'vitorias_a': int(gols_a > gols_b), 'vitorias_b': int(gols_a < gols_b),
+        'empates': int(gols_a == gols_b), 'gols_a': gols_a, 'gols_b': gols_b,
+    }
+
+
+def _acumular(mapa, chave, delta, sinal):
+    atual = mapa.setdefault(chave, dict.fromkeys(delta, 0))
+    for coluna, valor in delta.items():
+        atual[coluna] += sinal * valor
+
+
+def acumular(deltas, res, sinal=1):
+    if not _finalizado(res):
+        return
+    for time_id, gols_pro, gols_contra, casa in _lados(res):
+        delta = _delta_time(gols_pro or 0, gols_contra or 0, casa)
+        _acumular(deltas[EstatisticaTime], (time_id,), delta, sinal)
+        _acumular(deltas[EstatisticaTemporada], (res.campeonato_id, time_id), delta, sinal)
+    chave, delta = _delta_confronto(res._replace(placar_casa=res.placar_casa or 0,
+                                                 placar_visitante=res.placar_visitante or 0))
+    _acumular(deltas[EstatisticaConfronto], chave, delta, sinal)
+
+
+def gravar(deltas):
+    for modelo, linhas in deltas.items():
+        nomes = CHAVES[modelo]
+        for chave, delta in linhas.items():
+            if not any(delta.values()):
+                continue
+            resultado = db.session.execute(
+                update(modelo)
+                .where(*(getattr(modelo, nome) == valor for nome, valor in zip(nomes, chave)))
+                .values(**{coluna: getattr(modelo, coluna) + valor for coluna, valor in delta.items()})
+                .execution_options(synchronize_session=False)
+            )
+            if resultado.rowcount == 0:
+                db.session.execute(insert(modelo).values(**dict(zip(nomes, chave)), **delta))
+
+
+def _novos_deltas():
+    return {modelo: {} for modelo in CHAVES}
+
+
+def _recorde(time_id, vitoria, excluir=()):
+    melhor = None
+    for coluna, pro, contra in ((Jogo.time_casa_id, Jogo.placar_casa, Jogo.placar_visitante),
+                                (Jogo.time_visitante_id, Jogo.placar_visitante, Jogo.placar_casa)):
+        pro, contra = func.coalesce(pro, 0), func.coalesce(contra, 0)
+        if not vitoria:
+            pro, contra = contra, pro
+        consulta = db.select(pro - contra, pro, Jogo.id) \
+            .where(coluna == time_id, Jogo.status == 'Finalizado', pro > contra)
+        if excluir:
+            consulta = consulta.where(Jogo.id.notin_(excluir))
+        linha = db.session.execute(consulta.order_by((pro - contra).desc(), pro.desc(), Jogo.id.desc())
+                                   .limit(1)).first()
+        if linha is not None and (melhor is None or tuple(linha) > melhor):
+            melhor = tuple(linha)
+    return melhor[2] if melhor else None
+
+
+def recalcular_recordes(time_ids, excluir=()):
+    for time_id in time_ids:
+        db.session.execute(
+            update(EstatisticaTime).where(EstatisticaTime.time_id == time_id)
+            .values(maior_vitoria_id=_recorde(time_id, True, excluir),
+                    maior_derrota_id=_recorde(time_id, False, excluir))
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _recordes_afetados(antes, depois):
+    time_ids = {time_id for res in (antes, depois) if _finalizado(res)
+                for time_id in (res.time_casa_id, res.time_visitante_id)}
+    if not time_ids:
+        return set()
+
+    recordes = {linha.time_id: linha for linha in db.session.execute(
+        db.select(EstatisticaTime.time_id, EstatisticaTime.maior_vitoria_id, EstatisticaTime.maior_derrota_id)
+        .where(EstatisticaTime.time_id.in_(time_ids))
+    )}
+    ids = {jogo_id for linha in recordes.values() for jogo_id in linha[1:] if jogo_id is not None}
+    placares = {linha.id: linha for linha in db.session.execute(
+        db.select(Jogo.id, Jogo.time_casa_id, Jogo.placar_casa, Jogo.placar_visitante).where(Jogo.id.in_(ids))
+    )} if ids else {}
+
+    def marca(jogo_id, time_id):
+        jogo = placares.get(jogo_id)
+        if jogo is None:
+            return None
+        pro, contra = (jogo.placar_casa or 0, jogo.placar_visitante or 0)
+        if jogo.time_casa_id != time_id:
+            pro, contra = contra, pro
+        return abs(pro - contra), max(pro, contra)
+
+    afetados = set()
+    if _finalizado(antes):
+        for time_id in (antes.time_casa_id, antes.time_visitante_id):
+            linha = recordes.get(time_id)
+            if linha is not None and antes.jogo_id is not None and antes.jogo_id in linha[1:]:
+                afetados.add(time_id)
+    if _finalizado(depois):
+        for time_id, gols_pro, gols_contra, _ in _lados(depois):
+            linha = recordes.get(time_id)
+            gols_pro, gols_contra = gols_pro or 0, gols_contra or 0
+            if linha is None or gols_pro == gols_contra:
+                continue
+            recorde = marca(linha.maior_vitoria_id if gols_pro > gols_contra else linha.maior_derrota_id, time_id)
+            if recorde is None or (abs(gols_pro - gols_contra), max(gols_pro, gols_contra)) >= recorde:
+                afetados.add(time_id)
+    return afetados
+
+
+def atualizar_jogo(antes, depois):
+    if antes == depois or not (_finalizado(antes) or _finalizado(depois)):
+        return
+
+    deltas = _novos_deltas()
+    acumular(deltas, antes, -1)
+    acumular(deltas, depois, 1)
+    gravar(deltas)
+
+    excluir = (antes.jogo_id,) if depois is None and antes.jogo_id is not None else ()
+    recalcular_recordes(_recordes_afetados(antes, depois), excluir)
+
+
+def aplicar_lote(resultados, sinal=1):
+    deltas = _novos_deltas()
+    time_ids = set()
+    for res in resultados:
+        if _finalizado(res):
+            acumular(deltas, res, sinal)
+            time_ids.update((res.time_casa_id, res.time_visitante_id))
+    gravar(deltas)
+    return time_ids
+
+
+def remover_jogos(jogo_ids):
+    jogos = db.session.execute(
+        db.select(Jogo.campeonato_id, Jogo.time_casa_id, Jogo.time_visitante_id,
+                  Jogo.placar_casa, Jogo.placar_visitante, Jogo.status)
+        .where(Jogo.id.in_(jogo_ids), Jogo.status == 'Finalizado')
+    ).all()
+    return aplicar_lote((standings.Resultado(*jogo) for jogo in jogos), -1)
+
+
+def remover_time(time_id):
+    db.session.execute(delete(EstatisticaTemporada).where(EstatisticaTemporada.time_id == time_id))
+    db.session.execute(delete(EstatisticaConfronto).where(or_(EstatisticaConfronto.time_a_id == time_id,
+                                                              EstatisticaConfronto.time_b_id == time_id)))
+    db.session.execute(delete(EstatisticaTime).where(EstatisticaTime.time_id == time_id))
+
+
+def remover_campeonato(campeonato_id):
+    db.session.execute(delete(EstatisticaTemporada).where(EstatisticaTemporada.campeonato_id == campeonato_id))
+
+
+def preencher(conn):
+    # A migração 11 guarda a sua própria cópia destas consultas; mudanças aqui valem para
+    # "flask rebuild-estatisticas" e restaurações, sem alterar o histórico do esquema.
+    for tabela in ('estatistica_time', 'estatistica_temporada', 'estatistica_confronto'):
+        conn.execute(text(f'DELETE FROM {tabela}'))
+
+    conn.execute(text(TEMPORADAS))
+    conn.execute(text(TIMES))
+    conn.execute(text(CONFRONTOS))
+
+    for coluna, margem, gols in (('maior_vitoria_id', 'gp - gc', 'gp'), ('maior_derrota_id', 'gc - gp', 'gc')):
+        recordes = [{'time_id': time_id, 'jogo_id': jogo_id}
+                    for time_id, jogo_id in conn.execute(text(RECORDES.format(margem=margem, gols=gols)))]
+        if recordes:
+            conn.execute(text(f'UPDATE estatistica_time SET {coluna} = :jogo_id WHERE time_id = :time_id'),
+                         recordes)
+
+
+def reconstruir():
+    preencher(db.session.connection())
+
+
+def _resumo(valores):
+    total = {coluna: valores[coluna] for coluna in standings.DIVISAO}
+    casa = {coluna: valores[f'{coluna}_casa'] for coluna in standings.DIVISAO}
+    fora = {coluna: total[coluna] - casa[coluna] for coluna in standings.DIVISAO}
+    for campanha in (total, casa, fora):
+        jogos = campanha['jogos_disputados']
+        campanha['saldo_gols'] = campanha['gols_pro'] - campanha['gols_contra']
+        campanha['media_gols_pro'] = round(campanha['gols_pro'] / jogos, 2) if jogos else 0
+        campanha['media_gols_contra'] = round(campanha['gols_contra'] / jogos, 2) if jogos else 0
+    return dict(total, casa=casa, fora=fora)
+
+
+def _vazio():
+    return dict.fromkeys(COLUNAS, 0)
+
+
+def _jogos(ids):
+    ids = [jogo_id for jogo_id in ids if jogo_id is not None]
+    if not ids:
+        return {}
+    casa, visitante = aliased(Time), aliased(Time)
+    linhas = db.session.execute(
+        db.select(Jogo.id, Jogo.campeonato_id, Campeonato.nome.label('campeonato'), Jogo.data_hora,
+                  Jogo.time_casa_id, casa.nome.label('time_casa'),
+                  Jogo.time_visitante_id, visitante.nome.label('time_visitante'),
+                  Jogo.placar_casa, Jogo.placar_visitante, Jogo.status)
+        .join(Campeonato, Campeonato.id == Jogo.campeonato_id)
+        .join(casa, casa.id == Jogo.time_casa_id)
+        .join(visitante, visitante.id == Jogo.time_visitante_id)
+        .where(Jogo.id.in_(ids))
+    )
+    return {linha.id: dict(linha._mapping) for linha in linhas}
+
+
+def perfil_time(time_id, adversarios=ADVERSARIOS):
+    linha = db.session.execute(
+        db.select(Time.id, Time.nome, EstatisticaTime)
+        .outerjoin(EstatisticaTime, EstatisticaTime.time_id == Time.id)
+        .where(Time.id == time_id)
+    ).first()
+    if linha is None:
+        return None
+    _, nome, estatisticas = linha
+    valores = {coluna: getattr(estatisticas, coluna) for coluna in COLUNAS} if estatisticas else _vazio()
+
+    temporadas = [
+        dict(_resumo({coluna: getattr(temporada, coluna) for coluna in COLUNAS}),
+             campeonato_id=temporada.campeonato_id, campeonato=campeonato)
+        for temporada, campeonato in db.session.execute(
+            db.select(EstatisticaTemporada, Campeonato.nome)
+            .join(Campeonato, Campeonato.id == EstatisticaTemporada.campeonato_id)
+            .where(EstatisticaTemporada.time_id == time_id)
+            .order_by(Campeonato.data_inicio.desc(), Campeonato.id.desc())
+        )
+    ]
+
+    recordes = _jogos((estatisticas.maior_vitoria_id, estatisticas.maior_derrota_id) if estatisticas else ())
+
+    a_e_o_time = EstatisticaConfronto.time_a_id == time_id
+    adversario_id = db.case((a_e_o_time, EstatisticaConfronto.time_b_id), else_=EstatisticaConfronto.time_a_id)
+    adversario = aliased(Time)
+    confrontos = [
+        {
+            'time_id': outro_id, 'nome': outro_nome, 'jogos_disputados': confronto.jogos_disputados,
+            'vitorias': confronto.vitorias_a if confronto.time_a_id == time_id else confronto.vitorias_b,
+            'empates': confronto.empates,
+            'derrotas': confronto.vitorias_b if confronto.time_a_id == time_id else confronto.vitorias_a,
+        }
+        for confronto, outro_id, outro_nome in db.session.execute(
+            db.select(EstatisticaConfronto, adversario.id, adversario.nome)
+            .join(adversario, adversario.id == adversario_id)
+            .where(or_(a_e_o_time, EstatisticaConfronto.time_b_id == time_id))
+            .order_by(EstatisticaConfronto.jogos_disputados.desc(), adversario.nome)
+            .limit(adversarios)
+        )
+    ]
+
+    return dict(
+        _resumo(valores), time_id=time_id, nome=nome, temporadas=temporadas, adversarios=confrontos,
+        maior_vitoria=recordes.get(estatisticas.maior_vitoria_id) if estatisticas else None,
+        maior_derrota=recordes.get(estatisticas.maior_derrota_id) if estatisticas else None,
+    )
+
+
+def confronto(time_id, adversario_id, ultimos=ULTIMOS_CONFRONTOS):
+    (time_a_id, time_b_id), _, _ = _par(time_id, adversario_id, 0, 0)
+    nomes = dict(db.session.execute(
+        db.select(Time.id, Time.nome).where(Time.id.in_((time_id, adversario_id)))
+    ).all())
+    if len(nomes) != 2:
+        return None
+
+    linha = db.session.get(EstatisticaConfronto, (time_a_id, time_b_id))
+    valores = {coluna: getattr(linha, coluna) for coluna in CONFRONTO} if linha else dict.fromkeys(CONFRONTO, 0)
+    invertido = time_id != time_a_id
+
+    recentes = db.session.execute(
+        db.select(Jogo.id)
+        .where(or_(
+            (Jogo.time_casa_id == time_id) & (Jogo.time_visitante_id == adversario_id),
+            (Jogo.time_casa_id == adversario_id) & (Jogo.time_visitante_id == time_id),
+        ), Jogo.status == 'Finalizado')
+        .order_by(Jogo.data_hora.desc(), Jogo.id.desc())
+        .limit(ultimos)
+    ).scalars().all()
+    jogos = _jogos(recentes)
+
+    return {
+        'time': {'id': time_id, 'nome': nomes[time_id],
+                 'vitorias': valores['vitorias_b' if invertido else 'vitorias_a'],
+                 'gols': valores['gols_b' if invertido else 'gols_a']},
+        'adversario': {'id': adversario_id, 'nome': nomes[adversario_id],
+                       'vitorias': valores['vitorias_a' if invertido else 'vitorias_b'],
+                       'gols': valores['gols_a' if invertido else 'gols_b']},
+        'jogos_disputados': valores['jogos_disputados'],
+        'empates': valores['empates'],
+        'ultimos_jogos': [jogos[jogo_id] for jogo_id in recentes],
+    }
@@ -0,0 +1,121 @@
+import json
+import time
+from datetime import date, datetime
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import insert, select, delete, func, text
+from . import db, organizacoes
+from .models import Evento
+
+LOTE = 500
+OCULTOS = {'organizacao_id', 'senha_hash'}
+TRAVA_POSTGRES = 0x5349474f
+COLUNAS = (Evento.id, Evento.tipo, Evento.entidade, Evento.entidade_id, Evento.usuario_id,
+           Evento.criado_em, Evento.dados)
+
+
+def _valor(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    raise TypeError(f'Tipo não serializável: {type(valor).__name__}')
+
+
+def dumps(dados):
+    return json.dumps(dados, separators=(',', ':'), ensure_ascii=False, default=_valor)
+
+
+def dados_de(objeto):
+    return {coluna.key: getattr(objeto, coluna.key) for coluna in objeto.__table__.columns
+            if coluna.key not in OCULTOS}
+
+
+def _autor():
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def linhas(tipo, itens):
+    entidade = tipo.split('.', 1)[0]
+    usuario_id = _autor()
+    agora = datetime.now()
+    return [{'tipo': tipo, 'entidade': entidade, 'entidade_id': entidade_id, 'usuario_id': usuario_id,
+             'dados': dumps(dados or {}), 'criado_em': agora}
+            for entidade_id, dados in itens]
+
+
+def _ordenar_commits():
+    # No PostgreSQL transações concorrentes podem confirmar ids fora de ordem e um consumidor
+    # pularia eventos; a trava vale até o commit. O SQLite já serializa as escritas.
+    if db.session.get_bind(Evento).dialect.name == 'postgresql':
+        db.session.execute(text('SELECT pg_advisory_xact_lock(:chave)'), {'chave': TRAVA_POSTGRES})
+
+
+def registrar_lote(tipo, itens):
+    itens = list(itens)
+    if not itens:
+        return
+    _ordenar_commits()
+    for inicio in range(0, len(itens), LOTE):
+        db.session.execute(insert(Evento), linhas(tipo, itens[inicio:inicio + LOTE]))
+
+
+def registrar(tipo, entidade_id=None, dados=None):
+    registrar_lote(tipo, [(entidade_id, dados)])
+
+
+def registrar_objeto(tipo, objeto):
+    db.session.flush()
+    registrar(tipo, objeto.id, dados_de(objeto))
+
+
+def ler(desde=0, limite=LOTE, entidades=None, entidade_id=None):
+    consulta = select(*COLUNAS).where(Evento.id > desde).order_by(Evento.id).limit(limite)
+    if entidades:
+        consulta = consulta.where(Evento.entidade.in_(entidades))
+    if entidade_id is not None:
+        consulta = consulta.where(Evento.entidade_id == entidade_id)
+    return db.session.execute(consulta).all()
+
+
+def ultimo():
+    return db.session.execute(select(func.max(Evento.id))).scalar() or 0
+
+
+def serializar(evento):
+    return {
+        'id': evento.id,
+        'tipo': evento.tipo,
+        'entidade': evento.entidade,
+        'entidade_id': evento.entidade_id,
+        'usuario_id': evento.usuario_id,
+        'criado_em': evento.criado_em,
+        'dados': json.loads(evento.dados),
+    }
+
+
+def seguir(desde=0, limite=LOTE, entidades=None, acompanhar=False, intervalo=1.0):
+    while True:
+        lote = ler(desde, limite, entidades)
+        # Encerra a transação de leitura para a próxima consulta enxergar os novos commits.
+        db.session.rollback()
+        if lote:
+            yield lote
+            desde = lote[-1].id
+        elif acompanhar:
+            time.sleep(intervalo)
+        else:
+            return
+
+
+def podar(antes_de):
+    organizacao_id = organizacoes.atual().id
+    ate = db.session.execute(select(func.max(Evento.id)).where(Evento.criado_em < antes_de)).scalar()
+    if ate is None:
+        return 0
+    removidos = db.session.execute(
+        delete(Evento).where(Evento.organizacao_id == organizacao_id, Evento.id <= ate)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    registrar('evento.podado', None, {'ate': ate, 'removidos': removidos})
+    return removidos
@@ -0,0 +1,291 @@
+import csv
+import gzip
+import io
+import json
+import zipfile
+from contextlib import contextmanager
+from datetime import date, datetime
+from sqlalchemy import select, insert, func, text
+from . import db, organizacoes
+from .models import Time, Campeonato, Jogo, Evento, campeonato_times
+from . import migrations, standings, estatisticas, busca, eventos, historico
+
+LOTE = 5000
+FORMATOS = ('csv', 'ndjson', 'colunar')
+EXTENSOES = {'csv': 'csv', 'ndjson': 'ndjson', 'colunar': 'col.gz'}
+MANIFESTO = 'manifesto.json'
+
+TABELAS = (Time.__table__, Campeonato.__table__, campeonato_times, Jogo.__table__)
+
+
+class ErroSnapshot(Exception):
+    pass
+
+
+def _valor(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _conversor(coluna):
+    tipo = coluna.type.python_type
+    if tipo is datetime:
+        return datetime.fromisoformat
+    if tipo is date:
+        return date.fromisoformat
+    if tipo is int:
+        return int
+    return str
+
+
+class _Saida:
+    def __init__(self, destino=None):
+        self.destino = destino
+        self.partes = []
+
+    def write(self, dados):
+        if self.destino is not None:
+            return self.destino.write(dados)
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        if self.destino is not None:
+            self.destino.flush()
+
+    def esvaziar(self):
+        dados = b''.join(self.partes)
+        self.partes.clear()
+        return dados
+
+
+@contextmanager
+def conexao_consistente():
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+            conn.exec_driver_sql('BEGIN')
+            try:
+                yield conn
+            finally:
+                conn.exec_driver_sql('ROLLBACK')
+        else:
+            conn = conn.execution_options(isolation_level='REPEATABLE READ')
+            with conn.begin():
+                yield conn
+
+
+def _consulta(tabela, organizacao_id):
+    consulta = select(tabela).order_by(*tabela.primary_key.columns)
+    if 'organizacao_id' in tabela.c:
+        return consulta.where(tabela.c.organizacao_id == organizacao_id)
+    return consulta.where(tabela.c.campeonato_id.in_(
+        select(Campeonato.id).where(Campeonato.organizacao_id == organizacao_id)))
+
+
+def _lotes(conn, tabela, tamanho):
+    resultado = conn.execution_options(stream_results=True, yield_per=tamanho) \
+        .execute(_consulta(tabela, organizacoes.atual().id))
+    for lote in resultado.partitions(tamanho):
+        yield [[_valor(valor) for valor in linha] for linha in lote]
+
+
+def _csv(colunas, lotes):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator='\n')
+    escritor.writerow(colunas)
+    for lote in lotes:
+        escritor.writerows(lote)
+        yield buffer.getvalue().encode('utf-8'), len(lote)
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _ndjson(colunas, lotes):
+    for lote in lotes:
+        dados = ''.join(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) + '\n' for linha in lote)
+        yield dados.encode('utf-8'), len(lote)
+
+
+def _colunar(colunas, lotes):
+    for lote in lotes:
+        grupo = {coluna: list(valores) for coluna, valores in zip(colunas, zip(*lote))}
+        yield gzip.compress(json.dumps(grupo, ensure_ascii=False).encode('utf-8') + b'\n', 6), len(lote)
+
+
+ESCRITORES = {'csv': _csv, 'ndjson': _ndjson, 'colunar': _colunar}
+
+
+def exportar(formato, destino=None, tamanho_lote=LOTE):
+    if formato not in FORMATOS:
+        raise ErroSnapshot(f'Formato desconhecido: {formato}')
+
+    saida = _Saida(destino)
+    compressao = zipfile.ZIP_STORED if formato == 'colunar' else zipfile.ZIP_DEFLATED
+    manifesto = {'formato': formato, 'criado_em': datetime.now().isoformat(timespec='seconds'),
+                 'organizacao': organizacoes.atual().slug, 'tabelas': {}}
+
+    with conexao_consistente() as conn, zipfile.ZipFile(saida, 'w', compression=compressao) as arquivo:
+        manifesto['versao_esquema'] = migrations.versao_atual(conn)
+
+        for tabela in TABELAS:
+            colunas = [coluna.name for coluna in tabela.columns]
+            nome = f'{tabela.name}.{EXTENSOES[formato]}'
+            linhas = 0
+            with arquivo.open(nome, 'w', force_zip64=True) as membro:
+                for dados, quantidade in ESCRITORES[formato](colunas, _lotes(conn, tabela, tamanho_lote)):
+                    membro.write(dados)
+                    linhas += quantidade
+                    yield saida.esvaziar()
+            manifesto['tabelas'][tabela.name] = {'arquivo': nome, 'colunas': colunas, 'linhas': linhas}
+            yield saida.esvaziar()
+
+        arquivo.writestr(MANIFESTO, json.dumps(manifesto, ensure_ascii=False, indent=2))
+    yield saida.esvaziar()
+
+
+def exportar_para_arquivo(caminho, formato, tamanho_lote=LOTE):
+    with open(caminho, 'wb') as destino:
+        for _ in exportar(formato, destino, tamanho_lote):
+            pass
+    with zipfile.ZipFile(caminho) as arquivo:
+        return ler_manifesto(arquivo)
+
+
+def _ler_csv(membro):
+    leitor = csv.reader(io.TextIOWrapper(membro, encoding='utf-8', newline=''))
+    cabecalho = next(leitor, [])
+    for linha in leitor:
+        yield {coluna: (valor if valor != '' else None) for coluna, valor in zip(cabecalho, linha)}
+
+
+def _ler_ndjson(membro):
+    for linha in io.TextIOWrapper(membro, encoding='utf-8'):
+        if linha.strip():
+            yield json.loads(linha)
+
+
+def _ler_colunar(membro):
+    for linha in gzip.GzipFile(fileobj=membro):
+        grupo = json.loads(linha)
+        nomes = list(grupo)
+        for valores in zip(*grupo.values()):
+            yield dict(zip(nomes, valores))
+
+
+LEITORES = {'csv': _ler_csv, 'ndjson': _ler_ndjson, 'colunar': _ler_colunar}
+
+
+def ler_manifesto(arquivo):
+    try:
+        manifesto = json.loads(arquivo.read(MANIFESTO))
+    except KeyError:
+        raise ErroSnapshot('Arquivo sem manifesto; não é um snapshot do SIGTO.')
+    if manifesto.get('formato') not in FORMATOS:
+        raise ErroSnapshot(f"Formato desconhecido: {manifesto.get('formato')}")
+    return manifesto
+
+
+def banco_vazio(conn, organizacao_id):
+    return all(conn.execute(select(func.count()).select_from(_consulta(tabela, organizacao_id).subquery())).scalar() == 0
+               for tabela in TABELAS)
+
+
+def _ajustar_sequencias(conn):
+    if conn.dialect.name != 'postgresql':
+        return
+    for tabela in TABELAS:
+        if 'id' in tabela.columns:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{tabela.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {tabela.name}), 0) + 1, false)"
+            ))
+
+
+def _deslocamentos(conn):
+    # Em banco compartilhado os ids das demais organizações já estão ocupados: os ids do snapshot
+    # são somados ao maior id de cada tabela (zero num banco vazio, que mantém os ids originais).
+    return {tabela.name: conn.execute(select(func.coalesce(func.max(tabela.c.id), 0))).scalar()
+            for tabela in TABELAS if 'id' in tabela.c}
+
+
+def _remapear(tabela, deslocamentos):
+    colunas = {}
+    for coluna in tabela.columns:
+        if coluna.name == 'id':
+            colunas['id'] = deslocamentos[tabela.name]
+        for chave in coluna.foreign_keys:
+            if chave.column.table.name in deslocamentos:
+                colunas[coluna.name] = deslocamentos[chave.column.table.name]
+    return {coluna: deslocamento for coluna, deslocamento in colunas.items() if deslocamento}
+
+
+def restaurar(caminho, tamanho_lote=LOTE, informar=None):
+    with zipfile.ZipFile(caminho) as arquivo:
+        manifesto = ler_manifesto(arquivo)
+        leitor = LEITORES[manifesto['formato']]
+        organizacao_id = organizacoes.atual().id
+
+        with db.engine.begin() as conn:
+            if not banco_vazio(conn, organizacao_id):
+                raise ErroSnapshot('A organização já possui times, campeonatos ou jogos. Use uma organização vazia.')
+            if manifesto.get('versao_esquema', 0) > migrations.versao_atual(conn):
+                raise ErroSnapshot('Snapshot gerado com um esquema mais novo; execute "flask db upgrade" antes.')
+            if busca.indice_disponivel():
+                busca.remover_gatilhos(conn)
+            deslocamentos = _deslocamentos(conn)
+
+            for tabela in TABELAS:
+                info = manifesto['tabelas'].get(tabela.name)
+                if info is None:
+                    raise ErroSnapshot(f'Tabela ausente no snapshot: {tabela.name}')
+
+                conversores = {coluna.name: _conversor(coluna) for coluna in tabela.columns
+                               if coluna.name in info['colunas'] and coluna.name != 'organizacao_id'}
+                fixos = {'organizacao_id': organizacao_id} if 'organizacao_id' in tabela.c else {}
+                remapear = _remapear(tabela, deslocamentos)
+                gravadas = 0
+                lote = []
+                with arquivo.open(info['arquivo']) as membro:
+                    for registro in leitor(membro):
+                        linha = {coluna: None if registro.get(coluna) is None else converter(registro[coluna])
+                                 for coluna, converter in conversores.items()}
+                        for coluna, deslocamento in remapear.items():
+                            if linha.get(coluna) is not None:
+                                linha[coluna] += deslocamento
+                        linha.update(fixos)
+                        lote.append(linha)
+                        if len(lote) >= tamanho_lote:
+                            conn.execute(insert(tabela), lote)
+                            gravadas += len(lote)
+                            lote = []
+                if lote:
+                    conn.execute(insert(tabela), lote)
+                    gravadas += len(lote)
+
+                if gravadas != info['linhas']:
+                    raise ErroSnapshot(f"{tabela.name}: {gravadas} linha(s) lidas, manifesto indica {info['linhas']}.")
+                if informar:
+                    informar(f'{tabela.name}: {gravadas} linha(s)')
+
+            _ajustar_sequencias(conn)
+            conn.execute(insert(Evento.__table__), eventos.linhas('base.restaurada', [(None, {
+                'criado_em': manifesto['criado_em'],
+                'linhas': {tabela: info['linhas'] for tabela, info in manifesto['tabelas'].items()},
+            })]))
+
+    if busca.indice_disponivel():
+        busca.reindexar()
+    return manifesto
+
+
+def reconstruir_derivados(informar=None):
+    for campeonato in Campeonato.query.order_by(Campeonato.id):
+        standings.reconstruir_tabela(campeonato)
+    estatisticas.reconstruir()
+    db.session.commit()
+    for campeonato_id in db.session.execute(db.select(Campeonato.id).order_by(Campeonato.id)).scalars().all():
+        historico.garantir_historico(campeonato_id)
+    if informar:
+        informar('Classificações, histórico e estatísticas reconstruídos.')
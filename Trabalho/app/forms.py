@@ -1,15 +1,132 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, SubmitField, DateField, TextAreaField, DateTimeField, IntegerField, SelectField, PasswordField
-from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, SubmitField, DateField, TextAreaField, DateTimeField, IntegerField, SelectField, PasswordField, BooleanField, HiddenField
+from wtforms.fields import Field
+from wtforms.validators import DataRequired, InputRequired, Length, Email, EqualTo, ValidationError, NumberRange
+from wtforms.widgets import HiddenInput, html_params
+from flask import url_for
+from markupsafe import Markup, escape
+from sqlalchemy import or_
+from . import db, cache, queries, standings, agenda
 from .models import Usuario, Time, Campeonato
-from wtforms_sqlalchemy.fields import QuerySelectField, QuerySelectMultipleField    
-from wtforms.widgets import ListWidget, CheckboxInput
 
-def get_campeonatos():
-    return Campeonato.query.all()
+STATUS_JOGO = [('Agendado', 'Agendado'), 
+               ('Em Andamento', 'Em Andamento'), 
+               ('Finalizado', 'Finalizado')]
 
-def get_times():
-    return Time.query.all()
+LIMITE_SELECT = 200
+
+def opcoes_campeonatos():
+    return cache.memorizar('opcoes:campeonatos', ['campeonatos'], lambda: [
+        tuple(linha) for linha in db.session.execute(
+            db.select(Campeonato.id, Campeonato.nome).order_by(Campeonato.nome))
+    ])
+
+def opcoes_times():
+    return cache.memorizar('opcoes:times', ['times'], lambda: [
+        tuple(linha) for linha in db.session.execute(
+            db.select(Time.id, Time.nome).order_by(Time.nome))
+    ])
+
+def opcoes_inscricao(campeonato_id):
+    return cache.memorizar(f'opcoes:inscricao:{campeonato_id}', [f'campeonato:{campeonato_id}', 'times'], lambda: [
+        tuple(linha) for linha in queries.times_disponiveis(campeonato_id, LIMITE_SELECT + 1)
+    ])
+
+def _campo_busca(nome, valor, url, **kwargs):
+    lista = f"{kwargs.get('id', nome)}-opcoes"
+    return (f'<input {html_params(type="search", name=nome, value=valor, list=lista, autocomplete="off", data_busca=url, **kwargs)}>'
+            f'<datalist id="{lista}"></datalist>')
+
+class SelecaoWidget:
+
+    def __call__(self, field, **kwargs):
+        kwargs.setdefault('id', field.id)
+        opcoes = field.opcoes()
+
+        if field.busca is not None and len(opcoes) > LIMITE_SELECT:
+            valor = field.data.nome if field.data is not None else field.valor_bruto or ''
+            if field.vazio is not None:
+                kwargs.setdefault('placeholder', field.vazio)
+            return Markup(_campo_busca(field.name, valor, url_for(field.busca), **kwargs))
+
+        html = [f'<select {html_params(name=field.name, **kwargs)}>']
+        if field.vazio is not None:
+            html.append(f'<option value="">{escape(field.vazio)}</option>')
+        for valor, rotulo in opcoes:
+            html.append(f'<option {html_params(value=valor, selected=str(valor) == field._value())}>{escape(rotulo)}</option>')
+        html.append('</select>')
+        return Markup(''.join(html))
+
+class ModeloField(Field):
+    widget = SelecaoWidget()
+
+    def __init__(self, label=None, validators=None, modelo=None, opcoes=None, busca=None, vazio=None, **kwargs):
+        super(ModeloField, self).__init__(label, validators, **kwargs)
+        self.modelo = modelo
+        self.opcoes = opcoes
+        self.busca = busca
+        self.vazio = vazio
+        self.valor_bruto = None
+
+    def _value(self):
+        return str(self.data.id) if self.data is not None else ''
+
+    def process_formdata(self, valuelist):
+        self.valor_bruto = valuelist[0].strip() if valuelist else ''
+        self.data = None
+        if self.valor_bruto.isdigit():
+            self.data = db.session.get(self.modelo, int(self.valor_bruto))
+        if self.data is None and self.valor_bruto and self.busca is not None:
+            self.data = self.modelo.query.filter_by(nome=self.valor_bruto).first()
+
+    def pre_validate(self, form):
+        if self.valor_bruto and self.data is None:
+            raise ValidationError(f'{self.label.text}: registro não encontrado.')
+
+class InscricaoWidget:
+
+    def __call__(self, field, **kwargs):
+        opcoes = opcoes_inscricao(field.campeonato_id)
+        html = [f'<ul {html_params(id=field.id, **kwargs)}>']
+        for numero, (valor, rotulo) in enumerate(opcoes[:LIMITE_SELECT]):
+            id_opcao = f'{field.id}-{numero}'
+            html.append(f'<li><input {html_params(type="checkbox", name=field.name, value=valor, id=id_opcao)}> '
+                        f'<label for="{id_opcao}">{escape(rotulo)}</label></li>')
+        html.append('</ul>')
+
+        if len(opcoes) > LIMITE_SELECT:
+            url = url_for('main.buscar_times', campeonato=field.campeonato_id)
+            html.insert(0, _campo_busca(field.name, '', url, id=f'{field.id}-busca',
+                                        placeholder='Buscar time...', data_multiplo=field.id))
+        return Markup(''.join(html))
+
+class InscricaoField(Field):
+    widget = InscricaoWidget()
+
+    def __init__(self, label=None, validators=None, **kwargs):
+        super(InscricaoField, self).__init__(label, validators, **kwargs)
+        self.campeonato_id = None
+        self.valores = set()
+
+    def process_formdata(self, valuelist):
+        self.valores = {valor.strip() for valor in valuelist if valor.strip()}
+
+    def pre_validate(self, form):
+        self.data = []
+        if not self.valores:
+            return
+
+        ids = {int(valor) for valor in self.valores if valor.isdigit()}
+        nomes = self.valores - {str(id) for id in ids}
+        self.data = Time.query.filter(
+            or_(Time.id.in_(ids), Time.nome.in_(nomes)),
+            queries.nao_inscrito(self.campeonato_id)
+        ).order_by(Time.nome).all()
+
+        encontrados = {str(time.id) for time in self.data} | {time.nome for time in self.data}
+        if self.valores - encontrados:
+            raise ValidationError('Algum time selecionado não existe ou já está inscrito.')
 
 class TimeForm(FlaskForm):
     nome = StringField('Nome do Time', 
@@ -17,23 +134,12 @@ class TimeForm(FlaskForm):
     submit = SubmitField('Cadastrar Time')
 
 class InscreverTimeForm(FlaskForm):
-    times = QuerySelectMultipleField(
-        'Selecionar Times para Inscrever',
-        get_label='nome',
-        widget=ListWidget(prefix_label=False),
-        option_widget=CheckboxInput()
-    )
+    times = InscricaoField('Selecionar Times para Inscrever')
     submit_inscricao = SubmitField('Inscrever Times Selecionados')
 
     def __init__(self, campeonato_id, *args, **kwargs):
         super(InscreverTimeForm, self).__init__(*args, **kwargs)
-
-        campeonato = Campeonato.query.get(campeonato_id)
-        times_inscritos_ids = [time.id for time in campeonato.times]
-
-        self.times.query_factory = lambda: Time.query.filter(
-            Time.id.notin_(times_inscritos_ids)
-        ).order_by(Time.nome).all()
+        self.times.campeonato_id = campeonato_id
 
 class CampeonatoForm(FlaskForm):
     nome = StringField('Nome do Campeonato', 
@@ -43,30 +149,48 @@ class CampeonatoForm(FlaskForm):
     data_fim = DateField('Data de Fim', format='%Y-%m-%d',
                          validators=[DataRequired()])
     regras = TextAreaField('Regras (opcional)')
+    pontos_vitoria = IntegerField('Pontos por Vitória', default=3,
+                                  validators=[InputRequired(), NumberRange(min=0, max=10)])
+    pontos_empate = IntegerField('Pontos por Empate', default=1,
+                                 validators=[InputRequired(), NumberRange(min=0, max=10)])
+    pontos_derrota = IntegerField('Pontos por Derrota', default=0,
+                                  validators=[InputRequired(), NumberRange(min=0, max=10)])
+    criterios_desempate = StringField('Critérios de Desempate (em ordem, separados por vírgula)',
+                                      default=','.join(standings.CRITERIOS_PADRAO),
+                                      validators=[Length(max=200)])
     submit_campeonato = SubmitField('Salvar Alterações do Campeonato')
 
+    def validate_criterios_desempate(self, campo):
+        nomes = [nome.strip() for nome in (campo.data or '').split(',') if nome.strip()]
+        invalidos = [nome for nome in nomes if nome not in standings.CRITERIOS]
+        if invalidos:
+            raise ValidationError(f'Critério(s) desconhecido(s): {", ".join(invalidos)}. '
+                                  f'Use: {", ".join(standings.CRITERIOS)}.')
+        if len(set(nomes)) != len(nomes):
+            raise ValidationError('Cada critério só pode aparecer uma vez.')
+        campo.data = ','.join(nomes)
+
 class JogoForm(FlaskForm):
-    campeonato = QuerySelectField(
+    campeonato = ModeloField(
         'Campeonato',
-        query_factory=get_campeonatos,
-        get_label='nome',
-        allow_blank=False,
+        modelo=Campeonato,
+        opcoes=opcoes_campeonatos,
         validators=[DataRequired()]
     )
     
-    time_casa = QuerySelectField(
+    time_casa = ModeloField(
         'Time da Casa',
-        query_factory=get_times,
-        get_label='nome',
-        allow_blank=False,
+        modelo=Time,
+        opcoes=opcoes_times,
+        busca='main.buscar_times',
         validators=[DataRequired()]
     )
     
-    time_visitante = QuerySelectField(
+    time_visitante = ModeloField(
         'Time Visitante',
-        query_factory=get_times,
-        get_label='nome',
-        allow_blank=False,
+        modelo=Time,
+        opcoes=opcoes_times,
+        busca='main.buscar_times',
         validators=[DataRequired()]
     )
     
@@ -76,13 +200,64 @@ class JogoForm(FlaskForm):
     placar_visitante = IntegerField('Placar Time Visitante', default=0)
     
     status = SelectField('Status', 
-                         choices=[('Agendado', 'Agendado'), 
-                                  ('Em Andamento', 'Em Andamento'), 
-                                  ('Finalizado', 'Finalizado')],
+                         choices=STATUS_JOGO,
                          validators=[DataRequired()])
+    versao = HiddenField()
     
     submit = SubmitField('Salvar Jogo')
 
+    def __init__(self, jogo=None, *args, **kwargs):
+        super(JogoForm, self).__init__(*args, **kwargs)
+        self.jogo = jogo
+
+    def validate_time_visitante(self, campo):
+        if campo.data is not None and campo.data == self.time_casa.data:
+            raise ValidationError('Um time não pode jogar contra si mesmo.')
+
+    def validate_data_hora(self, campo):
+        times = {time.id: time.nome for time in (self.time_casa.data, self.time_visitante.data) if time is not None}
+        if campo.data is None or not times:
+            return
+        if self.jogo is not None and campo.data == self.jogo.data_hora \
+                and set(times) == {self.jogo.time_casa_id, self.jogo.time_visitante_id}:
+            return
+
+        conflitos = agenda.conflitos(times, campo.data, ignorar_id=self.jogo.id if self.jogo else None)
+        if conflitos:
+            conflito = conflitos[0]
+            time_id = next(id for id in (conflito.time_casa_id, conflito.time_visitante_id) if id in times)
+            raise ValidationError(f'{times[time_id]} já tem um jogo em {conflito.data_hora:%d/%m/%Y %H:%M}; '
+                                  f'jogos do mesmo time precisam de {int(agenda.janela().total_seconds() // 60)} minutos de intervalo.')
+
+class FiltroJogosForm(FlaskForm):
+    class Meta:
+        csrf = False
+
+    campeonato = ModeloField('Campeonato', modelo=Campeonato, opcoes=opcoes_campeonatos,
+                             vazio='Todos os campeonatos')
+    time = ModeloField('Time', modelo=Time, opcoes=opcoes_times, busca='main.buscar_times',
+                       vazio='Todos os times')
+
+class PlacarForm(FlaskForm):
+    placar_casa = IntegerField('Casa', validators=[NumberRange(min=0)])
+    placar_visitante = IntegerField('Visitante', validators=[NumberRange(min=0)])
+    status = SelectField('Status', choices=STATUS_JOGO, validators=[DataRequired()])
+    versao = IntegerField(widget=HiddenInput(), validators=[NumberRange(min=1)])
+    submit = SubmitField('Salvar')
+
+class ImportarJogosForm(FlaskForm):
+    arquivo = FileField('Arquivo (CSV ou JSON)',
+                        validators=[FileRequired(), FileAllowed(['csv', 'json'], 'Envie um arquivo CSV ou JSON.')])
+    submit = SubmitField('Importar Jogos')
+
+class GerarJogosForm(FlaskForm):
+    inicio = DateTimeField('Data e Hora da Primeira Rodada', format='%Y-%m-%dT%H:%M',
+                           validators=[DataRequired()])
+    intervalo = IntegerField('Dias entre Rodadas', default=7,
+                             validators=[DataRequired(), NumberRange(min=1)])
+    ida_volta = BooleanField('Turno e Returno')
+    submit = SubmitField('Gerar Jogos')
+
 class AdminUserCreationForm(FlaskForm):
     nome = StringField('Nome',
                            validators=[DataRequired(), Length(min=2, max=100)])
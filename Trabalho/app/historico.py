@@ -0,0 +1,185 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from sqlalchemy import insert, func
+from sqlalchemy.exc import IntegrityError
+from . import db, standings
+from .jobs import fila
+from .models import Campeonato, Classificacao, ClassificacaoHistorico, Jogo, Time
+
+LOTE = 5000
+
+
+def _ultima_rodada(campeonato_id):
+    return db.session.execute(
+        db.select(ClassificacaoHistorico.rodada, ClassificacaoHistorico.data)
+        .where(ClassificacaoHistorico.campeonato_id == campeonato_id)
+        .order_by(ClassificacaoHistorico.rodada.desc())
+        .limit(1)
+    ).first()
+
+
+def _ultimo_jogo(campeonato_id):
+    return db.session.execute(
+        db.select(func.max(Jogo.data_hora))
+        .where(Jogo.campeonato_id == campeonato_id, Jogo.status == 'Finalizado')
+    ).scalar()
+
+
+def _estado_inicial(campeonato_id, ultima):
+    nomes = dict(db.session.execute(
+        db.select(Classificacao.time_id, Time.nome)
+        .join(Classificacao.time)
+        .where(Classificacao.campeonato_id == campeonato_id)
+    ).all())
+    estado = {time_id: dict.fromkeys(standings.COLUNAS, 0) for time_id in nomes}
+
+    if ultima is not None:
+        linhas = db.session.execute(
+            db.select(ClassificacaoHistorico)
+            .where(ClassificacaoHistorico.campeonato_id == campeonato_id,
+                   ClassificacaoHistorico.data == ultima.data)
+        ).scalars()
+        for linha in linhas:
+            if linha.time_id in estado:
+                estado[linha.time_id] = {coluna: getattr(linha, coluna) for coluna in standings.COLUNAS}
+    return nomes, estado
+
+
+def atualizar_historico(campeonato_id):
+    ultimo_jogo = _ultimo_jogo(campeonato_id)
+    ultima = _ultima_rodada(campeonato_id)
+    if ultimo_jogo is None or (ultima is not None and ultima.data >= ultimo_jogo.date()):
+        return 0
+
+    campeonato = db.session.get(Campeonato, campeonato_id)
+    regra, ordem = standings.pontuacao(campeonato), standings.criterios(campeonato)
+    nomes, estado = _estado_inicial(campeonato_id, ultima)
+
+    rodada, inicio = 0, None
+    if ultima is not None:
+        rodada, inicio = ultima.rodada, datetime.combine(ultima.data + timedelta(days=1), time.min)
+
+    pares = defaultdict(list)
+    if 'confronto_direto' in ordem and inicio is not None:
+        pares = standings.confrontos(campeonato_id, antes_de=inicio)
+
+    consulta = db.select(Jogo.data_hora, Jogo.time_casa_id, Jogo.time_visitante_id,
+                         Jogo.placar_casa, Jogo.placar_visitante) \
+        .where(Jogo.campeonato_id == campeonato_id, Jogo.status == 'Finalizado') \
+        .order_by(Jogo.data_hora, Jogo.id) \
+        .execution_options(yield_per=LOTE)
+    if inicio is not None:
+        consulta = consulta.where(Jogo.data_hora >= inicio)
+
+    novas, gravadas = [], 0
+    for data, jogos in groupby(db.session.execute(consulta), key=lambda jogo: jogo.data_hora.date()):
+        for _, casa_id, visitante_id, placar_casa, placar_visitante in jogos:
+            placar_casa, placar_visitante = placar_casa or 0, placar_visitante or 0
+            standings.registrar_confronto(pares, casa_id, visitante_id, placar_casa, placar_visitante)
+            if casa_id in estado and visitante_id in estado:
+                standings.somar(estado[casa_id],
+                                standings.contribuicao(placar_casa, placar_visitante, regra, casa=True))
+                standings.somar(estado[visitante_id],
+                                standings.contribuicao(placar_visitante, placar_casa, regra))
+
+        rodada += 1
+        linhas = {
+            time_id: standings.linha_tabela(dict(estatisticas, time_id=time_id, nome=nomes[time_id]), regra)
+            for time_id, estatisticas in estado.items()
+        }
+        for posicao, linha in enumerate(standings.ordenar(linhas, ordem, pares, regra), start=1):
+            novas.append(dict(estado[linha['time_id']], campeonato_id=campeonato_id, data=data,
+                              time_id=linha['time_id'], rodada=rodada, posicao=posicao))
+
+        if len(novas) >= LOTE:
+            db.session.execute(insert(ClassificacaoHistorico), novas)
+            gravadas += len(novas)
+            novas = []
+
+    if novas:
+        db.session.execute(insert(ClassificacaoHistorico), novas)
+        gravadas += len(novas)
+    return gravadas
+
+
+def garantir_historico(campeonato_id):
+    try:
+        gravadas = atualizar_historico(campeonato_id)
+        if gravadas:
+            db.session.commit()
+        return gravadas
+    except IntegrityError:
+        db.session.rollback()
+        return 0
+
+
+def agendar(*campeonato_ids):
+    # As fotografias por rodada são geradas fora das leituras: quem altera resultados agenda a tarefa.
+    for campeonato_id in dict.fromkeys(campeonato_ids):
+        fila.enfileirar('atualizar_historico', chave=f'atualizar_historico:{campeonato_id}',
+                        campeonato_id=campeonato_id)
+
+
+def rodadas(campeonato_id):
+    return [tuple(linha) for linha in db.session.execute(
+        db.select(ClassificacaoHistorico.rodada, ClassificacaoHistorico.data)
+        .where(ClassificacaoHistorico.campeonato_id == campeonato_id)
+        .group_by(ClassificacaoHistorico.rodada, ClassificacaoHistorico.data)
+        .order_by(ClassificacaoHistorico.rodada)
+    )]
+
+
+def _referencia(campeonato_id, data=None, rodada=None):
+    consulta = db.select(ClassificacaoHistorico.rodada, ClassificacaoHistorico.data) \
+        .where(ClassificacaoHistorico.campeonato_id == campeonato_id)
+    if rodada is not None:
+        consulta = consulta.where(ClassificacaoHistorico.rodada == rodada)
+    if data is not None:
+        consulta = consulta.where(ClassificacaoHistorico.data <= data)
+    return db.session.execute(consulta.order_by(ClassificacaoHistorico.rodada.desc()).limit(1)).first()
+
+
+def tabela_na_data(campeonato_id, data=None, rodada=None):
+    referencia = _referencia(campeonato_id, data, rodada)
+    if referencia is None:
+        return None, []
+
+    regra = standings.pontuacao(db.session.get(Campeonato, campeonato_id))
+    linhas = db.session.execute(
+        db.select(ClassificacaoHistorico, Time.nome)
+        .join(Time, Time.id == ClassificacaoHistorico.time_id)
+        .where(ClassificacaoHistorico.campeonato_id == campeonato_id,
+               ClassificacaoHistorico.rodada == referencia.rodada)
+        .order_by(ClassificacaoHistorico.posicao)
+    )
+    tabela = [
+        dict(standings.linha_tabela(dict({coluna: getattr(linha, coluna) for coluna in standings.COLUNAS},
+                                         time_id=linha.time_id, nome=nome), regra),
+             posicao=linha.posicao)
+        for linha, nome in linhas
+    ]
+    return {'rodada': referencia.rodada, 'data': referencia.data}, tabela
+
+
+def serie_de_posicoes(campeonato_id, time_ids=None):
+    consulta = db.select(ClassificacaoHistorico.time_id, Time.nome,
+                         ClassificacaoHistorico.posicao, ClassificacaoHistorico.pontos) \
+        .join(Time, Time.id == ClassificacaoHistorico.time_id) \
+        .where(ClassificacaoHistorico.campeonato_id == campeonato_id) \
+        .order_by(ClassificacaoHistorico.time_id, ClassificacaoHistorico.rodada)
+    if time_ids:
+        consulta = consulta.where(ClassificacaoHistorico.time_id.in_(time_ids))
+
+    times = []
+    for (time_id, nome), linhas in groupby(db.session.execute(consulta), key=lambda linha: linha[:2]):
+        posicoes, pontos = [], []
+        for _, _, posicao, pontos_na_rodada in linhas:
+            posicoes.append(posicao)
+            pontos.append(pontos_na_rodada)
+        times.append({'time_id': time_id, 'nome': nome, 'posicoes': posicoes, 'pontos': pontos})
+
+    return {
+        'rodadas': [{'rodada': rodada, 'data': data} for rodada, data in rodadas(campeonato_id)],
+        'times': times,
+    }
@@ -0,0 +1,175 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from . import db, cache, standings, estatisticas, eventos, agenda, placar, historico
+from .models import Jogo, Time, Campeonato, campeonato_times
+
+STATUS_VALIDOS = ('Agendado', 'Em Andamento', 'Finalizado')
+TAMANHO_LOTE = 1000
+
+
+class ErroImportacao(ValueError):
+
+    def __init__(self, erros):
+        super().__init__(f'{len(erros)} erro(s) na importação.')
+        self.erros = erros
+
+
+def ler_csv(arquivo):
+    if isinstance(arquivo, bytes):
+        arquivo = arquivo.decode('utf-8-sig')
+    if isinstance(arquivo, str):
+        arquivo = io.StringIO(arquivo)
+    return list(csv.DictReader(arquivo))
+
+
+def ler_json(arquivo):
+    if isinstance(arquivo, (bytes, str)):
+        dados = json.loads(arquivo)
+    else:
+        dados = json.load(arquivo)
+    if isinstance(dados, dict):
+        dados = dados.get('jogos', [])
+    return dados
+
+
+def ler_arquivo(conteudo, nome_arquivo):
+    if nome_arquivo.lower().endswith('.json'):
+        return ler_json(conteudo)
+    return ler_csv(conteudo)
+
+
+def _inteiro(valor, padrao=None):
+    if valor in (None, ''):
+        return padrao
+    return int(valor)
+
+
+def validar_jogos(linhas):
+    nomes = {linha.get(campo) for linha in linhas
+             for campo in ('time_casa', 'time_visitante') if linha.get(campo)}
+    ids_por_nome = dict(db.session.execute(
+        db.select(Time.nome, Time.id).where(Time.nome.in_(nomes))
+    ).all()) if nomes else {}
+
+    jogos = []
+    erros = []
+    for numero, linha in enumerate(linhas, start=1):
+        try:
+            jogo = {
+                'campeonato_id': _inteiro(linha.get('campeonato_id')),
+                'time_casa_id': _inteiro(linha.get('time_casa_id')) or ids_por_nome.get(linha.get('time_casa')),
+                'time_visitante_id': (_inteiro(linha.get('time_visitante_id'))
+                                      or ids_por_nome.get(linha.get('time_visitante'))),
+                'data_hora': (linha['data_hora'] if isinstance(linha.get('data_hora'), datetime)
+                              else datetime.fromisoformat(str(linha.get('data_hora')))),
+                'placar_casa': _inteiro(linha.get('placar_casa'), 0),
+                'placar_visitante': _inteiro(linha.get('placar_visitante'), 0),
+                'status': linha.get('status') or 'Agendado',
+            }
+        except (TypeError, ValueError) as erro:
+            erros.append((numero, f'Valor inválido: {erro}'))
+            continue
+
+        if None in (jogo['campeonato_id'], jogo['time_casa_id'], jogo['time_visitante_id']):
+            erros.append((numero, 'Campeonato ou times não informados ou inexistentes.'))
+        elif jogo['time_casa_id'] == jogo['time_visitante_id']:
+            erros.append((numero, 'Um time não pode jogar contra si mesmo.'))
+        elif jogo['status'] not in STATUS_VALIDOS:
+            erros.append((numero, f"Status inválido: {jogo['status']}."))
+        else:
+            jogos.append((numero, jogo))
+
+    campeonato_ids = {jogo['campeonato_id'] for _, jogo in jogos}
+    inscricoes = set(db.session.execute(
+        db.select(campeonato_times.c.campeonato_id, campeonato_times.c.time_id)
+        .join(Campeonato, Campeonato.id == campeonato_times.c.campeonato_id)
+        .where(campeonato_times.c.campeonato_id.in_(campeonato_ids))
+    ).all()) if campeonato_ids else set()
+
+    inscritos = []
+    for numero, jogo in jogos:
+        for campo in ('time_casa_id', 'time_visitante_id'):
+            if (jogo['campeonato_id'], jogo[campo]) not in inscricoes:
+                erros.append((numero, f"Time {jogo[campo]} não está inscrito no campeonato {jogo['campeonato_id']}."))
+                break
+        else:
+            inscritos.append((numero, jogo))
+
+    conflitos = agenda.conflitos_lote(inscritos)
+    erros += conflitos
+    em_conflito = {numero for numero, _ in conflitos}
+    validos = [jogo for numero, jogo in inscritos if numero not in em_conflito]
+
+    return validos, sorted(erros)
+
+
+def importar_jogos(linhas, tamanho_lote=TAMANHO_LOTE):
+    jogos, erros = validar_jogos(linhas)
+    if erros:
+        raise ErroImportacao(erros)
+
+    for inicio in range(0, len(jogos), tamanho_lote):
+        lote = jogos[inicio:inicio + tamanho_lote]
+        ids = db.session.execute(insert(Jogo).returning(Jogo.id, sort_by_parameter_order=True), lote).scalars()
+        eventos.registrar_lote('jogo.criado', ((jogo_id, {'id': jogo_id, **jogo}) for jogo_id, jogo in zip(ids, lote)))
+
+    time_ids = estatisticas.aplicar_lote(standings.Resultado(**jogo) for jogo in jogos)
+    estatisticas.recalcular_recordes(time_ids)
+
+    campeonato_ids = sorted({jogo['campeonato_id'] for jogo in jogos if jogo['status'] == 'Finalizado'})
+    for campeonato in Campeonato.query.filter(Campeonato.id.in_(campeonato_ids)):
+        standings.reconstruir_tabela(campeonato)
+
+    return jogos
+
+
+def publicar_importacao(jogos):
+    # Depois do commit: vale para a tela, a fila e os comandos.
+    campeonato_ids = sorted({jogo['campeonato_id'] for jogo in jogos})
+    cache.invalidar('jogos', *(f'campeonato:{campeonato_id}' for campeonato_id in campeonato_ids))
+    placar.publicar_novos(campeonato_ids)
+    historico.agendar(*campeonato_ids)
+
+
+def gerar_rodadas(time_ids, ida_e_volta=False):
+    # Tabelas de Berger: o último fica fixo e os demais giram uma posição por rodada. Os mandos alternam,
+    # então cada time tem no máximo um jogo de diferença entre casa e fora e nunca três seguidos no mesmo mando.
+    times = list(time_ids)
+    if len(times) % 2:
+        times.append(None)
+
+    giro = len(times) - 1
+    rodadas = []
+    for numero in range(giro):
+        confrontos = []
+        for i in range(len(times) // 2):
+            casa = times[(numero + i) % giro]
+            visitante = times[giro if i == 0 else (numero - i) % giro]
+            if (numero if i == 0 else i) % 2:
+                casa, visitante = visitante, casa
+            if casa is not None and visitante is not None:
+                confrontos.append((casa, visitante))
+        rodadas.append(confrontos)
+
+    if ida_e_volta:
+        rodadas += [[(visitante, casa) for casa, visitante in rodada] for rodada in rodadas]
+    return rodadas
+
+
+def gerar_tabela_de_jogos(campeonato, inicio, intervalo_dias=7, ida_e_volta=False):
+    time_ids = sorted(time.id for time in campeonato.times)
+    jogos = []
+    for numero, rodada in enumerate(gerar_rodadas(time_ids, ida_e_volta)):
+        data_hora = inicio + timedelta(days=numero * intervalo_dias)
+        for casa, visitante in rodada:
+            jogos.append({
+                'campeonato_id': campeonato.id,
+                'time_casa_id': casa,
+                'time_visitante_id': visitante,
+                'data_hora': data_hora,
+                'status': 'Agendado',
+            })
+    return jogos
@@ -0,0 +1,231 @@
+import json
+import os
+import signal
+import socket
+import time
+import traceback
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_
+from . import db, organizacoes
+from .models import Tarefa
+
+PENDENTE = 'Pendente'
+EXECUTANDO = 'Executando'
+CONCLUIDA = 'Concluída'
+FALHOU = 'Falhou'
+ATIVAS = (PENDENTE, EXECUTANDO)
+TODAS = {'todas_organizacoes': True}
+
+
+class ErroDefinitivo(Exception):
+    pass
+
+
+def _agora():
+    return datetime.now()
+
+
+class Execucao:
+
+    def __init__(self, fila, tarefa_id):
+        self.fila = fila
+        self.tarefa_id = tarefa_id
+        self.callbacks = []
+
+    def progresso(self, feitos, total=100, mensagem=None):
+        percentual = min(99, int(100 * feitos / total)) if total else 0
+        db.session.execute(
+            update(Tarefa)
+            .where(Tarefa.id == self.tarefa_id)
+            .values(progresso=percentual, mensagem=mensagem,
+                    bloqueado_ate=_agora() + timedelta(seconds=self.fila.lease))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def ao_concluir(self, funcao):
+        self.callbacks.append(funcao)
+
+
+class Fila:
+
+    def __init__(self):
+        self.tipos = {}
+        self.modo = 'fila'
+        self.tentativas = 3
+        self.espera_base = 5
+        self.intervalo = 1.0
+        self.lease = 300
+        self._parar = False
+
+    def init_app(self, app):
+        app.config.setdefault('TAREFAS_MODO', 'fila')
+        app.config.setdefault('TAREFAS_TENTATIVAS', 3)
+        app.config.setdefault('TAREFAS_ESPERA_BASE', 5)
+        app.config.setdefault('TAREFAS_INTERVALO', 1.0)
+        app.config.setdefault('TAREFAS_LEASE', 300)
+
+        self.modo = app.config['TAREFAS_MODO']
+        self.tentativas = app.config['TAREFAS_TENTATIVAS']
+        self.espera_base = app.config['TAREFAS_ESPERA_BASE']
+        self.intervalo = app.config['TAREFAS_INTERVALO']
+        self.lease = app.config['TAREFAS_LEASE']
+
+    def tarefa(self, tipo):
+        def decorator(f):
+            self.tipos[tipo] = f
+            return f
+        return decorator
+
+    def enfileirar(self, tipo, chave=None, **parametros):
+        if tipo not in self.tipos:
+            raise KeyError(f'Tipo de tarefa desconhecido: {tipo}')
+
+        if chave is not None:
+            existente = Tarefa.query.filter(Tarefa.chave == chave, Tarefa.status.in_(ATIVAS)).first()
+            if existente is not None:
+                return existente
+
+        tarefa = Tarefa(tipo=tipo, chave=chave, parametros=json.dumps(parametros, default=str),
+                        status=PENDENTE, max_tentativas=self.tentativas, disponivel_em=_agora())
+        db.session.add(tarefa)
+        db.session.commit()
+
+        if self.modo == 'imediato':
+            while self._reservar(tarefa.id, 'imediato'):
+                self.executar(tarefa.id)
+            db.session.refresh(tarefa)
+        return tarefa
+
+    def _disponivel(self, agora):
+        return or_(
+            and_(Tarefa.status == PENDENTE, Tarefa.disponivel_em <= agora),
+            and_(Tarefa.status == EXECUTANDO, Tarefa.bloqueado_ate < agora),
+        )
+
+    def _reservar(self, tarefa_id, worker):
+        agora = _agora()
+        resultado = db.session.execute(
+            update(Tarefa)
+            .where(Tarefa.id == tarefa_id, self._disponivel(agora))
+            .values(status=EXECUTANDO, worker=worker, tentativas=Tarefa.tentativas + 1,
+                    iniciado_em=agora, bloqueado_ate=agora + timedelta(seconds=self.lease))
+            .execution_options(synchronize_session=False, **TODAS)
+        )
+        db.session.commit()
+        return resultado.rowcount == 1
+
+    def reservar(self, worker):
+        while True:
+            tarefa_id = db.session.execute(
+                db.select(Tarefa.id)
+                .where(self._disponivel(_agora()))
+                .order_by(Tarefa.disponivel_em, Tarefa.id)
+                .limit(1)
+                .execution_options(**TODAS)
+            ).scalar()
+            if tarefa_id is None:
+                return None
+            if self._reservar(tarefa_id, worker):
+                return tarefa_id
+
+    def _finalizar(self, tarefa_id, **valores):
+        db.session.execute(
+            update(Tarefa).where(Tarefa.id == tarefa_id).values(**valores)
+            .execution_options(synchronize_session=False, **TODAS)
+        )
+        db.session.commit()
+
+    def executar(self, tarefa_id):
+        tarefa = db.session.get(Tarefa, tarefa_id, execution_options=TODAS)
+        with organizacoes.ativar(tarefa.organizacao_id):
+            return self._executar(tarefa, Execucao(self, tarefa_id))
+
+    def _executar(self, tarefa, execucao):
+        tarefa_id = tarefa.id
+        try:
+            funcao = self.tipos.get(tarefa.tipo)
+            if funcao is None:
+                raise ErroDefinitivo(f'Tipo de tarefa desconhecido: {tarefa.tipo}')
+            funcao(execucao, **json.loads(tarefa.parametros))
+        except Exception as erro:
+            db.session.rollback()
+            tarefa = db.session.get(Tarefa, tarefa_id, execution_options=TODAS)
+            definitivo = isinstance(erro, ErroDefinitivo) or tarefa.tentativas >= tarefa.max_tentativas
+            detalhe = str(erro) if isinstance(erro, ErroDefinitivo) else traceback.format_exc(limit=5)
+            if definitivo:
+                self._finalizar(tarefa_id, status=FALHOU, erro=detalhe, mensagem=str(erro)[:255],
+                                concluido_em=_agora(), bloqueado_ate=None)
+            else:
+                espera = self.espera_base * 2 ** (tarefa.tentativas - 1)
+                self._finalizar(tarefa_id, status=PENDENTE, erro=detalhe,
+                                mensagem=f'Nova tentativa em {espera} s: {erro}'[:255],
+                                disponivel_em=_agora() + timedelta(seconds=espera), bloqueado_ate=None)
+            return False
+
+        self._finalizar(tarefa_id, status=CONCLUIDA, progresso=100, erro=None,
+                        concluido_em=_agora(), bloqueado_ate=None)
+        for funcao in execucao.callbacks:
+            funcao()
+        return True
+
+    def parar(self, *args):
+        self._parar = True
+
+    def trabalhar(self, app, intervalo=None, ate_esvaziar=False, informar=None):
+        nome = f'{socket.gethostname()}:{os.getpid()}'
+        intervalo = self.intervalo if intervalo is None else intervalo
+        self._parar = False
+        executadas = 0
+
+        while not self._parar:
+            with app.app_context():
+                tarefa_id = self.reservar(nome)
+                if tarefa_id is not None:
+                    sucesso = self.executar(tarefa_id)
+                    executadas += 1
+                    if informar:
+                        informar(f'[{nome}] tarefa {tarefa_id}: {"concluída" if sucesso else "falhou"}')
+                    db.session.remove()
+                    continue
+                db.session.remove()
+
+            if ate_esvaziar:
+                break
+            time.sleep(intervalo)
+        return executadas
+
+    def trabalhar_em_processos(self, app, processos, intervalo=None, informar=print):
+        with app.app_context():
+            db.catalogo.dispose()
+
+        filhos = set()
+        for _ in range(processos):
+            pid = os.fork()
+            if pid == 0:
+                signal.signal(signal.SIGTERM, self.parar)
+                signal.signal(signal.SIGINT, self.parar)
+                self.trabalhar(app, intervalo, informar=informar)
+                os._exit(0)
+            filhos.add(pid)
+
+        def encerrar(sinal, quadro):
+            for pid in filhos:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+        signal.signal(signal.SIGTERM, encerrar)
+        signal.signal(signal.SIGINT, encerrar)
+        while filhos:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            filhos.discard(pid)
+
+
+fila = Fila()
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+
+CABECALHOS_SSE = (b'HTTP/1.1 200 OK\r\n'
+                  b'Content-Type: text/event-stream\r\n'
+                  b'Cache-Control: no-cache\r\n'
+                  b'Access-Control-Allow-Origin: *\r\n'
+                  b'X-Accel-Buffering: no\r\n'
+                  b'Connection: close\r\n\r\n')
+
+
+def _serializar_valor(valor):
+    return valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+
+
+class LocalBackend:
+
+    def __init__(self):
+        self._contador = 0
+        self._trava = threading.Lock()
+        self.entregar = None
+
+    def iniciar(self):
+        pass
+
+    def proximo_id(self, canal):
+        with self._trava:
+            self._contador += 1
+            return self._contador
+
+    def publicar(self, canal, evento_id, evento, dados):
+        self.entregar(canal, evento_id, evento, dados)
+
+
+class RedisBackend:
+
+    def __init__(self, url, canal_redis='sigto:aovivo'):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._canal_redis = canal_redis
+        self.entregar = None
+        self._ouvinte = None
+
+    def iniciar(self):
+        if self._ouvinte is not None:
+            return
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self._canal_redis: self._receber})
+        self._ouvinte = pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+    def _receber(self, mensagem):
+        canal, evento_id, evento, dados = json.loads(mensagem['data'])
+        self.entregar(canal, evento_id, evento, dados)
+
+    def proximo_id(self, canal):
+        return self._redis.incr(f'{self._canal_redis}:id')
+
+    def publicar(self, canal, evento_id, evento, dados):
+        self.iniciar()
+        self._redis.publish(self._canal_redis, json.dumps([canal, evento_id, evento, dados]))
+
+
+class Broker:
+
+    def __init__(self, historico=100):
+        self.historico = historico
+        self._canais = {}
+        self._condicao = threading.Condition()
+        self._ao_entregar = []
+        self._assinador = None
+        self.servidor = None
+        self.backend = None
+        self.espaco = lambda: ''
+        self.usar_backend(LocalBackend())
+
+    def init_app(self, app):
+        app.config.setdefault('AOVIVO_BACKEND', 'local')
+        app.config.setdefault('AOVIVO_URL', None)
+        app.config.setdefault('AOVIVO_PORTA', 5001)
+        app.config.setdefault('AOVIVO_ENDERECO', None)
+        app.config.setdefault('AOVIVO_CONEXOES', 10000)
+        app.config.setdefault('AOVIVO_DURACAO_MAXIMA', 300)
+        app.config.setdefault('AOVIVO_HEARTBEAT', 10)
+
+        tipo = app.config['AOVIVO_BACKEND']
+        if tipo == 'redis':
+            self.usar_backend(RedisBackend(app.config['AOVIVO_URL']))
+        elif tipo != 'local':
+            self.usar_backend(tipo)
+
+        self._assinador = URLSafeSerializer(app.config['SECRET_KEY'], salt='aovivo')
+        app.context_processor(lambda: {'aovivo_url': self.url})
+
+    def usar_backend(self, backend):
+        backend.entregar = self._entregar
+        self.backend = backend
+
+    def url(self, *canais):
+        # Sem servidor assíncrono as páginas não abrem conexões: cada uma ocuparia uma thread do waitress.
+        endereco = current_app.config['AOVIVO_ENDERECO']
+        if self.servidor is None and not endereco:
+            return None
+        token = self._assinador.dumps([self.espaco() + canal for canal in canais])
+        base = endereco.rstrip('/') if endereco else f':{self.servidor.porta}'
+        return f'{base}/aovivo?c={token}'
+
+    def canais_do_token(self, token):
+        try:
+            canais = self._assinador.loads(token)
+        except BadSignature:
+            raise ValueError('Token inválido.')
+        if not isinstance(canais, list) or not all(isinstance(canal, str) for canal in canais):
+            raise ValueError('Token inválido.')
+        return canais
+
+    def publicar(self, canais, evento, dados):
+        dados = json.dumps(dados, separators=(',', ':'), ensure_ascii=False, default=_serializar_valor)
+        espaco = self.espaco()
+        for canal in (espaco + canal for canal in canais):
+            evento_id = self.backend.proximo_id(canal)
+            self.backend.publicar(canal, evento_id, evento, dados)
+
+    def ao_entregar(self, funcao):
+        self._ao_entregar.append(funcao)
+
+    def _entregar(self, canal, evento_id, evento, dados):
+        with self._condicao:
+            fila = self._canais.setdefault(canal, deque(maxlen=self.historico))
+            fila.append((evento_id, evento, dados))
+            self._condicao.notify_all()
+        for funcao in self._ao_entregar:
+            funcao()
+
+    def pendentes(self, canais, ultimo_id):
+        with self._condicao:
+            eventos = []
+            for canal in canais:
+                for evento_id, evento, dados in self._canais.get(canal, ()):
+                    if ultimo_id is None or evento_id > ultimo_id:
+                        eventos.append((evento_id, evento, dados))
+        eventos.sort(key=lambda item: item[0])
+        return eventos
+
+    def ultimo_id(self, canais):
+        with self._condicao:
+            ids = [self._canais[canal][-1][0] for canal in canais if self._canais.get(canal)]
+        return max(ids, default=0)
+
+    def servir(self, host, porta, **opcoes):
+        self.servidor = ServidorAoVivo(self, **opcoes)
+        self.servidor.iniciar(host, porta)
+        return self.servidor
+
+
+class ServidorAoVivo:
+    # Servidor HTTP mínimo em asyncio só para os fluxos SSE: milhares de assinantes ociosos
+    # ficam numa única thread, fora do pool de threads que atende as páginas.
+
+    def __init__(self, broker, heartbeat=10, duracao_maxima=300, conexoes=10000):
+        self.broker = broker
+        self.heartbeat = heartbeat
+        self.duracao_maxima = duracao_maxima
+        self.conexoes = conexoes
+        self.abertas = 0
+        self.porta = None
+        self._loop = None
+        self._novidade = None
+
+    def iniciar(self, host, porta):
+        self.porta = porta
+        pronto = threading.Event()
+        erros = []
+
+        def executar():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(asyncio.start_server(self._atender, host, porta, backlog=1024))
+            except OSError as erro:
+                erros.append(erro)
+                pronto.set()
+                return
+            self._loop = loop
+            self._novidade = asyncio.Event()
+            # Processos criados por fork herdam o broker, mas não a thread do laço.
+            pid = os.getpid()
+            self.broker.ao_entregar(lambda: os.getpid() == pid and loop.call_soon_threadsafe(self._acordar))
+            pronto.set()
+            loop.run_forever()
+
+        threading.Thread(target=executar, name='aovivo', daemon=True).start()
+        pronto.wait()
+        if erros:
+            raise erros[0]
+        self.broker.backend.iniciar()
+
+    def _acordar(self):
+        novidade, self._novidade = self._novidade, asyncio.Event()
+        novidade.set()
+
+    def _interpretar(self, cabecalho):
+        linhas = cabecalho.decode('latin-1').split('\r\n')
+        partes = linhas[0].split(' ')
+        if len(partes) != 3 or partes[0] != 'GET':
+            raise ValueError('Requisição inválida.')
+        alvo = urlsplit(partes[1])
+        if not alvo.path.rstrip('/').endswith('/aovivo'):
+            raise ValueError('Rota inválida.')
+        canais = self.broker.canais_do_token(parse_qs(alvo.query).get('c', [''])[0])
+
+        ultimo_id = None
+        for linha in linhas[1:]:
+            nome, _, valor = linha.partition(':')
+            if nome.strip().lower() == 'last-event-id' and valor.strip().isdigit():
+                ultimo_id = int(valor.strip())
+        return canais, ultimo_id
+
+    async def _atender(self, leitor, escritor):
+        try:
+            try:
+                cabecalho = await asyncio.wait_for(leitor.readuntil(b'\r\n\r\n'), 10)
+                canais, ultimo_id = self._interpretar(cabecalho)
+            except ValueError:
+                escritor.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                return
+            if self.abertas >= self.conexoes:
+                escritor.write(b'HTTP/1.1 503 Service Unavailable\r\nRetry-After: 10\r\n'
+                               b'Content-Length: 0\r\nConnection: close\r\n\r\n')
+                return
+
+            self.abertas += 1
+            try:
+                await self._transmitir(escritor, canais, ultimo_id)
+            finally:
+                self.abertas -= 1
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+
+    async def _transmitir(self, escritor, canais, ultimo_id):
+        escritor.write(CABECALHOS_SSE + b'retry: 2000\n\n')
+        await escritor.drain()
+        if ultimo_id is None:
+            ultimo_id = self.broker.ultimo_id(canais)
+
+        loop = asyncio.get_running_loop()
+        fim = loop.time() + self.duracao_maxima
+        while True:
+            restante = fim - loop.time()
+            if restante <= 0:
+                return
+            novidade = self._novidade
+            eventos = self.broker.pendentes(canais, ultimo_id)
+            if not eventos:
+                try:
+                    await asyncio.wait_for(novidade.wait(), min(self.heartbeat, restante))
+                except asyncio.TimeoutError:
+                    escritor.write(b': ping\n\n')
+                    await escritor.drain()
+                continue
+            for evento_id, evento, dados in eventos:
+                ultimo_id = evento_id
+                escritor.write(f'id: {evento_id}\nevent: {evento}\ndata: {dados}\n\n'.encode())
+            await escritor.drain()
@@ -0,0 +1,342 @@
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from flask import Blueprint, g, request, current_app, render_template, send_from_directory, abort, \
+    before_render_template, template_rendered, has_request_context
+from flask_login import current_user
+from sqlalchemy import event
+from .decorators import admin_required, e_admin
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SERIES = ('latencia', 'requisicoes', 'consultas', 'tempo_sql', 'templates')
+
+
+class Histograma:
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        for posicao, limite in enumerate(self.limites):
+            if valor <= limite:
+                break
+        else:
+            posicao = len(self.limites)
+        self.contagens[posicao] += 1
+        self.soma += valor
+        self.total += 1
+
+    def acumulado(self):
+        total = 0
+        for limite, contagem in zip(self.limites + ('+Inf',), self.contagens):
+            total += contagem
+            yield limite, total
+
+    def quantil(self, q):
+        if not self.total:
+            return 0
+        alvo = q * self.total
+        anterior_limite, anterior_total = 0, 0
+        for limite, total in self.acumulado():
+            if total >= alvo:
+                if limite == '+Inf':
+                    return anterior_limite
+                fracao = (alvo - anterior_total) / max(total - anterior_total, 1)
+                return anterior_limite + (limite - anterior_limite) * fracao
+            anterior_limite, anterior_total = limite, total
+        return anterior_limite
+
+    def media(self):
+        return self.soma / self.total if self.total else 0
+
+    def somar(self, outro):
+        self.contagens = [a + b for a, b in zip(self.contagens, outro.contagens)]
+        self.soma += outro.soma
+        self.total += outro.total
+
+
+class Amostrador:
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self._pilhas = {}
+        self._trava = threading.Lock()
+        self._thread = None
+
+    def iniciar(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name='sigto-amostrador', daemon=True)
+            self._thread.start()
+
+    def acompanhar(self, thread_id):
+        with self._trava:
+            self._pilhas[thread_id] = Counter()
+
+    def encerrar(self, thread_id):
+        with self._trava:
+            return self._pilhas.pop(thread_id, Counter())
+
+    def _executar(self):
+        while True:
+            time.sleep(self.intervalo)
+            frames = sys._current_frames()
+            with self._trava:
+                for thread_id, pilhas in self._pilhas.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        pilhas[_pilha(frame)] += 1
+
+
+def _pilha(frame):
+    quadros = []
+    while frame is not None:
+        codigo = frame.f_code
+        quadros.append(f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(quadros))
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(**valores):
+    return ','.join(f'{chave}="{_escapar(valor)}"' for chave, valor in valores.items())
+
+
+class Metricas:
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.amostrador = None
+        self._gravacao = None
+        self.limpar()
+
+    def limpar(self):
+        with self._trava:
+            self.latencia = {}
+            self.requisicoes = Counter()
+            self.consultas = {}
+            self.tempo_sql = Counter()
+            self.templates = {}
+
+    def init_app(self, app):
+        app.config.setdefault('METRICAS_ATIVAS', True)
+        app.config.setdefault('METRICAS_TOKEN', None)
+        app.config.setdefault('METRICAS_PERFIL_LIMIAR', None)
+        app.config.setdefault('METRICAS_PERFIL_INTERVALO', 0.005)
+        app.config.setdefault('METRICAS_PERFIL_DIR', os.path.join(app.instance_path, 'perfis'))
+        app.config.setdefault('METRICAS_DIRETORIO', None)
+        app.config.setdefault('METRICAS_GRAVAR_INTERVALO', 5)
+
+        app.extensions['metricas'] = self
+        if not app.config['METRICAS_ATIVAS']:
+            return
+
+        app.before_request(self._iniciar_requisicao)
+        app.after_request(self._finalizar_requisicao)
+        before_render_template.connect(self._iniciar_template, app)
+        template_rendered.connect(self._finalizar_template, app)
+
+    def instrumentar_engine(self, engine):
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def iniciar_consulta(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def finalizar_consulta(conn, cursor, statement, parameters, context, executemany):
+            inicio = conn.info['metricas_inicio'].pop()
+            if has_request_context() and 'metricas' in g:
+                g.metricas['consultas'] += 1
+                g.metricas['tempo_sql'] += time.perf_counter() - inicio
+
+    def _iniciar_requisicao(self):
+        g.metricas = {'inicio': time.perf_counter(), 'consultas': 0, 'tempo_sql': 0.0, 'templates': []}
+        if current_app.config['METRICAS_PERFIL_LIMIAR'] is not None:
+            with self._trava:
+                if self.amostrador is None:
+                    self.amostrador = Amostrador(current_app.config['METRICAS_PERFIL_INTERVALO'])
+                    self.amostrador.iniciar()
+            self.amostrador.acompanhar(threading.get_ident())
+
+    def _finalizar_requisicao(self, response):
+        dados = g.pop('metricas', None)
+        if dados is None:
+            return response
+
+        duracao = time.perf_counter() - dados['inicio']
+        endpoint = request.endpoint or 'desconhecido'
+        with self._trava:
+            self.latencia.setdefault(endpoint, Histograma(LIMITES_SEGUNDOS)).observar(duracao)
+            self.requisicoes[endpoint, request.method, response.status_code] += 1
+            self.consultas.setdefault(endpoint, Histograma(LIMITES_CONSULTAS)).observar(dados['consultas'])
+            self.tempo_sql[endpoint] += dados['tempo_sql']
+
+        diretorio = current_app.config['METRICAS_DIRETORIO']
+        if diretorio:
+            self._agendar_gravacao(diretorio, current_app.config['METRICAS_GRAVAR_INTERVALO'])
+
+        if current_app.config['METRICAS_PERFIL_LIMIAR'] is not None:
+            pilhas = self.amostrador.encerrar(threading.get_ident())
+            if duracao >= current_app.config['METRICAS_PERFIL_LIMIAR'] and pilhas:
+                self._salvar_perfil(endpoint, duracao, pilhas)
+        return response
+
+    def _iniciar_template(self, app, template, context, **extra):
+        if has_request_context() and 'metricas' in g:
+            g.metricas['templates'].append(time.perf_counter())
+
+    def _finalizar_template(self, app, template, context, **extra):
+        if has_request_context() and 'metricas' in g and g.metricas['templates']:
+            duracao = time.perf_counter() - g.metricas['templates'].pop()
+            with self._trava:
+                self.templates.setdefault(template.name, Histograma(LIMITES_SEGUNDOS)).observar(duracao)
+
+    def _salvar_perfil(self, endpoint, duracao, pilhas):
+        diretorio = current_app.config['METRICAS_PERFIL_DIR']
+        os.makedirs(diretorio, exist_ok=True)
+        nome = f"{datetime.now():%Y%m%d-%H%M%S-%f}-{endpoint}-{int(duracao * 1000)}ms.folded"
+        with open(os.path.join(diretorio, nome), 'w') as arquivo:
+            for pilha, contagem in pilhas.most_common():
+                arquivo.write(f'{pilha} {contagem}\n')
+
+    def perfis(self):
+        diretorio = current_app.config['METRICAS_PERFIL_DIR']
+        if not os.path.isdir(diretorio):
+            return []
+        return sorted((nome for nome in os.listdir(diretorio) if nome.endswith('.folded')), reverse=True)
+
+    def preparar_diretorio(self, diretorio):
+        # Com vários processos cada um grava a sua cópia em METRICAS_DIRETORIO, e quem atende
+        # /metrics soma todas; arquivos de processos encerrados continuam contando.
+        os.makedirs(diretorio, exist_ok=True)
+        for nome in os.listdir(diretorio):
+            if nome.endswith('.pickle'):
+                os.remove(os.path.join(diretorio, nome))
+
+    def _agendar_gravacao(self, diretorio, intervalo):
+        with self._trava:
+            if self._gravacao is not None and self._gravacao.is_alive():
+                return
+            self._gravacao = threading.Timer(intervalo, self._gravar, (diretorio,))
+            self._gravacao.daemon = True
+            self._gravacao.start()
+
+    def _gravar(self, diretorio):
+        with self._trava:
+            dados = pickle.dumps({nome: getattr(self, nome) for nome in SERIES})
+        destino = os.path.join(diretorio, f'{os.getpid()}.pickle')
+        with open(destino + '.tmp', 'wb') as arquivo:
+            arquivo.write(dados)
+        os.replace(destino + '.tmp', destino)
+
+    def _series(self):
+        diretorio = current_app.config['METRICAS_DIRETORIO']
+        if not diretorio:
+            with self._trava:
+                return pickle.loads(pickle.dumps({nome: getattr(self, nome) for nome in SERIES}))
+
+        self._gravar(diretorio)
+        series = {'latencia': {}, 'requisicoes': Counter(), 'consultas': {}, 'tempo_sql': Counter(), 'templates': {}}
+        for nome in os.listdir(diretorio):
+            if not nome.endswith('.pickle'):
+                continue
+            try:
+                with open(os.path.join(diretorio, nome), 'rb') as arquivo:
+                    processo = pickle.load(arquivo)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+            for serie in ('latencia', 'consultas', 'templates'):
+                for chave, histograma in processo[serie].items():
+                    series[serie].setdefault(chave, Histograma(histograma.limites)).somar(histograma)
+            series['requisicoes'].update(processo['requisicoes'])
+            series['tempo_sql'].update(processo['tempo_sql'])
+        return series
+
+    def _histograma_prometheus(self, nome, ajuda, series, rotulo):
+        linhas = [f'# HELP {nome} {ajuda}', f'# TYPE {nome} histogram']
+        for chave, histograma in sorted(series.items()):
+            for limite, total in histograma.acumulado():
+                linhas.append(f'{nome}_bucket{{{_rotulos(**{rotulo: chave, "le": limite})}}} {total}')
+            linhas.append(f'{nome}_sum{{{_rotulos(**{rotulo: chave})}}} {histograma.soma}')
+            linhas.append(f'{nome}_count{{{_rotulos(**{rotulo: chave})}}} {histograma.total}')
+        return linhas
+
+    def prometheus(self):
+        series = self._series()
+        linhas = self._histograma_prometheus(
+            'sigto_requisicao_segundos', 'Latência das requisições por endpoint.', series['latencia'], 'endpoint')
+        linhas += ['# HELP sigto_requisicoes_total Requisições por endpoint, método e status.',
+                   '# TYPE sigto_requisicoes_total counter']
+        for (endpoint, metodo, status), total in sorted(series['requisicoes'].items()):
+            linhas.append(f'sigto_requisicoes_total{{{_rotulos(endpoint=endpoint, metodo=metodo, status=status)}}} {total}')
+        linhas += self._histograma_prometheus(
+            'sigto_sql_consultas', 'Comandos SQL emitidos por requisição.', series['consultas'], 'endpoint')
+        linhas += ['# HELP sigto_sql_segundos_total Tempo gasto em SQL por endpoint.',
+                   '# TYPE sigto_sql_segundos_total counter']
+        for endpoint, total in sorted(series['tempo_sql'].items()):
+            linhas.append(f'sigto_sql_segundos_total{{{_rotulos(endpoint=endpoint)}}} {total}')
+        linhas += self._histograma_prometheus(
+            'sigto_template_segundos', 'Tempo de renderização por template.', series['templates'], 'template')
+        return '\n'.join(linhas) + '\n'
+
+    def resumo(self):
+        series = self._series()
+        endpoints = []
+        for endpoint, histograma in sorted(series['latencia'].items(), key=lambda item: -item[1].soma):
+            consultas = series['consultas'][endpoint]
+            endpoints.append({
+                'endpoint': endpoint,
+                'requisicoes': histograma.total,
+                'media_ms': histograma.media() * 1000,
+                'p50_ms': histograma.quantil(0.5) * 1000,
+                'p95_ms': histograma.quantil(0.95) * 1000,
+                'p99_ms': histograma.quantil(0.99) * 1000,
+                'consultas_media': consultas.media(),
+                'consultas_p95': consultas.quantil(0.95),
+                'sql_ms': series['tempo_sql'][endpoint] / histograma.total * 1000,
+            })
+        templates = [{
+            'template': nome,
+            'renderizacoes': histograma.total,
+            'media_ms': histograma.media() * 1000,
+            'p95_ms': histograma.quantil(0.95) * 1000,
+        } for nome, histograma in sorted(series['templates'].items(), key=lambda item: -item[1].soma)]
+        return endpoints, templates
+
+
+painel = Blueprint('metricas', __name__)
+
+
+@painel.route('/metrics')
+def exportar_metricas():
+    token = current_app.config['METRICAS_TOKEN']
+    if not (token and request.headers.get('Authorization') == f'Bearer {token}') \
+            and not (current_user.is_authenticated and e_admin(current_user)):
+        abort(401)
+    return current_app.response_class(current_app.extensions['metricas'].prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+@painel.route('/admin/metricas')
+@admin_required
+def painel_metricas():
+    metricas = current_app.extensions['metricas']
+    endpoints, templates = metricas.resumo()
+    return render_template('metricas.html', endpoints=endpoints, templates=templates,
+                           perfis=metricas.perfis()[:50])
+
+
+@painel.route('/admin/metricas/perfis/<nome>')
+@admin_required
+def baixar_perfil(nome):
+    return send_from_directory(current_app.config['METRICAS_PERFIL_DIR'], nome,
+                               mimetype='text/plain', as_attachment=True)
@@ -0,0 +1,61 @@
+import importlib
+import pkgutil
+import sqlalchemy as sa
+
+TABELA_VERSAO = 'versao_esquema'
+
+
+def carregar_migracoes():
+    migracoes = []
+    for modulo in pkgutil.iter_modules(__path__):
+        if modulo.name.startswith('v'):
+            migracoes.append(importlib.import_module(f'{__name__}.{modulo.name}'))
+    migracoes.sort(key=lambda m: m.VERSAO)
+
+    versoes = [m.VERSAO for m in migracoes]
+    if versoes != list(range(1, len(versoes) + 1)):
+        raise RuntimeError(f'Sequência de migrações inválida: {versoes}')
+    return migracoes
+
+
+def versao_atual(conn):
+    if not sa.inspect(conn).has_table(TABELA_VERSAO):
+        return 0
+    return conn.execute(sa.text(f'SELECT versao FROM {TABELA_VERSAO}')).scalar() or 0
+
+
+def _gravar_versao(conn, versao):
+    conn.execute(sa.text(f'CREATE TABLE IF NOT EXISTS {TABELA_VERSAO} (versao INTEGER NOT NULL)'))
+    conn.execute(sa.text(f'DELETE FROM {TABELA_VERSAO}'))
+    conn.execute(sa.text(f'INSERT INTO {TABELA_VERSAO} (versao) VALUES (:versao)'), {'versao': versao})
+
+
+def upgrade(engine, alvo=None, informar=None):
+    migracoes = carregar_migracoes()
+    alvo = len(migracoes) if alvo is None else alvo
+
+    with engine.connect() as conn:
+        atual = versao_atual(conn)
+
+    for migracao in migracoes[atual:alvo]:
+        with engine.begin() as conn:
+            migracao.upgrade(conn)
+            _gravar_versao(conn, migracao.VERSAO)
+        if informar:
+            informar(f'{migracao.VERSAO:04d} {migracao.DESCRICAO}')
+    return max(atual, alvo)
+
+
+def downgrade(engine, alvo, informar=None):
+    migracoes = carregar_migracoes()
+
+    with engine.connect() as conn:
+        atual = versao_atual(conn)
+
+    for migracao in reversed(migracoes[alvo:atual]):
+        with engine.begin() as conn:
+            migracao.downgrade(conn)
+            _gravar_versao(conn, migracao.VERSAO - 1)
+        if informar:
+            informar(f'{migracao.VERSAO:04d} {migracao.DESCRICAO} (revertida)')
+    return min(atual, alvo)
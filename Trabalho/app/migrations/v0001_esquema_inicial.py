@@ -0,0 +1,56 @@
+import sqlalchemy as sa
+
+VERSAO = 1
+DESCRICAO = 'Esquema inicial (usuario, time, campeonato, campeonato_times, jogo)'
+
+metadata = sa.MetaData()
+
+usuario = sa.Table(
+    'usuario', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('nome', sa.String(100), nullable=False),
+    sa.Column('email', sa.String(120), unique=True, nullable=False),
+    sa.Column('senha_hash', sa.String(60), nullable=False),
+    sa.Column('role', sa.String(20), nullable=False),
+)
+
+time = sa.Table(
+    'time', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('nome', sa.String(100), unique=True, nullable=False),
+)
+
+campeonato = sa.Table(
+    'campeonato', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('nome', sa.String(150), nullable=False),
+    sa.Column('data_inicio', sa.Date, nullable=True),
+    sa.Column('data_fim', sa.Date, nullable=True),
+    sa.Column('regras', sa.Text, nullable=True),
+)
+
+campeonato_times = sa.Table(
+    'campeonato_times', metadata,
+    sa.Column('time_id', sa.Integer, sa.ForeignKey('time.id'), primary_key=True),
+    sa.Column('campeonato_id', sa.Integer, sa.ForeignKey('campeonato.id'), primary_key=True),
+)
+
+jogo = sa.Table(
+    'jogo', metadata,
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('data_hora', sa.DateTime, nullable=False),
+    sa.Column('placar_casa', sa.Integer),
+    sa.Column('placar_visitante', sa.Integer),
+    sa.Column('status', sa.String(50)),
+    sa.Column('time_casa_id', sa.Integer, sa.ForeignKey('time.id'), nullable=False),
+    sa.Column('time_visitante_id', sa.Integer, sa.ForeignKey('time.id'), nullable=False),
+    sa.Column('campeonato_id', sa.Integer, sa.ForeignKey('campeonato.id'), nullable=False),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    metadata.drop_all(conn, checkfirst=True)
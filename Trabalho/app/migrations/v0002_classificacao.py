@@ -0,0 +1,66 @@
+import sqlalchemy as sa
+
+VERSAO = 2
+DESCRICAO = 'Tabela de classificação persistida'
+
+LADOS = '''
+    SELECT j.campeonato_id, j.time_casa_id AS time_id,
+           COALESCE(j.placar_casa, 0) AS gp, COALESCE(j.placar_visitante, 0) AS gc
+    FROM jogo j
+    JOIN campeonato_times c ON c.campeonato_id = j.campeonato_id AND c.time_id = j.time_casa_id
+    JOIN campeonato_times v ON v.campeonato_id = j.campeonato_id AND v.time_id = j.time_visitante_id
+    WHERE j.status = 'Finalizado'
+    UNION ALL
+    SELECT j.campeonato_id, j.time_visitante_id AS time_id,
+           COALESCE(j.placar_visitante, 0) AS gp, COALESCE(j.placar_casa, 0) AS gc
+    FROM jogo j
+    JOIN campeonato_times c ON c.campeonato_id = j.campeonato_id AND c.time_id = j.time_casa_id
+    JOIN campeonato_times v ON v.campeonato_id = j.campeonato_id AND v.time_id = j.time_visitante_id
+    WHERE j.status = 'Finalizado'
+'''
+
+# Pontuação fixa 3/1/0: a pontuação por campeonato só existe a partir da migração 6.
+PREENCHER = f'''
+    INSERT INTO classificacao (campeonato_id, time_id, pontos, jogos_disputados, vitorias, empates,
+                               derrotas, gols_pro, gols_contra, saldo_gols)
+    SELECT ct.campeonato_id, ct.time_id,
+           COALESCE(SUM(CASE WHEN gp > gc THEN 3 WHEN gp = gc THEN 1 ELSE 0 END), 0),
+           COUNT(lados.time_id),
+           COALESCE(SUM(CASE WHEN gp > gc THEN 1 ELSE 0 END), 0),
+           COALESCE(SUM(CASE WHEN gp = gc THEN 1 ELSE 0 END), 0),
+           COALESCE(SUM(CASE WHEN gp < gc THEN 1 ELSE 0 END), 0),
+           COALESCE(SUM(gp), 0), COALESCE(SUM(gc), 0), COALESCE(SUM(gp - gc), 0)
+    FROM campeonato_times ct
+    LEFT JOIN ({LADOS}) lados ON lados.campeonato_id = ct.campeonato_id AND lados.time_id = ct.time_id
+    GROUP BY ct.campeonato_id, ct.time_id
+'''
+
+
+def _classificacao(conn):
+    metadata = sa.MetaData()
+    metadata.reflect(conn, only=['campeonato', 'time'])
+
+    return sa.Table(
+        'classificacao', metadata,
+        sa.Column('campeonato_id', sa.Integer, sa.ForeignKey('campeonato.id'), primary_key=True),
+        sa.Column('time_id', sa.Integer, sa.ForeignKey('time.id'), primary_key=True),
+        sa.Column('pontos', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('jogos_disputados', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('vitorias', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('empates', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('derrotas', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('gols_pro', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('gols_contra', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('saldo_gols', sa.Integer, nullable=False, server_default='0'),
+        sa.Index('ix_classificacao_ordem', 'campeonato_id', 'pontos', 'saldo_gols', 'gols_pro'),
+    )
+
+
+def upgrade(conn):
+    _classificacao(conn).create(conn, checkfirst=True)
+    conn.execute(sa.text('DELETE FROM classificacao'))
+    conn.execute(sa.text(PREENCHER))
+
+
+def downgrade(conn):
+    _classificacao(conn).drop(conn, checkfirst=True)
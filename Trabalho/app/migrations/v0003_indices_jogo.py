@@ -0,0 +1,27 @@
+import sqlalchemy as sa
+
+VERSAO = 3
+DESCRICAO = 'Índices de jogo por campeonato/status, data e times'
+
+INDICES = {
+    'ix_jogo_campeonato_status': ('campeonato_id', 'status'),
+    'ix_jogo_data_hora_id': ('data_hora', 'id'),
+    'ix_jogo_time_casa_data': ('time_casa_id', 'data_hora'),
+    'ix_jogo_time_visitante_data': ('time_visitante_id', 'data_hora'),
+}
+
+
+def _indices(conn):
+    jogo = sa.Table('jogo', sa.MetaData(), autoload_with=conn)
+    return [sa.Index(nome, *(jogo.c[coluna] for coluna in colunas))
+            for nome, colunas in INDICES.items()]
+
+
+def upgrade(conn):
+    for indice in _indices(conn):
+        indice.create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    for indice in _indices(conn):
+        indice.drop(conn, checkfirst=True)
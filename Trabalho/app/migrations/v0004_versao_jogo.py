@@ -0,0 +1,14 @@
+import sqlalchemy as sa
+
+VERSAO = 4
+DESCRICAO = 'Coluna de versão em jogo (controle de concorrência otimista)'
+
+
+def upgrade(conn):
+    colunas = {coluna['name'] for coluna in sa.inspect(conn).get_columns('jogo')}
+    if 'versao' not in colunas:
+        conn.execute(sa.text('ALTER TABLE jogo ADD COLUMN versao INTEGER NOT NULL DEFAULT 1'))
+
+
+def downgrade(conn):
+    conn.execute(sa.text('ALTER TABLE jogo DROP COLUMN versao'))
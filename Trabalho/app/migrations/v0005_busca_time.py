@@ -0,0 +1,12 @@
+import sqlalchemy as sa
+
+VERSAO = 5
+DESCRICAO = 'Índice de busca por nome de time (lower(nome))'
+
+
+def upgrade(conn):
+    conn.execute(sa.text('CREATE INDEX IF NOT EXISTS ix_time_nome_busca ON time (lower(nome))'))
+
+
+def downgrade(conn):
+    conn.execute(sa.text('DROP INDEX IF EXISTS ix_time_nome_busca'))
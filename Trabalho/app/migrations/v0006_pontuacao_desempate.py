@@ -0,0 +1,58 @@
+import sqlalchemy as sa
+
+VERSAO = 6
+DESCRICAO = 'Pontuação e critérios de desempate por campeonato; campanha em casa na classificação'
+
+COLUNAS_CAMPEONATO = (
+    ('pontos_vitoria', "INTEGER NOT NULL DEFAULT 3"),
+    ('pontos_empate', "INTEGER NOT NULL DEFAULT 1"),
+    ('pontos_derrota', "INTEGER NOT NULL DEFAULT 0"),
+    ('criterios_desempate', "VARCHAR(200) NOT NULL DEFAULT 'saldo_gols,gols_pro'"),
+)
+
+COLUNAS_CASA = ('jogos_disputados_casa', 'vitorias_casa', 'empates_casa', 'derrotas_casa',
+                'gols_pro_casa', 'gols_contra_casa')
+
+CAMPANHA_EM_CASA = sa.text('''
+    SELECT j.campeonato_id, j.time_casa_id AS time_id,
+           COUNT(*) AS jogos_disputados_casa,
+           SUM(CASE WHEN COALESCE(j.placar_casa, 0) > COALESCE(j.placar_visitante, 0) THEN 1 ELSE 0 END) AS vitorias_casa,
+           SUM(CASE WHEN COALESCE(j.placar_casa, 0) = COALESCE(j.placar_visitante, 0) THEN 1 ELSE 0 END) AS empates_casa,
+           SUM(CASE WHEN COALESCE(j.placar_casa, 0) < COALESCE(j.placar_visitante, 0) THEN 1 ELSE 0 END) AS derrotas_casa,
+           SUM(COALESCE(j.placar_casa, 0)) AS gols_pro_casa,
+           SUM(COALESCE(j.placar_visitante, 0)) AS gols_contra_casa
+    FROM jogo j
+    JOIN classificacao c ON c.campeonato_id = j.campeonato_id AND c.time_id = j.time_casa_id
+    JOIN classificacao v ON v.campeonato_id = j.campeonato_id AND v.time_id = j.time_visitante_id
+    WHERE j.status = 'Finalizado'
+    GROUP BY j.campeonato_id, j.time_casa_id
+''')
+
+
+def _colunas(conn, tabela):
+    return {coluna['name'] for coluna in sa.inspect(conn).get_columns(tabela)}
+
+
+def upgrade(conn):
+    existentes = _colunas(conn, 'campeonato')
+    for nome, definicao in COLUNAS_CAMPEONATO:
+        if nome not in existentes:
+            conn.execute(sa.text(f'ALTER TABLE campeonato ADD COLUMN {nome} {definicao}'))
+
+    existentes = _colunas(conn, 'classificacao')
+    for nome in COLUNAS_CASA:
+        if nome not in existentes:
+            conn.execute(sa.text(f'ALTER TABLE classificacao ADD COLUMN {nome} INTEGER NOT NULL DEFAULT 0'))
+
+    linhas = [dict(linha._mapping) for linha in conn.execute(CAMPANHA_EM_CASA)]
+    if linhas:
+        atribuicoes = ', '.join(f'{nome} = :{nome}' for nome in COLUNAS_CASA)
+        conn.execute(sa.text(f'UPDATE classificacao SET {atribuicoes} '
+                             'WHERE campeonato_id = :campeonato_id AND time_id = :time_id'), linhas)
+
+
+def downgrade(conn):
+    for nome in COLUNAS_CASA:
+        conn.execute(sa.text(f'ALTER TABLE classificacao DROP COLUMN {nome}'))
+    for nome, _ in COLUNAS_CAMPEONATO:
+        conn.execute(sa.text(f'ALTER TABLE campeonato DROP COLUMN {nome}'))
@@ -0,0 +1,33 @@
+import sqlalchemy as sa
+
+VERSAO = 7
+DESCRICAO = 'Histórico da classificação por data (rodada)'
+
+COLUNAS = ('pontos', 'jogos_disputados', 'vitorias', 'empates', 'derrotas', 'gols_pro', 'gols_contra',
+           'saldo_gols', 'jogos_disputados_casa', 'vitorias_casa', 'empates_casa', 'derrotas_casa',
+           'gols_pro_casa', 'gols_contra_casa')
+
+
+def _classificacao_historico(conn):
+    metadata = sa.MetaData()
+    metadata.reflect(conn, only=['campeonato', 'time'])
+
+    return sa.Table(
+        'classificacao_historico', metadata,
+        sa.Column('campeonato_id', sa.Integer, sa.ForeignKey('campeonato.id'), primary_key=True),
+        sa.Column('data', sa.Date, primary_key=True),
+        sa.Column('time_id', sa.Integer, sa.ForeignKey('time.id'), primary_key=True),
+        sa.Column('rodada', sa.Integer, nullable=False),
+        sa.Column('posicao', sa.Integer, nullable=False),
+        *(sa.Column(coluna, sa.Integer, nullable=False, server_default='0') for coluna in COLUNAS),
+        sa.Index('ix_classificacao_historico_rodada', 'campeonato_id', 'rodada'),
+        sa.Index('ix_classificacao_historico_time', 'campeonato_id', 'time_id', 'data'),
+    )
+
+
+def upgrade(conn):
+    _classificacao_historico(conn).create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    _classificacao_historico(conn).drop(conn, checkfirst=True)
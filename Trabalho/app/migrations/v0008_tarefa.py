@@ -0,0 +1,36 @@
+import sqlalchemy as sa
+
+VERSAO = 8
+DESCRICAO = 'Fila de tarefas em segundo plano'
+
+
+def _tarefa():
+    return sa.Table(
+        'tarefa', sa.MetaData(),
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('tipo', sa.String(50), nullable=False),
+        sa.Column('chave', sa.String(200), nullable=True),
+        sa.Column('parametros', sa.Text, nullable=False, server_default='{}'),
+        sa.Column('status', sa.String(20), nullable=False, server_default='Pendente'),
+        sa.Column('progresso', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('mensagem', sa.String(255), nullable=True),
+        sa.Column('erro', sa.Text, nullable=True),
+        sa.Column('tentativas', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('max_tentativas', sa.Integer, nullable=False, server_default='3'),
+        sa.Column('worker', sa.String(100), nullable=True),
+        sa.Column('criado_em', sa.DateTime, nullable=False),
+        sa.Column('disponivel_em', sa.DateTime, nullable=False),
+        sa.Column('iniciado_em', sa.DateTime, nullable=True),
+        sa.Column('concluido_em', sa.DateTime, nullable=True),
+        sa.Column('bloqueado_ate', sa.DateTime, nullable=True),
+        sa.Index('ix_tarefa_fila', 'status', 'disponivel_em'),
+        sa.Index('ix_tarefa_chave', 'chave', 'status'),
+    )
+
+
+def upgrade(conn):
+    _tarefa().create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    _tarefa().drop(conn, checkfirst=True)
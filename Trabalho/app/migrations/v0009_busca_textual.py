@@ -0,0 +1,21 @@
+import sqlalchemy as sa
+from ..busca import TABELAS, GATILHOS, criar_indice, remover_gatilhos
+
+VERSAO = 9
+DESCRICAO = 'Índice de busca textual (FTS5) de times, campeonatos e jogos'
+
+
+def upgrade(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+
+    criar_indice(conn)
+
+
+def downgrade(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+
+    remover_gatilhos(conn)
+    for tabela in TABELAS:
+        conn.execute(sa.text(f'DROP TABLE IF EXISTS {tabela}'))
@@ -0,0 +1,24 @@
+from datetime import datetime
+import sqlalchemy as sa
+
+VERSAO = 10
+DESCRICAO = 'Data da última alteração de jogos e campeonatos (versão dos fragmentos em cache)'
+
+TABELAS = ('jogo', 'campeonato')
+
+
+def _colunas(conn, tabela):
+    return {coluna['name'] for coluna in sa.inspect(conn).get_columns(tabela)}
+
+
+def upgrade(conn):
+    for tabela in TABELAS:
+        if 'atualizado_em' not in _colunas(conn, tabela):
+            conn.execute(sa.text(f"ALTER TABLE {tabela} ADD COLUMN atualizado_em DATETIME NOT NULL "
+                                 f"DEFAULT '1970-01-01 00:00:00'"))
+        conn.execute(sa.text(f'UPDATE {tabela} SET atualizado_em = :agora'), {'agora': datetime.now()})
+
+
+def downgrade(conn):
+    for tabela in TABELAS:
+        conn.execute(sa.text(f'ALTER TABLE {tabela} DROP COLUMN atualizado_em'))
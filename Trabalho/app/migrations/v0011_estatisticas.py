@@ -0,0 +1,133 @@
+import sqlalchemy as sa
+
+VERSAO = 11
+DESCRICAO = 'Estatísticas agregadas por time, por temporada e por confronto'
+
+DIVISAO = ('jogos_disputados', 'vitorias', 'empates', 'derrotas', 'gols_pro', 'gols_contra')
+COLUNAS = DIVISAO + tuple(f'{coluna}_casa' for coluna in DIVISAO)
+CONFRONTO = ('jogos_disputados', 'vitorias_a', 'vitorias_b', 'empates', 'gols_a', 'gols_b')
+
+LADOS = '''
+    SELECT id, campeonato_id, time_casa_id AS time_id,
+           COALESCE(placar_casa, 0) AS gp, COALESCE(placar_visitante, 0) AS gc, 1 AS casa
+    FROM jogo WHERE status = 'Finalizado'
+    UNION ALL
+    SELECT id, campeonato_id, time_visitante_id AS time_id,
+           COALESCE(placar_visitante, 0) AS gp, COALESCE(placar_casa, 0) AS gc, 0 AS casa
+    FROM jogo WHERE status = 'Finalizado'
+'''
+
+SOMAS = {
+    'jogos_disputados': 'COUNT(*)',
+    'vitorias': 'SUM(CASE WHEN gp > gc THEN 1 ELSE 0 END)',
+    'empates': 'SUM(CASE WHEN gp = gc THEN 1 ELSE 0 END)',
+    'derrotas': 'SUM(CASE WHEN gp < gc THEN 1 ELSE 0 END)',
+    'gols_pro': 'SUM(gp)',
+    'gols_contra': 'SUM(gc)',
+    'jogos_disputados_casa': 'SUM(casa)',
+    'vitorias_casa': 'SUM(CASE WHEN casa = 1 AND gp > gc THEN 1 ELSE 0 END)',
+    'empates_casa': 'SUM(CASE WHEN casa = 1 AND gp = gc THEN 1 ELSE 0 END)',
+    'derrotas_casa': 'SUM(CASE WHEN casa = 1 AND gp < gc THEN 1 ELSE 0 END)',
+    'gols_pro_casa': 'SUM(casa * gp)',
+    'gols_contra_casa': 'SUM(casa * gc)',
+}
+
+TEMPORADAS = f'''
+    INSERT INTO estatistica_temporada (campeonato_id, time_id, {', '.join(COLUNAS)})
+    SELECT campeonato_id, time_id, {', '.join(SOMAS[coluna] for coluna in COLUNAS)}
+    FROM ({LADOS}) lados
+    GROUP BY campeonato_id, time_id
+'''
+
+TIMES = f'''
+    INSERT INTO estatistica_time (time_id, {', '.join(COLUNAS)})
+    SELECT time_id, {', '.join(f'SUM({coluna})' for coluna in COLUNAS)}
+    FROM estatistica_temporada
+    GROUP BY time_id
+'''
+
+CONFRONTOS = f'''
+    INSERT INTO estatistica_confronto (time_a_id, time_b_id, {', '.join(CONFRONTO)})
+    SELECT time_a_id, time_b_id, COUNT(*),
+           SUM(CASE WHEN gols_a > gols_b THEN 1 ELSE 0 END),
+           SUM(CASE WHEN gols_a < gols_b THEN 1 ELSE 0 END),
+           SUM(CASE WHEN gols_a = gols_b THEN 1 ELSE 0 END),
+           SUM(gols_a), SUM(gols_b)
+    FROM (
+        SELECT CASE WHEN time_casa_id < time_visitante_id THEN time_casa_id ELSE time_visitante_id END AS time_a_id,
+               CASE WHEN time_casa_id < time_visitante_id THEN time_visitante_id ELSE time_casa_id END AS time_b_id,
+               CASE WHEN time_casa_id < time_visitante_id THEN COALESCE(placar_casa, 0)
+                    ELSE COALESCE(placar_visitante, 0) END AS gols_a,
+               CASE WHEN time_casa_id < time_visitante_id THEN COALESCE(placar_visitante, 0)
+                    ELSE COALESCE(placar_casa, 0) END AS gols_b
+        FROM jogo WHERE status = 'Finalizado'
+    ) pares
+    GROUP BY time_a_id, time_b_id
+'''
+
+RECORDES = f'''
+    SELECT time_id, id FROM (
+        SELECT time_id, id, ROW_NUMBER() OVER (
+            PARTITION BY time_id ORDER BY {{margem}} DESC, {{gols}} DESC, id DESC) AS ordem
+        FROM ({LADOS}) lados
+        WHERE {{margem}} > 0
+    ) candidatos
+    WHERE ordem = 1
+'''
+
+
+def _tabelas(conn):
+    metadata = sa.MetaData()
+    metadata.reflect(conn, only=['campeonato', 'time'])
+    contadores = lambda nomes: [sa.Column(nome, sa.Integer, nullable=False, server_default='0') for nome in nomes]
+
+    return [
+        sa.Table(
+            'estatistica_time', metadata,
+            sa.Column('time_id', sa.Integer, sa.ForeignKey('time.id'), primary_key=True),
+            *contadores(COLUNAS),
+            sa.Column('maior_vitoria_id', sa.Integer, nullable=True),
+            sa.Column('maior_derrota_id', sa.Integer, nullable=True),
+        ),
+        sa.Table(
+            'estatistica_temporada', metadata,
+            sa.Column('campeonato_id', sa.Integer, sa.ForeignKey('campeonato.id'), primary_key=True),
+            sa.Column('time_id', sa.Integer, sa.ForeignKey('time.id'), primary_key=True),
+            *contadores(COLUNAS),
+            sa.Index('ix_estatistica_temporada_time', 'time_id'),
+        ),
+        sa.Table(
+            'estatistica_confronto', metadata,
+            sa.Column('time_a_id', sa.Integer, sa.ForeignKey('time.id'), primary_key=True),
+            sa.Column('time_b_id', sa.Integer, sa.ForeignKey('time.id'), primary_key=True),
+            *contadores(CONFRONTO),
+            sa.Index('ix_estatistica_confronto_time_b', 'time_b_id'),
+        ),
+    ]
+
+
+def preencher(conn):
+    for tabela in ('estatistica_time', 'estatistica_temporada', 'estatistica_confronto'):
+        conn.execute(sa.text(f'DELETE FROM {tabela}'))
+
+    conn.execute(sa.text(TEMPORADAS))
+    conn.execute(sa.text(TIMES))
+    conn.execute(sa.text(CONFRONTOS))
+
+    for coluna, margem, gols in (('maior_vitoria_id', 'gp - gc', 'gp'), ('maior_derrota_id', 'gc - gp', 'gc')):
+        recordes = [{'time_id': time_id, 'jogo_id': jogo_id}
+                    for time_id, jogo_id in conn.execute(sa.text(RECORDES.format(margem=margem, gols=gols)))]
+        if recordes:
+            conn.execute(sa.text(f'UPDATE estatistica_time SET {coluna} = :jogo_id WHERE time_id = :time_id'),
+                         recordes)
+
+
+def upgrade(conn):
+    for tabela in _tabelas(conn):
+        tabela.create(conn, checkfirst=True)
+    preencher(conn)
+
+
+def downgrade(conn):
+    for tabela in reversed(_tabelas(conn)):
+        tabela.drop(conn, checkfirst=True)
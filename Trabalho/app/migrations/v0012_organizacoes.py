@@ -0,0 +1,118 @@
+import sqlalchemy as sa
+from . import v0009_busca_textual as busca_textual
+
+VERSAO = 12
+DESCRICAO = 'Organizações (ligas) e coluna organizacao_id nas tabelas de cada liga'
+
+COLUNA = 'organizacao_id INTEGER NOT NULL DEFAULT 1'
+ALTERADAS = ('campeonato', 'jogo', 'tarefa')
+INDICES = {
+    'ix_campeonato_organizacao_nome': ('campeonato', 'organizacao_id, nome'),
+    'ix_jogo_organizacao_data': ('jogo', 'organizacao_id, data_hora, id'),
+    'ix_tarefa_organizacao': ('tarefa', 'organizacao_id, id'),
+}
+UNICIDADE = {
+    'time': ('nome', 'uq_time_organizacao_nome'),
+    'usuario': ('email', 'uq_usuario_organizacao_email'),
+}
+
+
+def _organizacao(metadata):
+    return sa.Table(
+        'organizacao', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('slug', sa.String(50), unique=True, nullable=False),
+        sa.Column('nome', sa.String(150), nullable=False),
+        sa.Column('dominio', sa.String(255), unique=True, nullable=True),
+        sa.Column('banco_url', sa.String(500), nullable=True),
+        sa.Column('supremo_id', sa.Integer, nullable=True),
+        sa.Column('criado_em', sa.DateTime, nullable=False, server_default=sa.func.current_timestamp()),
+    )
+
+
+def _definicao(tabela, nome, por_organizacao):
+    coluna, restricao = UNICIDADE[tabela]
+    metadata = sa.MetaData()
+    extras = [sa.Column('organizacao_id', sa.Integer, nullable=False, server_default='1'),
+              sa.UniqueConstraint('organizacao_id', coluna, name=restricao)] if por_organizacao else []
+
+    if tabela == 'time':
+        return sa.Table(
+            nome, metadata,
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('nome', sa.String(100), unique=not por_organizacao, nullable=False),
+            *extras,
+        )
+    return sa.Table(
+        nome, metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('nome', sa.String(100), nullable=False),
+        sa.Column('email', sa.String(120), unique=not por_organizacao, nullable=False),
+        sa.Column('senha_hash', sa.String(60), nullable=False),
+        sa.Column('role', sa.String(20), nullable=False),
+        *extras,
+    )
+
+
+def _reconstruir(conn, tabela, por_organizacao):
+    # O SQLite não remove restrições UNIQUE: recria a tabela e copia as linhas.
+    nova = _definicao(tabela, f'{tabela}_nova', por_organizacao)
+    nova.create(conn)
+    colunas = ', '.join(coluna.name for coluna in nova.columns if coluna.name != 'organizacao_id')
+    conn.execute(sa.text(f'INSERT INTO {nova.name} ({colunas}) SELECT {colunas} FROM {tabela}'))
+    conn.execute(sa.text(f'DROP TABLE {tabela}'))
+    conn.execute(sa.text(f'ALTER TABLE {nova.name} RENAME TO {tabela}'))
+
+
+def _trocar_unicidade(conn, tabela, por_organizacao):
+    coluna, restricao = UNICIDADE[tabela]
+    if por_organizacao:
+        conn.execute(sa.text(f'ALTER TABLE {tabela} ADD COLUMN {COLUNA}'))
+    for existente in sa.inspect(conn).get_unique_constraints(tabela):
+        if existente['column_names'] == ([coluna] if por_organizacao else ['organizacao_id', coluna]):
+            conn.execute(sa.text(f'ALTER TABLE {tabela} DROP CONSTRAINT {existente["name"]}'))
+    if por_organizacao:
+        conn.execute(sa.text(f'ALTER TABLE {tabela} ADD CONSTRAINT {restricao} UNIQUE (organizacao_id, {coluna})'))
+    else:
+        conn.execute(sa.text(f'ALTER TABLE {tabela} ADD UNIQUE ({coluna})'))
+        conn.execute(sa.text(f'ALTER TABLE {tabela} DROP COLUMN organizacao_id'))
+
+
+def _unicidade(conn, por_organizacao):
+    sqlite = conn.dialect.name == 'sqlite'
+    if sqlite:
+        for gatilho in busca_textual.GATILHOS:
+            conn.execute(sa.text(f'DROP TRIGGER IF EXISTS {gatilho}'))
+
+    for tabela in UNICIDADE:
+        if sqlite:
+            _reconstruir(conn, tabela, por_organizacao)
+        else:
+            _trocar_unicidade(conn, tabela, por_organizacao)
+
+    conn.execute(sa.text('CREATE INDEX IF NOT EXISTS ix_time_nome_busca ON time (lower(nome))'))
+    busca_textual.upgrade(conn)
+
+
+def upgrade(conn):
+    metadata = sa.MetaData()
+    organizacao = _organizacao(metadata)
+    organizacao.create(conn, checkfirst=True)
+    if conn.execute(sa.select(organizacao.c.id).where(organizacao.c.id == 1)).first() is None:
+        supremo = conn.execute(sa.text('SELECT id FROM usuario WHERE id = 1')).scalar()
+        conn.execute(sa.insert(organizacao).values(id=1, slug='padrao', nome='SIGTO', supremo_id=supremo))
+
+    for tabela in ALTERADAS:
+        conn.execute(sa.text(f'ALTER TABLE {tabela} ADD COLUMN {COLUNA}'))
+    _unicidade(conn, True)
+    for indice, (tabela, colunas) in INDICES.items():
+        conn.execute(sa.text(f'CREATE INDEX IF NOT EXISTS {indice} ON {tabela} ({colunas})'))
+
+
+def downgrade(conn):
+    for indice in INDICES:
+        conn.execute(sa.text(f'DROP INDEX IF EXISTS {indice}'))
+    for tabela in ALTERADAS:
+        conn.execute(sa.text(f'ALTER TABLE {tabela} DROP COLUMN organizacao_id'))
+    _unicidade(conn, False)
+    _organizacao(sa.MetaData()).drop(conn, checkfirst=True)
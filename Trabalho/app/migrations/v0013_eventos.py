@@ -0,0 +1,39 @@
+import sqlalchemy as sa
+
+VERSAO = 13
+DESCRICAO = 'Registro de eventos (somente inserção) das alterações de jogos, times, campeonatos e usuários'
+
+GATILHO = 'evento_somente_insercao'
+
+
+def _evento():
+    return sa.Table(
+        'evento', sa.MetaData(),
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('organizacao_id', sa.Integer, nullable=False, server_default='1'),
+        sa.Column('tipo', sa.String(50), nullable=False),
+        sa.Column('entidade', sa.String(30), nullable=False),
+        sa.Column('entidade_id', sa.Integer, nullable=True),
+        sa.Column('usuario_id', sa.Integer, nullable=True),
+        sa.Column('dados', sa.Text, nullable=False, server_default='{}'),
+        sa.Column('criado_em', sa.DateTime, nullable=False),
+        sa.Index('ix_evento_organizacao', 'organizacao_id', 'id'),
+        sa.Index('ix_evento_entidade', 'entidade', 'entidade_id', 'id'),
+        sqlite_autoincrement=True,
+    )
+
+
+def upgrade(conn):
+    _evento().create(conn, checkfirst=True)
+    if conn.dialect.name == 'sqlite':
+        conn.execute(sa.text(f'DROP TRIGGER IF EXISTS {GATILHO}'))
+        conn.execute(sa.text(
+            f"CREATE TRIGGER {GATILHO} BEFORE UPDATE ON evento BEGIN "
+            f"SELECT RAISE(ABORT, 'eventos não podem ser alterados'); END"
+        ))
+
+
+def downgrade(conn):
+    if conn.dialect.name == 'sqlite':
+        conn.execute(sa.text(f'DROP TRIGGER IF EXISTS {GATILHO}'))
+    _evento().drop(conn, checkfirst=True)
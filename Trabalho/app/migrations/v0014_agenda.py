@@ -0,0 +1,14 @@
+import sqlalchemy as sa
+
+VERSAO = 14
+DESCRICAO = 'Índice de jogo por campeonato e data (agenda do campeonato)'
+
+INDICE = 'ix_jogo_campeonato_data'
+
+
+def upgrade(conn):
+    conn.execute(sa.text(f'CREATE INDEX IF NOT EXISTS {INDICE} ON jogo (campeonato_id, data_hora, id)'))
+
+
+def downgrade(conn):
+    conn.execute(sa.text(f'DROP INDEX IF EXISTS {INDICE}'))
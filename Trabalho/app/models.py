@@ -1,17 +1,38 @@
-from . import db, login_manager
+from datetime import datetime
+from . import db, organizacoes
 from flask_login import UserMixin
 
-@login_manager.user_loader
-def load_user(user_id):
-    return Usuario.query.get(int(user_id))
+def _organizacao_atual():
+    return organizacoes.atual().id
 
-class Usuario(db.Model, UserMixin):
+class Organizacao(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    slug = db.Column(db.String(50), unique=True, nullable=False)
+    nome = db.Column(db.String(150), nullable=False)
+    dominio = db.Column(db.String(255), unique=True, nullable=True)
+    banco_url = db.Column(db.String(500), nullable=True)
+    supremo_id = db.Column(db.Integer, nullable=True)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = {'info': {'catalogo': True}}
+
+    def __repr__(self):
+        return f'<Organizacao {self.slug}>'
+
+class PorOrganizacao:
+    organizacao_id = db.Column(db.Integer, nullable=False, default=_organizacao_atual)
+
+class Usuario(PorOrganizacao, db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    email = db.Column(db.String(120), nullable=False)
     senha_hash = db.Column(db.String(60), nullable=False)
     role = db.Column(db.String(20), nullable=False, default='Torcedor')
 
+    __table_args__ = (
+        db.UniqueConstraint('organizacao_id', 'email', name='uq_usuario_organizacao_email'),
+    )
+
     def __repr__(self):
         return f'<Usuario {self.nome} ({self.email})>'
 
@@ -20,38 +41,227 @@ campeonato_times = db.Table('campeonato_times',
     db.Column('campeonato_id', db.Integer, db.ForeignKey('campeonato.id'), primary_key=True)
 )
 
-class Time(db.Model):
+class Time(PorOrganizacao, db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    nome = db.Column(db.String(100), unique=True, nullable=False)
+    nome = db.Column(db.String(100), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('organizacao_id', 'nome', name='uq_time_organizacao_nome'),
+        db.Index('ix_time_nome_busca', db.func.lower(nome)),
+    )
 
     def __repr__(self):
         return f'<Time {self.nome}>'
 
-class Campeonato(db.Model):
+class Campeonato(PorOrganizacao, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(150), nullable=False)
     data_inicio = db.Column(db.Date, nullable=True) 
     data_fim = db.Column(db.Date, nullable=True) 
     regras = db.Column(db.Text, nullable=True) 
+    pontos_vitoria = db.Column(db.Integer, nullable=False, default=3)
+    pontos_empate = db.Column(db.Integer, nullable=False, default=1)
+    pontos_derrota = db.Column(db.Integer, nullable=False, default=0)
+    criterios_desempate = db.Column(db.String(200), nullable=False, default='saldo_gols,gols_pro')
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
     jogos = db.relationship('Jogo', backref='campeonato', lazy=True)
 
     times = db.relationship('Time', secondary=campeonato_times, lazy='subquery',
         backref=db.backref('campeonatos', lazy=True))
 
+    __table_args__ = (
+        db.Index('ix_campeonato_organizacao_nome', 'organizacao_id', 'nome'),
+    )
+
     def __repr__(self):
         return f'<Campeonato {self.nome}>'
 
-class Jogo(db.Model):
+class Jogo(PorOrganizacao, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     data_hora = db.Column(db.DateTime, nullable=False)
     placar_casa = db.Column(db.Integer, default=0)
     placar_visitante = db.Column(db.Integer, default=0)
     status = db.Column(db.String(50), default='Agendado') 
+    versao = db.Column(db.Integer, nullable=False, default=1)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
 
     time_casa_id = db.Column(db.Integer, db.ForeignKey('time.id'), nullable=False)
     time_visitante_id = db.Column(db.Integer, db.ForeignKey('time.id'), nullable=False)
     campeonato_id = db.Column(db.Integer, db.ForeignKey('campeonato.id'), nullable=False)
 
     time_casa = db.relationship('Time', foreign_keys=[time_casa_id])
-    time_visitante = db.relationship('Time', foreign_keys=[time_visitante_id])
\ No newline at end of file
+    time_visitante = db.relationship('Time', foreign_keys=[time_visitante_id])
+
+    __mapper_args__ = {'version_id_col': versao}
+
+    __table_args__ = (
+        db.Index('ix_jogo_campeonato_status', 'campeonato_id', 'status'),
+        db.Index('ix_jogo_data_hora_id', 'data_hora', 'id'),
+        db.Index('ix_jogo_time_casa_data', 'time_casa_id', 'data_hora'),
+        db.Index('ix_jogo_time_visitante_data', 'time_visitante_id', 'data_hora'),
+        db.Index('ix_jogo_organizacao_data', 'organizacao_id', 'data_hora', 'id'),
+        db.Index('ix_jogo_campeonato_data', 'campeonato_id', 'data_hora', 'id'),
+    )
+
+class Classificacao(db.Model):
+    campeonato_id = db.Column(db.Integer, db.ForeignKey('campeonato.id'), primary_key=True)
+    time_id = db.Column(db.Integer, db.ForeignKey('time.id'), primary_key=True)
+    pontos = db.Column(db.Integer, nullable=False, default=0)
+    jogos_disputados = db.Column(db.Integer, nullable=False, default=0)
+    vitorias = db.Column(db.Integer, nullable=False, default=0)
+    empates = db.Column(db.Integer, nullable=False, default=0)
+    derrotas = db.Column(db.Integer, nullable=False, default=0)
+    gols_pro = db.Column(db.Integer, nullable=False, default=0)
+    gols_contra = db.Column(db.Integer, nullable=False, default=0)
+    saldo_gols = db.Column(db.Integer, nullable=False, default=0)
+    jogos_disputados_casa = db.Column(db.Integer, nullable=False, default=0)
+    vitorias_casa = db.Column(db.Integer, nullable=False, default=0)
+    empates_casa = db.Column(db.Integer, nullable=False, default=0)
+    derrotas_casa = db.Column(db.Integer, nullable=False, default=0)
+    gols_pro_casa = db.Column(db.Integer, nullable=False, default=0)
+    gols_contra_casa = db.Column(db.Integer, nullable=False, default=0)
+
+    time = db.relationship('Time')
+
+    __table_args__ = (
+        db.Index('ix_classificacao_ordem', 'campeonato_id', 'pontos', 'saldo_gols', 'gols_pro'),
+    )
+
+    def __repr__(self):
+        return f'<Classificacao {self.campeonato_id}/{self.time_id}: {self.pontos} pts>'
+
+class ClassificacaoHistorico(db.Model):
+    campeonato_id = db.Column(db.Integer, db.ForeignKey('campeonato.id'), primary_key=True)
+    data = db.Column(db.Date, primary_key=True)
+    time_id = db.Column(db.Integer, db.ForeignKey('time.id'), primary_key=True)
+    rodada = db.Column(db.Integer, nullable=False)
+    posicao = db.Column(db.Integer, nullable=False)
+    pontos = db.Column(db.Integer, nullable=False, default=0)
+    jogos_disputados = db.Column(db.Integer, nullable=False, default=0)
+    vitorias = db.Column(db.Integer, nullable=False, default=0)
+    empates = db.Column(db.Integer, nullable=False, default=0)
+    derrotas = db.Column(db.Integer, nullable=False, default=0)
+    gols_pro = db.Column(db.Integer, nullable=False, default=0)
+    gols_contra = db.Column(db.Integer, nullable=False, default=0)
+    saldo_gols = db.Column(db.Integer, nullable=False, default=0)
+    jogos_disputados_casa = db.Column(db.Integer, nullable=False, default=0)
+    vitorias_casa = db.Column(db.Integer, nullable=False, default=0)
+    empates_casa = db.Column(db.Integer, nullable=False, default=0)
+    derrotas_casa = db.Column(db.Integer, nullable=False, default=0)
+    gols_pro_casa = db.Column(db.Integer, nullable=False, default=0)
+    gols_contra_casa = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_classificacao_historico_rodada', 'campeonato_id', 'rodada'),
+        db.Index('ix_classificacao_historico_time', 'campeonato_id', 'time_id', 'data'),
+    )
+
+    def __repr__(self):
+        return f'<ClassificacaoHistorico {self.campeonato_id}/{self.data}/{self.time_id}: {self.posicao}º>'
+
+class Tarefa(PorOrganizacao, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    chave = db.Column(db.String(200), nullable=True)
+    parametros = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='Pendente')
+    progresso = db.Column(db.Integer, nullable=False, default=0)
+    mensagem = db.Column(db.String(255), nullable=True)
+    erro = db.Column(db.Text, nullable=True)
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    max_tentativas = db.Column(db.Integer, nullable=False, default=3)
+    worker = db.Column(db.String(100), nullable=True)
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    disponivel_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    iniciado_em = db.Column(db.DateTime, nullable=True)
+    concluido_em = db.Column(db.DateTime, nullable=True)
+    bloqueado_ate = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_tarefa_fila', 'status', 'disponivel_em'),
+        db.Index('ix_tarefa_chave', 'chave', 'status'),
+        db.Index('ix_tarefa_organizacao', 'organizacao_id', 'id'),
+        {'info': {'catalogo': True}},
+    )
+
+    def __repr__(self):
+        return f'<Tarefa {self.id} {self.tipo} ({self.status})>'
+
+class Evento(PorOrganizacao, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    entidade = db.Column(db.String(30), nullable=False)
+    entidade_id = db.Column(db.Integer, nullable=True)
+    usuario_id = db.Column(db.Integer, nullable=True)
+    dados = db.Column(db.Text, nullable=False, default='{}')
+    criado_em = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_evento_organizacao', 'organizacao_id', 'id'),
+        db.Index('ix_evento_entidade', 'entidade', 'entidade_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f'<Evento {self.id} {self.tipo} {self.entidade_id}>'
+
+class EstatisticaTime(db.Model):
+    time_id = db.Column(db.Integer, db.ForeignKey('time.id'), primary_key=True)
+    jogos_disputados = db.Column(db.Integer, nullable=False, default=0)
+    vitorias = db.Column(db.Integer, nullable=False, default=0)
+    empates = db.Column(db.Integer, nullable=False, default=0)
+    derrotas = db.Column(db.Integer, nullable=False, default=0)
+    gols_pro = db.Column(db.Integer, nullable=False, default=0)
+    gols_contra = db.Column(db.Integer, nullable=False, default=0)
+    jogos_disputados_casa = db.Column(db.Integer, nullable=False, default=0)
+    vitorias_casa = db.Column(db.Integer, nullable=False, default=0)
+    empates_casa = db.Column(db.Integer, nullable=False, default=0)
+    derrotas_casa = db.Column(db.Integer, nullable=False, default=0)
+    gols_pro_casa = db.Column(db.Integer, nullable=False, default=0)
+    gols_contra_casa = db.Column(db.Integer, nullable=False, default=0)
+    maior_vitoria_id = db.Column(db.Integer, nullable=True)
+    maior_derrota_id = db.Column(db.Integer, nullable=True)
+
+    def __repr__(self):
+        return f'<EstatisticaTime {self.time_id}: {self.jogos_disputados} jogos>'
+
+class EstatisticaTemporada(db.Model):
+    campeonato_id = db.Column(db.Integer, db.ForeignKey('campeonato.id'), primary_key=True)
+    time_id = db.Column(db.Integer, db.ForeignKey('time.id'), primary_key=True)
+    jogos_disputados = db.Column(db.Integer, nullable=False, default=0)
+    vitorias = db.Column(db.Integer, nullable=False, default=0)
+    empates = db.Column(db.Integer, nullable=False, default=0)
+    derrotas = db.Column(db.Integer, nullable=False, default=0)
+    gols_pro = db.Column(db.Integer, nullable=False, default=0)
+    gols_contra = db.Column(db.Integer, nullable=False, default=0)
+    jogos_disputados_casa = db.Column(db.Integer, nullable=False, default=0)
+    vitorias_casa = db.Column(db.Integer, nullable=False, default=0)
+    empates_casa = db.Column(db.Integer, nullable=False, default=0)
+    derrotas_casa = db.Column(db.Integer, nullable=False, default=0)
+    gols_pro_casa = db.Column(db.Integer, nullable=False, default=0)
+    gols_contra_casa = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_estatistica_temporada_time', 'time_id'),
+    )
+
+    def __repr__(self):
+        return f'<EstatisticaTemporada {self.campeonato_id}/{self.time_id}: {self.jogos_disputados} jogos>'
+
+class EstatisticaConfronto(db.Model):
+    time_a_id = db.Column(db.Integer, db.ForeignKey('time.id'), primary_key=True)
+    time_b_id = db.Column(db.Integer, db.ForeignKey('time.id'), primary_key=True)
+    jogos_disputados = db.Column(db.Integer, nullable=False, default=0)
+    vitorias_a = db.Column(db.Integer, nullable=False, default=0)
+    vitorias_b = db.Column(db.Integer, nullable=False, default=0)
+    empates = db.Column(db.Integer, nullable=False, default=0)
+    gols_a = db.Column(db.Integer, nullable=False, default=0)
+    gols_b = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_estatistica_confronto_time_b', 'time_b_id'),
+    )
+
+    def __repr__(self):
+        return f'<EstatisticaConfronto {self.time_a_id} x {self.time_b_id}: {self.jogos_disputados} jogos>'
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+import bcrypt
+
+TAMANHO_MAXIMO = 72
+
+
+class Sobrecarga(RuntimeError):
+    pass
+
+
+def _bytes(valor):
+    return valor.encode('utf-8') if isinstance(valor, str) else valor
+
+
+def _gerar(senha, rounds, prefixo):
+    return bcrypt.hashpw(senha, bcrypt.gensalt(rounds, prefixo)).decode('utf-8')
+
+
+def _verificar(senha_hash, senha):
+    try:
+        return bcrypt.checkpw(senha, senha_hash)
+    except ValueError:
+        return False
+
+
+def custo(senha_hash):
+    try:
+        return int(senha_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class Senhas:
+
+    def __init__(self):
+        self._pool = None
+        self._pid = None
+        self._vagas = None
+        self._trava = threading.Lock()
+        self.processos = 0
+        self.timeout = 5
+        self.rounds = 12
+        self.prefixo = b'2b'
+
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('BCRYPT_HASH_PREFIX', '2b')
+        app.config.setdefault('SENHAS_PROCESSOS', 2)
+        app.config.setdefault('SENHAS_FILA_MAXIMA', 32)
+        app.config.setdefault('SENHAS_TIMEOUT', 5)
+
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.prefixo = _bytes(app.config['BCRYPT_HASH_PREFIX'])
+        self.processos = app.config['SENHAS_PROCESSOS']
+        self.timeout = app.config['SENHAS_TIMEOUT']
+        self._vagas = threading.BoundedSemaphore(app.config['SENHAS_FILA_MAXIMA'])
+
+    def _executor(self):
+        with self._trava:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.processos,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+            return self._pool
+
+    def _executar(self, funcao, *args):
+        if not self.processos:
+            return funcao(*args)
+
+        if not self._vagas.acquire(blocking=False):
+            raise Sobrecarga('Fila de verificação de senhas cheia.')
+        try:
+            futuro = self._executor().submit(funcao, *args)
+        except Exception:
+            self._vagas.release()
+            raise
+        futuro.add_done_callback(lambda _: self._vagas.release())
+
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            futuro.cancel()
+            raise Sobrecarga('Tempo esgotado na verificação de senha.')
+
+    def aquecer(self):
+        if self.processos:
+            executor = self._executor()
+            for futuro in [executor.submit(custo, '') for _ in range(self.processos)]:
+                futuro.result()
+
+    def gerar_hash(self, senha):
+        return self._executar(_gerar, _bytes(senha)[:TAMANHO_MAXIMO], self.rounds, self.prefixo)
+
+    def verificar(self, senha_hash, senha):
+        return self._executar(_verificar, _bytes(senha_hash), _bytes(senha)[:TAMANHO_MAXIMO])
+
+    def precisa_rehash(self, senha_hash):
+        return custo(senha_hash) != self.rounds
+
+    def encerrar(self):
+        with self._trava:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
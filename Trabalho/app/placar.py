@@ -0,0 +1,65 @@
+from sqlalchemy import update
+from . import db, cache, broker, standings, estatisticas, eventos
+from .models import Jogo
+from .api import serializar_jogo
+
+
+class ConflitoDeVersao(Exception):
+    pass
+
+
+def atualizar_placar(jogo_id, versao, placar_casa, placar_visitante, status):
+    atual = db.session.execute(
+        db.select(Jogo.campeonato_id, Jogo.time_casa_id, Jogo.time_visitante_id,
+                  Jogo.placar_casa, Jogo.placar_visitante, Jogo.status, Jogo.versao, Jogo.data_hora)
+        .where(Jogo.id == jogo_id)
+    ).first()
+    if atual is None:
+        return None
+    if atual.versao != versao:
+        raise ConflitoDeVersao(atual.versao)
+
+    resultado = db.session.execute(
+        update(Jogo)
+        .where(Jogo.id == jogo_id, Jogo.versao == versao)
+        .values(placar_casa=placar_casa, placar_visitante=placar_visitante,
+                status=status, versao=versao + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if resultado.rowcount != 1:
+        raise ConflitoDeVersao(None)
+
+    antes = standings.Resultado(atual.campeonato_id, atual.time_casa_id, atual.time_visitante_id,
+                                atual.placar_casa or 0, atual.placar_visitante or 0, atual.status,
+                                atual.data_hora, jogo_id)
+    depois = antes._replace(placar_casa=placar_casa, placar_visitante=placar_visitante, status=status)
+    standings.atualizar_jogo(antes, depois)
+    estatisticas.atualizar_jogo(antes, depois)
+    eventos.registrar('jogo.atualizado', jogo_id, {
+        'id': jogo_id, **atual._asdict(), 'placar_casa': placar_casa, 'placar_visitante': placar_visitante,
+        'status': status, 'versao': versao + 1})
+    return atual.campeonato_id, versao + 1
+
+
+def publicar_tabela(campeonato_id):
+    broker.publicar([f'campeonato:{campeonato_id}'], 'tabela',
+                    cache.memorizar(f'tabela:{campeonato_id}', [f'campeonato:{campeonato_id}'],
+                                    lambda: standings.tabela_serializada(campeonato_id)))
+
+
+def publicar_jogo(jogo, evento='placar'):
+    broker.publicar(['jogos', f'jogo:{jogo.id}', f'campeonato:{jogo.campeonato_id}'], evento, serializar_jogo(jogo))
+    publicar_tabela(jogo.campeonato_id)
+
+
+def publicar_remocao(jogo_id, campeonato_id):
+    broker.publicar(['jogos', f'jogo:{jogo_id}', f'campeonato:{campeonato_id}'], 'removido',
+                    {'id': jogo_id, 'campeonato_id': campeonato_id})
+    publicar_tabela(campeonato_id)
+
+
+def publicar_novos(campeonato_ids):
+    # Importações podem criar milhares de jogos: um aviso por campeonato em vez de um por jogo.
+    for campeonato_id in campeonato_ids:
+        broker.publicar(['jogos', f'campeonato:{campeonato_id}'], 'novos', {'campeonato_id': campeonato_id})
+        publicar_tabela(campeonato_id)
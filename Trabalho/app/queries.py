@@ -0,0 +1,84 @@
+import base64
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, func, exists
+from sqlalchemy.orm import joinedload
+from . import db
+from .models import Jogo, Time, campeonato_times
+
+JOGOS_POR_PAGINA = 50
+RESULTADOS_BUSCA = 20
+
+
+def codificar_cursor(jogo):
+    bruto = f'{jogo.data_hora.isoformat()}|{jogo.id}'
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data_hora, jogo_id = bruto.rsplit('|', 1)
+        return datetime.fromisoformat(data_hora), int(jogo_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Cursor de paginação inválido.')
+
+
+def filtrar_jogos(consulta, campeonato_id=None, time_id=None, status=None,
+                  data_inicio=None, data_fim=None):
+    if campeonato_id is not None:
+        consulta = consulta.filter(Jogo.campeonato_id == campeonato_id)
+    if time_id is not None:
+        consulta = consulta.filter(or_(Jogo.time_casa_id == time_id,
+                                       Jogo.time_visitante_id == time_id))
+    if status:
+        consulta = consulta.filter(Jogo.status == status)
+    if data_inicio is not None:
+        consulta = consulta.filter(Jogo.data_hora >= datetime.combine(data_inicio, datetime.min.time()))
+    if data_fim is not None:
+        consulta = consulta.filter(Jogo.data_hora < datetime.combine(data_fim + timedelta(days=1), datetime.min.time()))
+    return consulta
+
+
+def pagina_de_jogos(cursor=None, limite=JOGOS_POR_PAGINA, **filtros):
+    consulta = filtrar_jogos(Jogo.query, **filtros).options(
+        joinedload(Jogo.campeonato),
+        joinedload(Jogo.time_casa),
+        joinedload(Jogo.time_visitante)
+    )
+
+    if cursor:
+        data_hora, jogo_id = decodificar_cursor(cursor)
+        consulta = consulta.filter(or_(
+            Jogo.data_hora < data_hora,
+            and_(Jogo.data_hora == data_hora, Jogo.id < jogo_id)
+        ))
+
+    jogos = consulta.order_by(Jogo.data_hora.desc(), Jogo.id.desc()).limit(limite + 1).all()
+
+    proximo_cursor = None
+    if len(jogos) > limite:
+        jogos = jogos[:limite]
+        proximo_cursor = codificar_cursor(jogos[-1])
+
+    return jogos, proximo_cursor
+
+
+def nao_inscrito(campeonato_id):
+    return ~exists().where(campeonato_times.c.time_id == Time.id,
+                           campeonato_times.c.campeonato_id == campeonato_id)
+
+
+def times_disponiveis(campeonato_id, limite):
+    return db.session.execute(
+        db.select(Time.id, Time.nome).where(nao_inscrito(campeonato_id))
+        .order_by(Time.nome).limit(limite)
+    ).all()
+
+
+def buscar_times(termo, limite=RESULTADOS_BUSCA, campeonato_id=None):
+    termo = termo.strip().lower()
+    chave = func.lower(Time.nome)
+    consulta = db.select(Time.id, Time.nome).where(chave >= termo, chave < termo + '\uffff')
+    if campeonato_id is not None:
+        consulta = consulta.where(nao_inscrito(campeonato_id))
+    return db.session.execute(consulta.order_by(chave).limit(limite)).all()
@@ -0,0 +1,69 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class BaldeMemoria:
+
+    def __init__(self, max_chaves=10000):
+        self.max_chaves = max_chaves
+        self._baldes = OrderedDict()
+        self._trava = threading.Lock()
+
+    def consumir(self, baldes, agora=None):
+        # baldes: {chave: (capacidade, por_segundo)}. Só gasta se todos tiverem ficha, para que um balde
+        # que recusa não deixe drenar os outros (um IP bloqueado esvaziando a conta de outra pessoa).
+        agora = time.monotonic() if agora is None else agora
+        with self._trava:
+            saldos = {}
+            for chave, (capacidade, por_segundo) in baldes.items():
+                fichas, ultimo = self._baldes.pop(chave, (capacidade, agora))
+                saldos[chave] = min(capacidade, fichas + (agora - ultimo) * por_segundo)
+
+            permitido = all(fichas >= 1 for fichas in saldos.values())
+            espera = 0
+            for chave, fichas in saldos.items():
+                if permitido:
+                    fichas -= 1
+                elif fichas < 1:
+                    espera = max(espera, math.ceil((1 - fichas) / baldes[chave][1]))
+                self._baldes[chave] = (fichas, agora)
+            while len(self._baldes) > self.max_chaves:
+                self._baldes.popitem(last=False)
+        return permitido, espera
+
+    def limpar(self):
+        with self._trava:
+            self._baldes.clear()
+
+
+class Limitador:
+
+    def __init__(self):
+        self.store = BaldeMemoria()
+        self.regras = {}
+
+    def init_app(self, app):
+        app.config.setdefault('LOGIN_LIMITE_IP', (20, 10))
+        app.config.setdefault('LOGIN_LIMITE_CONTA', (5, 2))
+        app.config.setdefault('LIMITE_MAX_CHAVES', 10000)
+
+        self.store.max_chaves = app.config['LIMITE_MAX_CHAVES']
+        self.regras = {
+            'ip': app.config['LOGIN_LIMITE_IP'],
+            'conta': app.config['LOGIN_LIMITE_CONTA'],
+        }
+
+    def verificar(self, **chaves):
+        baldes = {}
+        for regra, valor in chaves.items():
+            limite = self.regras.get(regra)
+            if not limite or valor is None:
+                continue
+            capacidade, por_minuto = limite
+            baldes[f'{regra}:{valor}'] = (capacidade, por_minuto / 60)
+        if not baldes:
+            return 0
+        _, espera = self.store.consumir(baldes)
+        return espera
@@ -1,96 +1,94 @@
-from flask import render_template, redirect, url_for, flash, Blueprint, request
-from .forms import TimeForm, CampeonatoForm, JogoForm, LoginForm, AdminUserCreationForm, InscreverTimeForm
-from .models import Time, Campeonato, Jogo, Usuario
-from flask_login import login_user, current_user, logout_user, login_required 
-from collections import defaultdict
-from . import db, bcrypt
-from .decorators import admin_required
+from flask import render_template, stream_template, get_flashed_messages, redirect, url_for, flash, Blueprint, request, abort, current_app, stream_with_context, jsonify, make_response
+from flask_wtf.csrf import generate_csrf
+from .forms import TimeForm, CampeonatoForm, JogoForm, LoginForm, AdminUserCreationForm, InscreverTimeForm, ImportarJogosForm, GerarJogosForm, PlacarForm, FiltroJogosForm
+from .models import Time, Campeonato, Jogo, Usuario, Tarefa
+from flask_login import login_user, current_user, logout_user
+from datetime import date, timedelta
+from itertools import groupby
+from sqlalchemy.orm.exc import StaleDataError
+from . import db, cache, senhas, limitador, organizacoes, standings, queries, importacao, placar, historico, busca, estatisticas, exportacao, eventos, agenda
+from .passwords import Sobrecarga
+from .decorators import admin_required, supremo_required, permissao_requerida, e_supremo
+from .auth import registrar_sessao, encerrar_sessao, invalidar_usuario
+from .jobs import fila, ATIVAS
 
 main = Blueprint('main', __name__)
 
+MENSAGEM_CONFLITO = 'Este jogo foi alterado por outro operador. Confira os dados e tente novamente.'
+
+def _invalidar_jogo(*campeonato_ids):
+    cache.invalidar('jogos', *{f'campeonato:{campeonato_id}' for campeonato_id in campeonato_ids})
+
+def _invalidar_time(campeonato_ids):
+    cache.invalidar('times', 'jogos', *(f'campeonato:{campeonato_id}' for campeonato_id in campeonato_ids))
+
+def _resposta_indisponivel(conteudo, status, espera):
+    resposta = make_response(conteudo, status)
+    resposta.headers['Retry-After'] = str(espera)
+    return resposta
+
+def _renderizar_em_fluxo(template, **contexto):
+    # A sessão é gravada antes do corpo: consome as mensagens e o token CSRF agora.
+    get_flashed_messages(with_categories=True)
+    if current_user.is_authenticated:
+        generate_csrf()
+    return stream_template(template, **contexto)
+
+def _filtro_canonico(form, endpoint):
+    # Um time escolhido pelo nome na busca vira o id: é a forma usada nos links, no cache e nos calendários.
+    for campo in (form.campeonato, form.time):
+        if campo.data is not None and campo.valor_bruto != str(campo.data.id):
+            return redirect(url_for(endpoint, **dict(request.args.to_dict(), **{campo.name: campo.data.id})))
+    return None
+
+def _tags_jogos():
+    campeonato_id = request.args.get('campeonato', type=int)
+    principal = f'campeonato:{campeonato_id}' if campeonato_id is not None else 'jogos'
+    return [principal, 'campeonatos', 'times']
+
 @main.route('/')
 def home():
     return render_template('index.html')
 
-@main.route('/alguma-coisa')
-@admin_required
-def nome_da_rota():
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão...', 'danger')
-        return redirect(url_for('main.home'))
+@main.route('/busca')
+def buscar():
+    termo = request.args.get('q', '').strip()
+    resultados = busca.buscar(termo)
+    return render_template('busca.html', termo=termo, resultados=resultados)
 
 @main.route('/tabelas/<int:id>')
+@cache.pagina(tags=lambda id: [f'campeonato:{id}'])
 def ver_tabela_campeonato(id):
     campeonato = Campeonato.query.get_or_404(id)
+    rodada = request.args.get('rodada', type=int)
+    data = request.args.get('data', type=date.fromisoformat)
 
-    estatisticas = defaultdict(lambda: {
-        'nome': '', 'pontos': 0, 'vitorias': 0, 'empates': 0, 'derrotas': 0,
-        'gols_pro': 0, 'gols_contra': 0, 'saldo_gols': 0, 'jogos_disputados': 0
-    })
-
-    for time in campeonato.times:
-        estatisticas[time.id]['nome'] = time.nome
-
-    jogos_finalizados = Jogo.query.filter_by(status='Finalizado', campeonato_id=id).all()
-
-    for jogo in jogos_finalizados:
-
-        if jogo.time_casa_id in estatisticas and jogo.time_visitante_id in estatisticas:
-            time_casa = estatisticas[jogo.time_casa_id]
-            time_visitante = estatisticas[jogo.time_visitante_id]
+    referencia = None
+    if rodada is not None or data is not None:
+        referencia, tabela_ordenada = historico.tabela_na_data(id, data, rodada)
+    else:
+        tabela_ordenada = cache.memorizar(f'tabela:{id}', [f'campeonato:{id}'],
+                                          lambda: standings.tabela_serializada(id))
 
-            time_casa['jogos_disputados'] += 1
-            time_visitante['jogos_disputados'] += 1
-            
-            time_casa['gols_pro'] += jogo.placar_casa
-            time_casa['gols_contra'] += jogo.placar_visitante
-            time_visitante['gols_pro'] += jogo.placar_visitante
-            time_visitante['gols_contra'] += jogo.placar_casa
-
-            if jogo.placar_casa > jogo.placar_visitante:
-                time_casa['pontos'] += 3
-                time_casa['vitorias'] += 1
-                time_visitante['derrotas'] += 1
-            elif jogo.placar_casa < jogo.placar_visitante:
-                time_visitante['pontos'] += 3
-                time_visitante['vitorias'] += 1
-                time_casa['derrotas'] += 1
-            else:
-                time_casa['pontos'] += 1
-                time_casa['empates'] += 1
-                time_visitante['pontos'] += 1
-                time_visitante['empates'] += 1
-
-    tabela_classificacao = []
-    for time_id, stats in estatisticas.items():
-        stats['saldo_gols'] = stats['gols_pro'] - stats['gols_contra']
-        tabela_classificacao.append(stats)
-
-    tabela_ordenada = sorted(tabela_classificacao, 
-                             key=lambda x: (x['pontos'], x['saldo_gols'], x['gols_pro']), 
-                             reverse=True)
-    
     return render_template('tabela_campeonato.html', 
                            tabela=tabela_ordenada, 
-                           campeonato=campeonato)
+                           campeonato=campeonato,
+                           referencia=referencia,
+                           historico_ativo=rodada is not None or data is not None,
+                           rodadas=historico.rodadas(id),
+                           pontuacao=standings.pontuacao(campeonato),
+                           criterios=standings.criterios(campeonato),
+                           nomes_criterios=standings.CRITERIOS)
 
 @main.route('/times')
 @admin_required
 def times():
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão para acessar esta página.', 'danger')
-        return redirect(url_for('main.home'))
-        
     todos_os_times = Time.query.all()
     return render_template('times.html', times=todos_os_times)
 
 @main.route('/times/novo', methods=['GET', 'POST'])
 @admin_required 
 def novo_time():
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão para acessar esta página.', 'danger')
-        return redirect(url_for('main.home'))
-        
     form = TimeForm()
     
     if form.validate_on_submit():
@@ -99,26 +97,51 @@ def novo_time():
         time = Time(nome=nome_time)
         
         db.session.add(time)
+        eventos.registrar_objeto('time.criado', time)
         db.session.commit()
+        cache.invalidar('times')
         
         flash('Time cadastrado com sucesso!', 'success')
         return redirect(url_for('main.times'))
 
     return render_template('cadastrar_time.html', form=form)
 
+@main.route('/times/buscar')
+def buscar_times():
+    termo = request.args.get('q', '')
+    if len(termo.strip()) < 2:
+        return jsonify([])
+    limite = max(1, min(request.args.get('limite', queries.RESULTADOS_BUSCA, type=int), queries.RESULTADOS_BUSCA))
+    resultados = queries.buscar_times(termo, limite, campeonato_id=request.args.get('campeonato', type=int))
+    return jsonify([{'id': id, 'nome': nome} for id, nome in resultados])
+
+@main.route('/times/<int:id>')
+@cache.pagina(tags=lambda id: ['times', 'campeonatos', 'jogos'])
+def perfil_time(id):
+    perfil = estatisticas.perfil_time(id)
+    if perfil is None:
+        abort(404)
+    return render_template('perfil_time.html', perfil=perfil)
+
+@main.route('/confrontos/<int:time_id>/<int:adversario_id>')
+@cache.pagina(tags=lambda time_id, adversario_id: ['times', 'campeonatos', 'jogos'])
+def confronto(time_id, adversario_id):
+    dados = estatisticas.confronto(time_id, adversario_id)
+    if dados is None or time_id == adversario_id:
+        abort(404)
+    return render_template('confronto.html', confronto=dados)
+
 @main.route('/times/<int:id>/editar', methods=['GET', 'POST'])
 @admin_required
 def editar_time(id):
-
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão para acessar esta página.', 'danger')
-        return redirect(url_for('main.home'))
     time = Time.query.get_or_404(id)
     form = TimeForm()
     
     if form.validate_on_submit():
         time.nome = form.nome.data  
+        eventos.registrar_objeto('time.atualizado', time)
         db.session.commit()         
+        _invalidar_time(campeonato.id for campeonato in time.campeonatos)
         flash('Time atualizado com sucesso!', 'success')
         return redirect(url_for('main.times'))
     
@@ -130,29 +153,25 @@ def editar_time(id):
 @main.route('/times/<int:id>/deletar', methods=['POST'])
 @admin_required
 def deletar_time(id):
-
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão para acessar esta página.', 'danger')
-        return redirect(url_for('main.home'))
     time = Time.query.get_or_404(id)
-    db.session.delete(time)
-    db.session.commit()
-    flash('Time removido com sucesso!', 'danger')
-    return redirect(url_for('main.times'))
+    flash(f'Remoção do time "{time.nome}" agendada.', 'info')
+    tarefa = fila.enfileirar('deletar_time', chave=f'deletar_time:{id}', time_id=time.id)
+    return redirect(url_for('main.ver_tarefa', id=tarefa.id))
 
 @main.route('/campeonatos')
+@cache.pagina(tags=lambda: ['campeonatos'])
 def campeonatos():
 
-    todos_os_campeonatos = Campeonato.query.all()
-    return render_template('campeonatos.html', campeonatos=todos_os_campeonatos)
+    todos_os_campeonatos = cache.memorizar('campeonatos', ['campeonatos'], lambda: [
+        {'id': camp.id, 'nome': camp.nome, 'data_inicio': camp.data_inicio, 'data_fim': camp.data_fim,
+         'atualizado_em': camp.atualizado_em}
+        for camp in Campeonato.query.all()
+    ])
+    return _renderizar_em_fluxo('campeonatos.html', campeonatos=todos_os_campeonatos)
 
 @main.route('/campeonatos/novo', methods=['GET', 'POST'])
 @admin_required
 def novo_campeonato():
-
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão para acessar esta página.', 'danger')
-        return redirect(url_for('main.home'))
     form = CampeonatoForm()
     if form.validate_on_submit():
 
@@ -160,14 +179,20 @@ def novo_campeonato():
             nome=form.nome.data,
             data_inicio=form.data_inicio.data,
             data_fim=form.data_fim.data,
-            regras=form.regras.data
+            regras=form.regras.data,
+            pontos_vitoria=form.pontos_vitoria.data,
+            pontos_empate=form.pontos_empate.data,
+            pontos_derrota=form.pontos_derrota.data,
+            criterios_desempate=form.criterios_desempate.data
         )
         db.session.add(campeonato)
+        eventos.registrar_objeto('campeonato.criado', campeonato)
         db.session.commit()
+        cache.invalidar('campeonatos')
         flash('Campeonato cadastrado com sucesso!', 'success')
         return redirect(url_for('main.campeonatos'))
     
-    return render_template('cadastrar_campeonato.html', form=form)
+    return render_template('cadastrar_campeonato.html', form=form, criterios=standings.CRITERIOS)
 
 @main.route('/campeonatos/<int:id>/editar', methods=['GET', 'POST'])
 @admin_required
@@ -177,34 +202,63 @@ def editar_campeonato(id):
     
     form_inscricao = InscreverTimeForm(campeonato_id=id)
 
-    if form_campeonato.validate_on_submit() and form_campeonato.submit_campeonato.data:
+    if form_campeonato.submit_campeonato.data and form_campeonato.validate_on_submit():
+        regra_anterior = standings.pontuacao(campeonato)
+        criterios_anteriores = standings.criterios(campeonato)
+        campeonato.nome = form_campeonato.nome.data
+        campeonato.data_inicio = form_campeonato.data_inicio.data
+        campeonato.data_fim = form_campeonato.data_fim.data
+        campeonato.regras = form_campeonato.regras.data
+        campeonato.pontos_vitoria = form_campeonato.pontos_vitoria.data
+        campeonato.pontos_empate = form_campeonato.pontos_empate.data
+        campeonato.pontos_derrota = form_campeonato.pontos_derrota.data
+        campeonato.criterios_desempate = form_campeonato.criterios_desempate.data
+        if standings.criterios(campeonato) != criterios_anteriores:
+            standings.descartar_historico(id)
+        eventos.registrar_objeto('campeonato.atualizado', campeonato)
+        db.session.commit()
+        cache.invalidar('campeonatos', f'campeonato:{id}')
+        historico.agendar(id)
         flash('Dados do campeonato atualizados!', 'success')
+        if standings.pontuacao(campeonato) != regra_anterior:
+            tarefa = fila.enfileirar('reconstruir_tabela', chave=f'reconstruir_tabela:{id}', campeonato_id=id)
+            flash('A tabela será recalculada com a nova pontuação.', 'info')
+            return redirect(url_for('main.ver_tarefa', id=tarefa.id))
         return redirect(url_for('main.editar_campeonato', id=id))
     
-    if form_inscricao.validate_on_submit() and form_inscricao.submit_inscricao.data:
+    if form_inscricao.submit_inscricao.data and form_inscricao.validate_on_submit():
         
         times_para_inscrever = form_inscricao.times.data
         
         inscritos_count = 0
         for time in times_para_inscrever:
             campeonato.times.append(time)
+            standings.inscrever_time(campeonato.id, time.id)
             inscritos_count += 1
         
         if inscritos_count > 0:
+            eventos.registrar_lote('inscricao.criada', [(id, {'campeonato_id': id, 'time_id': time.id})
+                                                        for time in times_para_inscrever])
             db.session.commit()
+            cache.invalidar(f'campeonato:{id}')
+            historico.agendar(id)
             flash(f'{inscritos_count} time(s) inscritos com sucesso!', 'success')
         else:
             flash('Nenhum time novo foi selecionado.', 'info')
         
         return redirect(url_for('main.editar_campeonato', id=id))
 
+    if request.method == 'GET':
+        form_campeonato.process(obj=campeonato)
+
     times_inscritos = campeonato.times
     
     return render_template('editar_campeonato.html', 
                            form_campeonato=form_campeonato,
                            form_inscricao=form_inscricao,
                            campeonato=campeonato,
-                           times_inscritos=times_inscritos)
+                           times_inscritos=times_inscritos,
+                           criterios=standings.CRITERIOS)
 
 @main.route('/campeonatos/<int:campeonato_id>/remover-time/<int:time_id>', methods=['POST'])
 @admin_required
@@ -213,8 +267,13 @@ def remover_time_campeonato(campeonato_id, time_id):
     time_para_remover = Time.query.get_or_404(time_id)
 
     if time_para_remover in campeonato.times:
+        standings.remover_time(campeonato.id, time_para_remover.id)
         campeonato.times.remove(time_para_remover)
+        eventos.registrar('inscricao.removida', campeonato_id,
+                          {'campeonato_id': campeonato_id, 'time_id': time_para_remover.id})
         db.session.commit()
+        cache.invalidar(f'campeonato:{campeonato_id}')
+        historico.agendar(campeonato_id)
         flash(f'Time "{time_para_remover.nome}" removido do campeonato.', 'success')
     else:
         flash(f'O time "{time_para_remover.nome}" não estava neste campeonato.', 'warning')
@@ -224,28 +283,46 @@ def remover_time_campeonato(campeonato_id, time_id):
 @main.route('/campeonatos/<int:id>/deletar', methods=['POST'])
 @admin_required
 def deletar_campeonato(id):
-
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão para acessar esta página.', 'danger')
-        return redirect(url_for('main.home'))
     campeonato = Campeonato.query.get_or_404(id)
-    db.session.delete(campeonato)
-    db.session.commit()
-    flash('Campeonato removido com sucesso!', 'danger')
-    return redirect(url_for('main.campeonatos'))
+    flash(f'Remoção do campeonato "{campeonato.nome}" agendada.', 'info')
+    tarefa = fila.enfileirar('deletar_campeonato', chave=f'deletar_campeonato:{id}', campeonato_id=campeonato.id)
+    return redirect(url_for('main.ver_tarefa', id=tarefa.id))
 
 @main.route('/jogos')
+@cache.pagina(tags=_tags_jogos)
 def jogos():
-    todos_os_jogos = Jogo.query.order_by(Jogo.data_hora.desc()).all()
-    return render_template('jogos.html', jogos=todos_os_jogos)
+    form_filtros = FiltroJogosForm(request.args)
+    canonico = _filtro_canonico(form_filtros, 'main.jogos')
+    if canonico is not None:
+        return canonico
+    filtros = {
+        'campeonato_id': form_filtros.campeonato.data.id if form_filtros.campeonato.data else None,
+        'time_id': form_filtros.time.data.id if form_filtros.time.data else None,
+        'status': request.args.get('status') or None,
+        'data_inicio': request.args.get('de', type=date.fromisoformat),
+        'data_fim': request.args.get('ate', type=date.fromisoformat),
+    }
+
+    cursor = request.args.get('cursor')
+    try:
+        pagina, proximo_cursor = queries.pagina_de_jogos(cursor=cursor, **filtros)
+    except ValueError:
+        abort(400)
+
+    versao_nomes, _ = cache.estado(['times', 'campeonatos'])
+    return _renderizar_em_fluxo('jogos.html',
+                                jogos=pagina,
+                                cursor_atual=cursor,
+                                proximo_cursor=proximo_cursor,
+                                filtros={chave: valor for chave, valor in request.args.items()
+                                         if chave != 'cursor' and valor},
+                                form_filtros=form_filtros,
+                                form_placar=PlacarForm(),
+                                versao_nomes=versao_nomes)
 
 @main.route('/jogos/novo', methods=['GET', 'POST'])
 @admin_required
 def novo_jogo():
-
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão para acessar esta página.', 'danger')
-        return redirect(url_for('main.home'))
     form = JogoForm()
     
     if form.validate_on_submit():
@@ -260,23 +337,76 @@ def novo_jogo():
             status=form.status.data
         )
         db.session.add(jogo)
+        standings.atualizar_jogo(None, standings.resultado(jogo))
+        estatisticas.atualizar_jogo(None, standings.resultado(jogo))
+        eventos.registrar_objeto('jogo.criado', jogo)
         db.session.commit()
+        _invalidar_jogo(jogo.campeonato_id)
+        placar.publicar_jogo(jogo, 'novo')
+        historico.agendar(jogo.campeonato_id)
         flash('Jogo cadastrado com sucesso!', 'success')
         return redirect(url_for('main.jogos'))
     
     return render_template('cadastrar_jogo.html', form=form)
 
+@main.route('/jogos/importar', methods=['GET', 'POST'])
+@admin_required
+def importar_jogos():
+    form = ImportarJogosForm()
+    erros = []
+
+    if form.validate_on_submit():
+        arquivo = form.arquivo.data
+        try:
+            linhas = importacao.ler_arquivo(arquivo.read(), arquivo.filename)
+            jogos, erros = importacao.validar_jogos(linhas)
+        except ValueError:
+            flash('Não foi possível ler o arquivo enviado.', 'danger')
+        else:
+            if erros:
+                flash('Nenhum jogo foi importado. Corrija os erros abaixo.', 'danger')
+            else:
+                tarefa = fila.enfileirar('importar_jogos', linhas=linhas)
+                flash(f'Importação de {len(jogos)} jogo(s) agendada.', 'info')
+                return redirect(url_for('main.ver_tarefa', id=tarefa.id))
+
+    return render_template('importar_jogos.html', form=form, erros=erros)
+
+@main.route('/campeonatos/<int:id>/gerar-jogos', methods=['GET', 'POST'])
+@admin_required
+def gerar_jogos(id):
+    campeonato = Campeonato.query.get_or_404(id)
+    form = GerarJogosForm()
+
+    if form.validate_on_submit():
+        linhas = importacao.gerar_tabela_de_jogos(campeonato, form.inicio.data,
+                                                  form.intervalo.data, form.ida_volta.data)
+        try:
+            jogos = importacao.importar_jogos(linhas)
+        except importacao.ErroImportacao as erro:
+            db.session.rollback()
+            for numero, mensagem in erro.erros[:10]:
+                flash(f'Jogo {numero}: {mensagem}', 'danger')
+            return render_template('gerar_jogos.html', form=form, campeonato=campeonato)
+        db.session.commit()
+        importacao.publicar_importacao(jogos)
+        flash(f'{len(jogos)} jogo(s) gerado(s) para o campeonato!', 'success')
+        return redirect(url_for('main.jogos', campeonato=id))
+
+    return render_template('gerar_jogos.html', form=form, campeonato=campeonato)
+
 @main.route('/jogos/<int:id>/editar', methods=['GET', 'POST'])
 @admin_required
 def editar_jogo(id):
-
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão para acessar esta página.', 'danger')
-        return redirect(url_for('main.home'))
     jogo = Jogo.query.get_or_404(id)
-    form = JogoForm()
+    form = JogoForm(jogo=jogo)
     
     if form.validate_on_submit():
+        if form.versao.data and form.versao.data != str(jogo.versao):
+            flash(MENSAGEM_CONFLITO, 'warning')
+            return redirect(url_for('main.editar_jogo', id=id))
+
+        antes = standings.resultado(jogo)
         jogo.campeonato_id = form.campeonato.data.id
         jogo.time_casa_id = form.time_casa.data.id
         jogo.time_visitante_id = form.time_visitante.data.id
@@ -284,8 +414,21 @@ def editar_jogo(id):
         jogo.placar_casa = form.placar_casa.data
         jogo.placar_visitante = form.placar_visitante.data
         jogo.status = form.status.data
+        standings.atualizar_jogo(antes, standings.resultado(jogo))
+        estatisticas.atualizar_jogo(antes, standings.resultado(jogo))
         
-        db.session.commit()
+        try:
+            eventos.registrar_objeto('jogo.atualizado', jogo)
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            flash(MENSAGEM_CONFLITO, 'warning')
+            return redirect(url_for('main.editar_jogo', id=id))
+        _invalidar_jogo(antes.campeonato_id, jogo.campeonato_id)
+        placar.publicar_jogo(jogo)
+        if antes.campeonato_id != jogo.campeonato_id:
+            placar.publicar_tabela(antes.campeonato_id)
+        historico.agendar(antes.campeonato_id, jogo.campeonato_id)
         flash('Jogo atualizado com sucesso!', 'success')
         return redirect(url_for('main.jogos'))
     
@@ -298,68 +441,147 @@ def editar_jogo(id):
         form.placar_casa.data = jogo.placar_casa
         form.placar_visitante.data = jogo.placar_visitante
         form.status.data = jogo.status
+        form.versao.data = jogo.versao
     
     return render_template('editar_jogo.html', form=form, jogo=jogo)
 
+@main.route('/jogos/<int:id>/placar', methods=['POST'])
+@admin_required
+def atualizar_placar(id):
+    form = PlacarForm()
+
+    if not form.validate_on_submit():
+        if request.is_json:
+            return jsonify(erro='Dados inválidos.', campos=form.errors), 400
+        flash('Placar inválido.', 'danger')
+        return redirect(request.referrer or url_for('main.jogos'))
+
+    try:
+        resultado = placar.atualizar_placar(id, form.versao.data, form.placar_casa.data,
+                                            form.placar_visitante.data, form.status.data)
+    except placar.ConflitoDeVersao:
+        db.session.rollback()
+        if request.is_json:
+            return jsonify(erro=MENSAGEM_CONFLITO), 409
+        flash(MENSAGEM_CONFLITO, 'warning')
+        return redirect(request.referrer or url_for('main.jogos'))
+
+    if resultado is None:
+        abort(404)
+
+    campeonato_id, versao = resultado
+    db.session.commit()
+    _invalidar_jogo(campeonato_id)
+    placar.publicar_jogo(db.session.get(Jogo, id))
+    historico.agendar(campeonato_id)
+
+    if request.is_json:
+        return jsonify(id=id, placar_casa=form.placar_casa.data, placar_visitante=form.placar_visitante.data,
+                       status=form.status.data, versao=versao)
+    flash('Placar atualizado!', 'success')
+    return redirect(request.referrer or url_for('main.jogos'))
+
 @main.route('/jogos/<int:id>/deletar', methods=['POST'])
 @admin_required
 def deletar_jogo(id):
-
-    if current_user.role != 'Admin':
-        flash('Você não tem permissão para acessar esta página.', 'danger')
-        return redirect(url_for('main.home'))
     jogo = Jogo.query.get_or_404(id)
+    standings.atualizar_jogo(standings.resultado(jogo), None)
+    estatisticas.atualizar_jogo(standings.resultado(jogo), None)
+    eventos.registrar('jogo.removido', jogo.id, eventos.dados_de(jogo))
+    campeonato_id = jogo.campeonato_id
     db.session.delete(jogo)
     db.session.commit()
+    _invalidar_jogo(campeonato_id)
+    placar.publicar_remocao(id, campeonato_id)
+    historico.agendar(campeonato_id)
     flash('Jogo removido com sucesso!', 'danger')
     return redirect(url_for('main.jogos'))
 
+@main.route('/agenda')
+@cache.pagina(tags=lambda: ['jogos', 'times', 'campeonatos'])
+def ver_agenda():
+    data = request.args.get('data', type=date.fromisoformat)
+    if data is None:
+        # A semana padrão muda com o dia: redireciona para uma URL fixa, que pode ir para o cache.
+        segunda = date.today() - timedelta(days=date.today().weekday())
+        return redirect(url_for('main.ver_agenda', **request.args.to_dict(), data=segunda.isoformat()))
+    form_filtros = FiltroJogosForm(request.args)
+    canonico = _filtro_canonico(form_filtros, 'main.ver_agenda')
+    if canonico is not None:
+        return canonico
+    de, ate = agenda.intervalo(data - timedelta(days=data.weekday()))
+    filtros = {
+        'time_id': form_filtros.time.data.id if form_filtros.time.data else None,
+        'campeonato_id': form_filtros.campeonato.data.id if form_filtros.campeonato.data else None,
+    }
+    lista, truncado = agenda.jogos(de, ate, **filtros)
+    dias = [(dia, list(jogos)) for dia, jogos in groupby(lista, key=lambda jogo: jogo.data_hora.date())]
+
+    return render_template('agenda.html', dias=dias, de=de, ate=ate, truncado=truncado,
+                           anterior=de - timedelta(days=7), proxima=ate + timedelta(days=1),
+                           filtros={chave: valor for chave, valor in request.args.items()
+                                    if chave != 'data' and valor},
+                           form_filtros=form_filtros)
+
+def _calendario(nome, **filtros):
+    de, ate = agenda.intervalo_do_feed()
+    lista, _ = agenda.jogos(de, ate, **filtros)
+    dominio = f'{organizacoes.atual().slug}.{agenda.dominio_ical()}'
+    return current_app.response_class(agenda.icalendar(nome, lista, dominio), mimetype='text/calendar')
+
+@main.route('/agenda/times/<int:id>.ics')
+@cache.pagina(tags=lambda id: ['jogos', 'times', 'campeonatos'])
+def calendario_time(id):
+    time = Time.query.get_or_404(id)
+    return _calendario(f'{time.nome} - SIGTO', time_id=id)
+
+@main.route('/agenda/campeonatos/<int:id>.ics')
+@cache.pagina(tags=lambda id: [f'campeonato:{id}', 'times'])
+def calendario_campeonato(id):
+    campeonato = Campeonato.query.get_or_404(id)
+    return _calendario(f'{campeonato.nome} - SIGTO', campeonato_id=id)
+
 @main.route('/admin/usuarios')
-@login_required
+@supremo_required
 def gerenciar_usuarios():
-
-    if current_user.id != 1:
-        flash('Apenas o Administrador Supremo pode aceder a esta página.', 'danger')
-        return redirect(url_for('main.home'))
-    
     usuarios = Usuario.query.all()
     
     return render_template('gerenciar_usuarios.html', usuarios=usuarios)
 
 @main.route('/admin/usuarios/<int:id>/deletar', methods=['POST'])
-@login_required
+@permissao_requerida(e_supremo, 'Apenas o Administrador Supremo pode remover utilizadores.')
 def deletar_usuario(id):
 
-    if current_user.id != 1:
-        flash('Apenas o Administrador Supremo pode remover utilizadores.', 'danger')
-        return redirect(url_for('main.home'))
-
-    if id == 1:
-        flash('O Administrador "Supremo" (ID 1) não pode ser removido.', 'danger')
+    if id == organizacoes.atual().supremo_id:
+        flash('O Administrador "Supremo" não pode ser removido.', 'danger')
         return redirect(url_for('main.gerenciar_usuarios'))
 
     usuario_para_deletar = Usuario.query.get_or_404(id)
 
+    eventos.registrar('usuario.removido', id, eventos.dados_de(usuario_para_deletar))
     db.session.delete(usuario_para_deletar)
     db.session.commit()
+    invalidar_usuario(id)
     flash('Utilizador removido com sucesso.', 'success')
     return redirect(url_for('main.gerenciar_usuarios'))
 
 @main.route('/admin/usuarios/novo', methods=['GET', 'POST'])
-@login_required
+@supremo_required
 def novo_usuario_admin():
 
-    if current_user.id != 1:
-        flash('Apenas o Administrador Supremo pode aceder a esta página.', 'danger')
-        return redirect(url_for('main.home'))
-
     form = AdminUserCreationForm()
     if form.validate_on_submit():
-        hashed_password = bcrypt.generate_password_hash(form.password.data).decode('utf-8')
+        try:
+            hashed_password = senhas.gerar_hash(form.password.data)
+        except Sobrecarga:
+            flash('Servidor ocupado. Tente novamente em instantes.', 'warning')
+            return render_template('criar_usuario_admin.html', title='Criar Usuário', form=form), 503
         usuario = Usuario(nome=form.nome.data, 
                         email=form.email.data, 
                         senha_hash=hashed_password, 
                         role='Admin')
+        db.session.add(usuario)
+        eventos.registrar_objeto('usuario.criado', usuario)
         db.session.commit()
         flash('Novo usuário criado com sucesso!', 'success')
         return redirect(url_for('main.gerenciar_usuarios'))
@@ -374,10 +596,29 @@ def login():
     
     form = LoginForm()
     if form.validate_on_submit():
+        espera = limitador.verificar(ip=request.remote_addr,
+                                     conta=f'{organizacoes.atual().id}:{form.email.data.lower()}')
+        if espera:
+            flash('Muitas tentativas de login. Tente novamente em alguns instantes.', 'danger')
+            return _resposta_indisponivel(render_template('login.html', title='Login', form=form), 429, espera)
+
         usuario = Usuario.query.filter_by(email=form.email.data).first()
 
-        if usuario and bcrypt.check_password_hash(usuario.senha_hash, form.password.data):
+        try:
+            senha_valida = usuario is not None and senhas.verificar(usuario.senha_hash, form.password.data)
+        except Sobrecarga:
+            flash('Servidor ocupado. Tente novamente em instantes.', 'warning')
+            return _resposta_indisponivel(render_template('login.html', title='Login', form=form), 503, 1)
+
+        if senha_valida:
+            if senhas.precisa_rehash(usuario.senha_hash):
+                try:
+                    usuario.senha_hash = senhas.gerar_hash(form.password.data)
+                    db.session.commit()
+                except Sobrecarga:
+                    db.session.rollback()
             login_user(usuario)
+            registrar_sessao(usuario)
             flash('Login bem-sucedido!', 'success')
             return redirect(url_for('main.home'))
         else:
@@ -389,5 +630,46 @@ def login():
 @main.route("/logout")
 def logout():
     logout_user()
+    encerrar_sessao()
     return redirect(url_for('main.home'))
 
+
+@main.route('/admin/tarefas')
+@admin_required
+def tarefas():
+    recentes = Tarefa.query.order_by(Tarefa.id.desc()).limit(50).all()
+    return render_template('tarefas.html', tarefas=recentes)
+
+@main.route('/admin/exportar')
+@admin_required
+def exportar_base():
+    formato = request.args.get('formato', 'colunar')
+    if formato not in exportacao.FORMATOS:
+        abort(400)
+
+    nome = f"sigto-{date.today().isoformat()}-{formato}.zip"
+    resposta = current_app.response_class(stream_with_context(exportacao.exportar(formato)),
+                                          mimetype='application/zip')
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{nome}"'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
+
+@main.route('/admin/tarefas/<int:id>')
+@admin_required
+def ver_tarefa(id):
+    tarefa = Tarefa.query.get_or_404(id)
+    return render_template('tarefa.html', tarefa=tarefa, ativa=tarefa.status in ATIVAS)
+
+@main.route('/admin/tarefas/<int:id>/status')
+@admin_required
+def status_tarefa(id):
+    tarefa = Tarefa.query.get_or_404(id)
+    return jsonify({
+        'id': tarefa.id,
+        'tipo': tarefa.tipo,
+        'status': tarefa.status,
+        'progresso': tarefa.progresso,
+        'mensagem': tarefa.mensagem,
+        'tentativas': tarefa.tentativas,
+        'ativa': tarefa.status in ATIVAS,
+    })
@@ -0,0 +1,108 @@
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from . import db, senhas, standings, estatisticas
+from .models import Usuario, Time, Campeonato, Jogo, Classificacao, campeonato_times
+
+TAMANHO_LOTE = 5000
+EMAIL_ADMIN = 'admin@sigto.com.br'
+SENHA_PADRAO = 'senha'
+
+
+def _lotes(linhas, tamanho):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _inserir(tabela, linhas, tamanho_lote=TAMANHO_LOTE):
+    total = 0
+    for lote in _lotes(linhas, tamanho_lote):
+        db.session.execute(insert(tabela), lote)
+        total += len(lote)
+    return total
+
+
+def _ultimo_id(modelo):
+    # Em banco compartilhado os ids das demais organizações já estão ocupados.
+    return db.session.execute(
+        db.select(db.func.max(modelo.id)).execution_options(todas_organizacoes=True)
+    ).scalar() or 0
+
+
+def banco_vazio():
+    return db.session.execute(db.select(Time.id).limit(1)).first() is None \
+        and db.session.execute(db.select(Usuario.id).where(Usuario.email == EMAIL_ADMIN)).first() is None
+
+
+def gerar_dados(campeonatos=10, times=500, jogos=20000, usuarios=20, times_por_campeonato=20,
+                semente=42, inicio=datetime(2024, 1, 1, 16), referencia=None, informar=None):
+    aleatorio = random.Random(semente)
+    referencia = referencia or inicio + timedelta(days=365)
+    informar = informar or (lambda mensagem: None)
+    times_por_campeonato = max(2, min(times_por_campeonato, times))
+
+    senha_hash = senhas.gerar_hash(SENHA_PADRAO)
+    _inserir(Usuario, [{'nome': 'Admin', 'email': EMAIL_ADMIN, 'senha_hash': senha_hash, 'role': 'Admin'}] + [
+        {'nome': f'Torcedor {numero}', 'email': f'torcedor{numero}@sigto.com.br',
+         'senha_hash': senha_hash, 'role': 'Torcedor'}
+        for numero in range(1, usuarios)
+    ])
+    informar(f'{usuarios} usuário(s).')
+
+    base_time, base_campeonato = _ultimo_id(Time), _ultimo_id(Campeonato)
+
+    _inserir(Time, ({'id': base_time + numero, 'nome': f'Time {numero:05d}'} for numero in range(1, times + 1)))
+    informar(f'{times} time(s).')
+
+    _inserir(Campeonato, ({
+        'id': base_campeonato + numero,
+        'nome': f'Campeonato {numero:03d}',
+        'data_inicio': (inicio + timedelta(days=7 * numero)).date(),
+        'data_fim': (inicio + timedelta(days=7 * numero + 365)).date(),
+    } for numero in range(1, campeonatos + 1)))
+    informar(f'{campeonatos} campeonato(s).')
+
+    inscritos = {
+        base_campeonato + numero: sorted(base_time + time_id
+                                         for time_id in aleatorio.sample(range(1, times + 1), times_por_campeonato))
+        for numero in range(1, campeonatos + 1)
+    }
+    inscricoes = [{'campeonato_id': campeonato_id, 'time_id': time_id}
+                  for campeonato_id, time_ids in inscritos.items() for time_id in time_ids]
+    _inserir(campeonato_times, inscricoes)
+    _inserir(Classificacao, inscricoes)
+    informar(f'{len(inscricoes)} inscrição(ões).')
+
+    def linhas_de_jogos():
+        for numero in range(jogos):
+            campeonato_id = base_campeonato + numero % campeonatos + 1
+            casa, visitante = aleatorio.sample(inscritos[campeonato_id], 2)
+            data_hora = inicio + timedelta(days=7 * (campeonato_id - base_campeonato) + numero // campeonatos % 730,
+                                           hours=aleatorio.choice((0, 2, 4)))
+            finalizado = data_hora < referencia
+            yield {
+                'campeonato_id': campeonato_id,
+                'time_casa_id': casa,
+                'time_visitante_id': visitante,
+                'data_hora': data_hora,
+                'placar_casa': aleatorio.randint(0, 4) if finalizado else 0,
+                'placar_visitante': aleatorio.randint(0, 3) if finalizado else 0,
+                'status': 'Finalizado' if finalizado else 'Agendado',
+                'versao': 1,
+            }
+
+    _inserir(Jogo, linhas_de_jogos())
+    informar(f'{jogos} jogo(s).')
+
+    for campeonato in Campeonato.query.order_by(Campeonato.id):
+        standings.reconstruir_tabela(campeonato)
+    informar('Tabelas de classificação calculadas.')
+
+    estatisticas.reconstruir()
+    informar('Estatísticas agregadas calculadas.')
@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import signal
+import socket
+import time
+from flask import request, send_from_directory, current_app
+from . import db, senhas, broker
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSOES_COMPRIMIVEIS = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+CODIFICACOES = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _versao_do_arquivo(caminho):
+    with open(caminho, 'rb') as arquivo:
+        return hashlib.md5(arquivo.read()).hexdigest()[:10]
+
+
+def comprimir_estaticos(app, informar=None):
+    gerados = 0
+    for pasta, _, arquivos in os.walk(app.static_folder):
+        for nome in arquivos:
+            if not nome.endswith(EXTENSOES_COMPRIMIVEIS):
+                continue
+            caminho = os.path.join(pasta, nome)
+            with open(caminho, 'rb') as arquivo:
+                conteudo = arquivo.read()
+
+            variantes = [('.gz', lambda dados: gzip.compress(dados, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variantes.append(('.br', lambda dados: brotli.compress(dados, quality=11)))
+
+            for extensao, comprimir in variantes:
+                destino = caminho + extensao
+                if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(caminho):
+                    continue
+                with open(destino, 'wb') as arquivo:
+                    arquivo.write(comprimir(conteudo))
+                gerados += 1
+                if informar:
+                    informar(f'{os.path.relpath(destino, app.static_folder)}')
+    return gerados
+
+
+def configurar_estaticos(app):
+    app.config.setdefault('ESTATICOS_MAX_AGE', 365 * 24 * 3600)
+    versoes = {}
+
+    def versionar(endpoint, values):
+        if endpoint != 'static' or 'filename' not in values or 'v' in values:
+            return
+        nome = values['filename']
+        if nome not in versoes:
+            caminho = os.path.join(app.static_folder, nome)
+            versoes[nome] = _versao_do_arquivo(caminho) if os.path.isfile(caminho) else None
+        if versoes[nome]:
+            values['v'] = versoes[nome]
+
+    def servir_estatico(filename):
+        max_age = current_app.config['ESTATICOS_MAX_AGE'] if request.args.get('v') else None
+        resposta = None
+
+        for codificacao, extensao in CODIFICACOES:
+            if request.accept_encodings[codificacao] and \
+                    os.path.isfile(os.path.join(app.static_folder, filename + extensao)):
+                resposta = send_from_directory(app.static_folder, filename + extensao, max_age=max_age,
+                                               mimetype=mimetypes.guess_type(filename)[0])
+                resposta.headers['Content-Encoding'] = codificacao
+                break
+
+        if resposta is None:
+            resposta = send_from_directory(app.static_folder, filename, max_age=max_age)
+
+        resposta.vary.add('Accept-Encoding')
+        if max_age:
+            resposta.cache_control.public = True
+            resposta.cache_control.immutable = True
+        return resposta
+
+    app.url_defaults(versionar)
+    app.view_functions['static'] = servir_estatico
+
+
+def aquecer(app, conexoes=None):
+    inicio = time.perf_counter()
+
+    for nome in app.jinja_env.list_templates():
+        app.jinja_env.get_template(nome)
+
+    with app.app_context():
+        pool = db.catalogo.pool
+        quantidade = conexoes or (pool.size() if hasattr(pool, 'size') else 1)
+        abertas = []
+        try:
+            for _ in range(max(quantidade, 1)):
+                conexao = db.catalogo.connect()
+                conexao.exec_driver_sql('SELECT 1')
+                abertas.append(conexao)
+        finally:
+            for conexao in abertas:
+                conexao.close()
+
+    senhas.aquecer()
+
+    try:
+        comprimir_estaticos(app)
+    except OSError:
+        pass
+
+    return time.perf_counter() - inicio
+
+
+def opcoes_waitress(app, threads=None, conexoes=None, keepalive=None, backlog=None):
+    return {
+        'threads': threads or app.config['SERVIDOR_THREADS'],
+        'connection_limit': conexoes or app.config['SERVIDOR_CONEXOES'],
+        'channel_timeout': keepalive or app.config['SERVIDOR_KEEPALIVE'],
+        'backlog': backlog or app.config['SERVIDOR_BACKLOG'],
+    }
+
+
+def iniciar_aovivo(app, host, porta, informar=print):
+    if not porta:
+        return None
+    servidor = broker.servir(host, porta, heartbeat=app.config['AOVIVO_HEARTBEAT'],
+                             duracao_maxima=app.config['AOVIVO_DURACAO_MAXIMA'],
+                             conexoes=app.config['AOVIVO_CONEXOES'])
+    informar(f'Placar ao vivo (SSE) em http://{host}:{porta}/aovivo.')
+    return servidor
+
+
+def servir_waitress(app, host, porta, informar=print, porta_aovivo=None, **opcoes):
+    from waitress import serve
+
+    iniciar_aovivo(app, host, porta_aovivo, informar)
+    duracao = aquecer(app, opcoes['threads'])
+    informar(f'Aplicação aquecida em {duracao * 1000:.0f} ms. Servindo em http://{host}:{porta} '
+             f"({opcoes['threads']} threads).")
+    serve(app, host=host, port=porta, **opcoes)
+
+
+def servir_prefork(app, host, porta, workers, informar=print, porta_aovivo=None, **opcoes):
+    from waitress import serve
+
+    if not hasattr(os, 'fork'):
+        informar('Este sistema não suporta fork; usando um único processo waitress.')
+        return servir_waitress(app, host, porta, informar, porta_aovivo, **opcoes)
+
+    # Os fluxos SSE ficam no processo principal, que só recebe os placares publicados pelos
+    # workers através de um backend compartilhado.
+    if porta_aovivo and app.config['AOVIVO_BACKEND'] == 'local':
+        informar('Aviso: com vários processos o placar ao vivo exige AOVIVO_BACKEND=redis.')
+    if workers > 1 and app.config['CACHE_BACKEND'] == 'memoria':
+        informar('Aviso: com CACHE_BACKEND=memoria cada processo tem o seu cache; uma alteração feita em '
+                 'um worker só aparece nos outros quando a cópia expira (CACHE_TTL). Use CACHE_BACKEND=redis.')
+    if not app.config['METRICAS_DIRETORIO']:
+        app.config['METRICAS_DIRETORIO'] = os.path.join(app.instance_path, 'metricas')
+    app.extensions['metricas'].preparar_diretorio(app.config['METRICAS_DIRETORIO'])
+    iniciar_aovivo(app, host, porta_aovivo, informar)
+
+    ouvinte = socket.create_server((host, porta), backlog=opcoes['backlog'], reuse_port=False)
+    ouvinte.set_inheritable(True)
+
+    duracao = aquecer(app, 1)
+    with app.app_context():
+        db.catalogo.dispose()
+    senhas.encerrar()
+
+    def iniciar_worker():
+        pid = os.fork()
+        if pid:
+            return pid
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        aquecer(app, opcoes['threads'])
+        serve(app, sockets=[ouvinte], **opcoes)
+        os._exit(0)
+
+    pids = {iniciar_worker() for _ in range(workers)}
+    informar(f'Aplicação aquecida em {duracao * 1000:.0f} ms. Servindo em http://{host}:{porta} '
+             f"({workers} processos x {opcoes['threads']} threads).")
+
+    encerrando = []
+
+    def encerrar(sinal, quadro):
+        encerrando.append(sinal)
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    while pids:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        if pid not in pids:
+            # Outros filhos do processo principal (o pool de senhas encerrado antes do fork).
+            continue
+        pids.discard(pid)
+        if not encerrando:
+            informar(f'Worker {pid} terminou; iniciando outro.')
+            pids.add(iniciar_worker())
+    ouvinte.close()
@@ -0,0 +1,341 @@
+from collections import namedtuple, defaultdict
+from datetime import datetime
+from itertools import combinations, groupby
+from sqlalchemy import or_, update, delete, insert, union_all, func
+from . import db
+from .models import Classificacao, ClassificacaoHistorico, Jogo, Campeonato, Time
+
+Resultado = namedtuple('Resultado', 'campeonato_id time_casa_id time_visitante_id placar_casa placar_visitante status data_hora '
+                                    'jogo_id', defaults=(None, None))
+Pontuacao = namedtuple('Pontuacao', 'vitoria empate derrota')
+
+PONTUACAO_PADRAO = Pontuacao(3, 1, 0)
+
+TOTAIS = ('pontos', 'jogos_disputados', 'vitorias', 'empates', 'derrotas',
+          'gols_pro', 'gols_contra', 'saldo_gols')
+DIVISAO = ('jogos_disputados', 'vitorias', 'empates', 'derrotas', 'gols_pro', 'gols_contra')
+COLUNAS = TOTAIS + tuple(f'{coluna}_casa' for coluna in DIVISAO)
+
+CRITERIOS = {
+    'confronto_direto': 'Confronto direto',
+    'vitorias': 'Número de vitórias',
+    'saldo_gols': 'Saldo de gols',
+    'gols_pro': 'Gols marcados',
+    'gols_fora': 'Gols marcados como visitante',
+}
+CRITERIOS_PADRAO = ('saldo_gols', 'gols_pro')
+
+FORMA_JOGOS = 5
+
+
+def resultado(jogo):
+    if jogo is None:
+        return None
+    return Resultado(jogo.campeonato_id, jogo.time_casa_id, jogo.time_visitante_id,
+                     jogo.placar_casa or 0, jogo.placar_visitante or 0, jogo.status, jogo.data_hora, jogo.id)
+
+
+def pontuacao(campeonato):
+    if campeonato is None:
+        return PONTUACAO_PADRAO
+    valores = (campeonato.pontos_vitoria, campeonato.pontos_empate, campeonato.pontos_derrota)
+    return Pontuacao(*(padrao if valor is None else valor
+                       for valor, padrao in zip(valores, PONTUACAO_PADRAO)))
+
+
+def criterios(campeonato):
+    texto = campeonato.criterios_desempate if campeonato is not None else None
+    if texto is None:
+        return CRITERIOS_PADRAO
+    return tuple(nome for nome in (parte.strip() for parte in texto.split(',')) if nome in CRITERIOS)
+
+
+def pontos_do_resultado(gols_pro, gols_contra, regra=PONTUACAO_PADRAO):
+    if gols_pro > gols_contra:
+        return regra.vitoria
+    if gols_pro < gols_contra:
+        return regra.derrota
+    return regra.empate
+
+
+def contribuicao(gols_pro, gols_contra, regra=PONTUACAO_PADRAO, casa=False):
+    vitorias, empates, derrotas = int(gols_pro > gols_contra), int(gols_pro == gols_contra), int(gols_pro < gols_contra)
+
+    delta = {
+        'pontos': pontos_do_resultado(gols_pro, gols_contra, regra), 'jogos_disputados': 1,
+        'vitorias': vitorias, 'empates': empates, 'derrotas': derrotas, 'gols_pro': gols_pro,
+        'gols_contra': gols_contra, 'saldo_gols': gols_pro - gols_contra
+    }
+    for coluna in DIVISAO:
+        delta[f'{coluna}_casa'] = delta[coluna] if casa else 0
+    return delta
+
+
+def _times_inscritos(campeonato_id, time_ids):
+    linhas = db.session.execute(
+        db.select(Classificacao.time_id).where(
+            Classificacao.campeonato_id == campeonato_id,
+            Classificacao.time_id.in_(time_ids)
+        )
+    ).scalars()
+    return set(linhas)
+
+
+def somar(estatisticas, delta, sinal=1):
+    for coluna in COLUNAS:
+        estatisticas[coluna] += sinal * delta[coluna]
+
+
+def _somar(campeonato_id, time_id, delta, sinal):
+    valores = {coluna: getattr(Classificacao, coluna) + sinal * delta[coluna] for coluna in COLUNAS}
+    db.session.execute(
+        update(Classificacao)
+        .where(Classificacao.campeonato_id == campeonato_id, Classificacao.time_id == time_id)
+        .values(**valores)
+    )
+
+
+def aplicar_resultado(res, sinal=1):
+    if res is None or res.status != 'Finalizado':
+        return
+
+    ids = {res.time_casa_id, res.time_visitante_id}
+    if _times_inscritos(res.campeonato_id, ids) != ids:
+        return
+
+    regra = pontuacao(db.session.get(Campeonato, res.campeonato_id))
+    _somar(res.campeonato_id, res.time_casa_id,
+           contribuicao(res.placar_casa, res.placar_visitante, regra, casa=True), sinal)
+    _somar(res.campeonato_id, res.time_visitante_id,
+           contribuicao(res.placar_visitante, res.placar_casa, regra), sinal)
+
+
+def descartar_historico(campeonato_id, a_partir=None):
+    consulta = delete(ClassificacaoHistorico).where(ClassificacaoHistorico.campeonato_id == campeonato_id)
+    if a_partir is not None:
+        if isinstance(a_partir, datetime):
+            a_partir = a_partir.date()
+        consulta = consulta.where(ClassificacaoHistorico.data >= a_partir)
+    db.session.execute(consulta)
+
+
+def atualizar_jogo(antes, depois):
+    if antes == depois:
+        return
+    aplicar_resultado(antes, -1)
+    aplicar_resultado(depois, 1)
+
+    for res in (antes, depois):
+        if res is not None and res.status == 'Finalizado':
+            descartar_historico(res.campeonato_id, res.data_hora)
+
+
+def _jogos_finalizados_do_time(campeonato_id, time_id):
+    return Jogo.query.filter(
+        Jogo.campeonato_id == campeonato_id,
+        Jogo.status == 'Finalizado',
+        or_(Jogo.time_casa_id == time_id, Jogo.time_visitante_id == time_id)
+    ).all()
+
+
+def inscrever_time(campeonato_id, time_id):
+    db.session.execute(insert(Classificacao).values(campeonato_id=campeonato_id, time_id=time_id))
+    descartar_historico(campeonato_id)
+
+    for jogo in _jogos_finalizados_do_time(campeonato_id, time_id):
+        aplicar_resultado(resultado(jogo), 1)
+
+
+def remover_time(campeonato_id, time_id):
+    for jogo in _jogos_finalizados_do_time(campeonato_id, time_id):
+        aplicar_resultado(resultado(jogo), -1)
+
+    descartar_historico(campeonato_id)
+    db.session.execute(
+        delete(Classificacao).where(Classificacao.campeonato_id == campeonato_id,
+                                    Classificacao.time_id == time_id)
+    )
+
+
+def calcular_tabela(campeonato):
+    estatisticas = {time.id: dict.fromkeys(COLUNAS, 0) for time in campeonato.times}
+    regra = pontuacao(campeonato)
+
+    jogos = db.session.execute(
+        db.select(Jogo.time_casa_id, Jogo.time_visitante_id, Jogo.placar_casa, Jogo.placar_visitante)
+        .where(Jogo.campeonato_id == campeonato.id, Jogo.status == 'Finalizado')
+    )
+
+    for casa_id, visitante_id, placar_casa, placar_visitante in jogos:
+        if casa_id not in estatisticas or visitante_id not in estatisticas:
+            continue
+        placar_casa, placar_visitante = placar_casa or 0, placar_visitante or 0
+        for time_id, delta in ((casa_id, contribuicao(placar_casa, placar_visitante, regra, casa=True)),
+                               (visitante_id, contribuicao(placar_visitante, placar_casa, regra))):
+            somar(estatisticas[time_id], delta)
+
+    return estatisticas
+
+
+def reconstruir_tabela(campeonato):
+    estatisticas = calcular_tabela(campeonato)
+
+    descartar_historico(campeonato.id)
+    db.session.execute(delete(Classificacao).where(Classificacao.campeonato_id == campeonato.id))
+    if estatisticas:
+        db.session.execute(insert(Classificacao), [
+            dict(stats, campeonato_id=campeonato.id, time_id=time_id)
+            for time_id, stats in estatisticas.items()
+        ])
+
+
+def verificar_tabela(campeonato):
+    esperado = calcular_tabela(campeonato)
+    armazenado = {
+        linha.time_id: {coluna: getattr(linha, coluna) for coluna in COLUNAS}
+        for linha in Classificacao.query.filter_by(campeonato_id=campeonato.id)
+    }
+
+    divergencias = []
+    for time_id in sorted(set(esperado) | set(armazenado)):
+        if esperado.get(time_id) != armazenado.get(time_id):
+            divergencias.append((time_id, esperado.get(time_id), armazenado.get(time_id)))
+    return divergencias
+
+
+def registrar_confronto(pares, casa_id, visitante_id, placar_casa, placar_visitante):
+    if casa_id < visitante_id:
+        pares[casa_id, visitante_id].append((placar_casa, placar_visitante))
+    else:
+        pares[visitante_id, casa_id].append((placar_visitante, placar_casa))
+
+
+def confrontos(campeonato_id, antes_de=None):
+    pares = defaultdict(list)
+    consulta = db.select(Jogo.time_casa_id, Jogo.time_visitante_id, Jogo.placar_casa, Jogo.placar_visitante) \
+        .where(Jogo.campeonato_id == campeonato_id, Jogo.status == 'Finalizado')
+    if antes_de is not None:
+        consulta = consulta.where(Jogo.data_hora < antes_de)
+
+    for casa_id, visitante_id, placar_casa, placar_visitante in db.session.execute(consulta):
+        registrar_confronto(pares, casa_id, visitante_id, placar_casa or 0, placar_visitante or 0)
+    return pares
+
+
+def _mini_tabela(grupo, pares, regra):
+    mini = {time_id: [0, 0, 0] for time_id in grupo}
+    for a, b in combinations(sorted(grupo), 2):
+        for gols_a, gols_b in pares.get((a, b), ()):
+            for time_id, pro, contra in ((a, gols_a, gols_b), (b, gols_b, gols_a)):
+                linha = mini[time_id]
+                linha[0] += pontos_do_resultado(pro, contra, regra)
+                linha[1] += pro - contra
+                linha[2] += pro
+    return {time_id: tuple(linha) for time_id, linha in mini.items()}
+
+
+def _chaves(criterio, grupo, linhas, carregar_confrontos, regra):
+    if criterio == 'confronto_direto':
+        return _mini_tabela(grupo, carregar_confrontos(), regra)
+    if criterio == 'gols_fora':
+        return {time_id: linhas[time_id]['fora']['gols_pro'] for time_id in grupo}
+    return {time_id: linhas[time_id][criterio] for time_id in grupo}
+
+
+def _desempatar(grupo, ordem_criterios, linhas, carregar_confrontos, regra):
+    if len(grupo) < 2 or not ordem_criterios:
+        return sorted(grupo, key=lambda time_id: (linhas[time_id]['nome'], time_id))
+
+    chaves = _chaves(ordem_criterios[0], grupo, linhas, carregar_confrontos, regra)
+    ordenados = sorted(grupo, key=chaves.__getitem__, reverse=True)
+
+    resultado = []
+    for _, empatados in groupby(ordenados, key=chaves.__getitem__):
+        resultado.extend(_desempatar(list(empatados), ordem_criterios[1:], linhas, carregar_confrontos, regra))
+    return resultado
+
+
+def ordenar(linhas, ordem_criterios=CRITERIOS_PADRAO, pares=None, regra=PONTUACAO_PADRAO):
+    carregados = []
+
+    def carregar_confrontos():
+        if not carregados:
+            carregados.append(pares() if callable(pares) else pares or {})
+        return carregados[0]
+
+    ordem = _desempatar(list(linhas), ('pontos',) + tuple(ordem_criterios), linhas, carregar_confrontos, regra)
+    return [linhas[time_id] for time_id in ordem]
+
+
+def forma_recente(campeonato_id, quantidade=FORMA_JOGOS):
+    inscritos = db.select(Classificacao.time_id).where(Classificacao.campeonato_id == campeonato_id)
+    filtros = (Jogo.campeonato_id == campeonato_id, Jogo.status == 'Finalizado',
+               Jogo.time_casa_id.in_(inscritos), Jogo.time_visitante_id.in_(inscritos))
+
+    partidas = union_all(
+        db.select(Jogo.id, Jogo.data_hora, Jogo.time_casa_id.label('time_id'),
+                  Jogo.placar_casa.label('pro'), Jogo.placar_visitante.label('contra')).where(*filtros),
+        db.select(Jogo.id, Jogo.data_hora, Jogo.time_visitante_id.label('time_id'),
+                  Jogo.placar_visitante.label('pro'), Jogo.placar_casa.label('contra')).where(*filtros),
+    ).subquery()
+
+    numeradas = db.select(
+        partidas,
+        func.row_number().over(partition_by=partidas.c.time_id,
+                               order_by=(partidas.c.data_hora.desc(), partidas.c.id.desc())).label('ordem')
+    ).subquery()
+
+    forma = defaultdict(list)
+    linhas = db.session.execute(
+        db.select(numeradas.c.time_id, numeradas.c.pro, numeradas.c.contra)
+        .where(numeradas.c.ordem <= quantidade)
+        .order_by(numeradas.c.time_id, numeradas.c.ordem.desc())
+    )
+    for time_id, pro, contra in linhas:
+        pro, contra = pro or 0, contra or 0
+        forma[time_id].append('V' if pro > contra else 'D' if pro < contra else 'E')
+    return forma
+
+
+def _campanha(valores, regra):
+    campanha = dict(valores)
+    campanha['pontos'] = (campanha['vitorias'] * regra.vitoria + campanha['empates'] * regra.empate
+                          + campanha['derrotas'] * regra.derrota)
+    campanha['saldo_gols'] = campanha['gols_pro'] - campanha['gols_contra']
+    return campanha
+
+
+def linha_tabela(dados, regra):
+    casa = {coluna: dados[f'{coluna}_casa'] for coluna in DIVISAO}
+    fora = {coluna: dados[coluna] - casa[coluna] for coluna in DIVISAO}
+    return dict({coluna: dados[coluna] for coluna in TOTAIS},
+                time_id=dados['time_id'], nome=dados['nome'],
+                casa=_campanha(casa, regra), fora=_campanha(fora, regra))
+
+
+def tabela_serializada(campeonato_id, jogos_forma=FORMA_JOGOS):
+    campeonato = db.session.get(Campeonato, campeonato_id)
+    regra = pontuacao(campeonato)
+
+    ordem_criterios = criterios(campeonato)
+
+    consulta = db.select(Classificacao.time_id, Time.nome, *(getattr(Classificacao, coluna) for coluna in COLUNAS)) \
+        .join(Classificacao.time) \
+        .where(Classificacao.campeonato_id == campeonato_id)
+    # Critérios que são colunas da tabela (o padrão segue ix_classificacao_ordem) saem ordenados do banco;
+    # confronto direto e gols fora exigem o desempate em Python.
+    no_banco = all(criterio in Classificacao.__table__.c for criterio in ordem_criterios)
+    if no_banco:
+        consulta = consulta.order_by(*(getattr(Classificacao, coluna).desc()
+                                       for coluna in ('pontos',) + ordem_criterios),
+                                     Time.nome, Classificacao.time_id)
+
+    linhas = {dados.time_id: linha_tabela(dados._mapping, regra) for dados in db.session.execute(consulta)}
+
+    forma = forma_recente(campeonato_id, jogos_forma) if linhas and jogos_forma else {}
+    for time_id, linha in linhas.items():
+        linha['forma'] = ''.join(forma.get(time_id, ()))
+
+    if no_banco:
+        return list(linhas.values())
+    return ordenar(linhas, ordem_criterios, lambda: confrontos(campeonato_id), regra)
@@ -0,0 +1,93 @@
+(function () {
+    function conectar(url, eventos) {
+        if (!window.EventSource) {
+            return;
+        }
+        // ":5001/aovivo?..." aponta para o servidor SSE na mesma máquina, em outra porta.
+        if (url.charAt(0) === ':') {
+            url = location.protocol + '//' + location.hostname + url;
+        }
+        var fonte = new EventSource(url);
+        Object.keys(eventos).forEach(function (nome) {
+            fonte.addEventListener(nome, function (mensagem) {
+                eventos[nome](JSON.parse(mensagem.data));
+            });
+        });
+    }
+
+    function atualizarJogo(jogo) {
+        document.querySelectorAll('[data-jogo-id="' + jogo.id + '"]').forEach(function (card) {
+            card.querySelector('.placar').textContent = jogo.placar_casa + ' x ' + jogo.placar_visitante;
+            var status = card.querySelector('.status');
+            status.textContent = jogo.status;
+            status.className = 'status status-' + jogo.status.toLowerCase().replace(/ /g, '-');
+        });
+    }
+
+    function removerJogo(jogo) {
+        document.querySelectorAll('[data-jogo-id="' + jogo.id + '"]').forEach(function (card) {
+            card.parentNode.removeChild(card);
+        });
+    }
+
+    function avisarNovos(elemento) {
+        if (!elemento.classList.contains('jogo-lista') ||
+                (elemento.previousElementSibling && elemento.previousElementSibling.className === 'aovivo-aviso')) {
+            return;
+        }
+        var aviso = document.createElement('p');
+        aviso.className = 'aovivo-aviso';
+        var link = document.createElement('a');
+        link.href = location.href;
+        link.textContent = 'Novos jogos cadastrados. Clique para atualizar a lista.';
+        aviso.appendChild(link);
+        elemento.parentNode.insertBefore(aviso, elemento);
+    }
+
+    function campanha(dados) {
+        return dados.pontos + ' (' + dados.vitorias + '-' + dados.empates + '-' + dados.derrotas + ')';
+    }
+
+    function atualizarTabela(corpo, linhas) {
+        var colunas = ['pontos', 'jogos_disputados', 'vitorias', 'empates', 'derrotas',
+                       'gols_pro', 'gols_contra', 'saldo_gols'];
+        corpo.innerHTML = '';
+        linhas.forEach(function (linha, indice) {
+            var tr = document.createElement('tr');
+            var celulas = [(indice + 1) + 'º', linha.nome].concat(colunas.map(function (coluna) {
+                return linha[coluna];
+            }), [campanha(linha.casa), campanha(linha.fora), linha.forma]);
+            celulas.forEach(function (valor, posicao) {
+                var td = document.createElement('td');
+                if (posicao === 2) {
+                    var forte = document.createElement('strong');
+                    forte.textContent = valor;
+                    td.appendChild(forte);
+                } else {
+                    td.textContent = valor;
+                }
+                tr.appendChild(td);
+            });
+            corpo.appendChild(tr);
+        });
+    }
+
+    document.querySelectorAll('[data-aovivo]').forEach(function (elemento) {
+        conectar(elemento.getAttribute('data-aovivo'), {
+            placar: atualizarJogo,
+            removido: removerJogo,
+            novo: function () {
+                avisarNovos(elemento);
+            },
+            novos: function () {
+                avisarNovos(elemento);
+            },
+            tabela: function (linhas) {
+                var corpo = elemento.querySelector('tbody');
+                if (corpo) {
+                    atualizarTabela(corpo, linhas);
+                }
+            }
+        });
+    });
+})();
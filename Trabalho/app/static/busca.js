@@ -0,0 +1,53 @@
+(function () {
+    function buscar(campo, lista, resultados) {
+        var url = campo.getAttribute('data-busca');
+        var termo = campo.value.trim();
+        if (termo.length < 2) {
+            return;
+        }
+        url += (url.indexOf('?') === -1 ? '?' : '&') + 'q=' + encodeURIComponent(termo);
+        fetch(url, {credentials: 'same-origin'})
+            .then(function (resposta) { return resposta.json(); })
+            .then(function (times) {
+                lista.innerHTML = '';
+                times.forEach(function (time) {
+                    resultados[time.nome] = time.id;
+                    var opcao = document.createElement('option');
+                    opcao.value = time.nome;
+                    lista.appendChild(opcao);
+                });
+            });
+    }
+
+    function adicionarSelecionado(campo, resultados) {
+        var id = resultados[campo.value];
+        var destino = document.getElementById(campo.getAttribute('data-multiplo'));
+        if (id === undefined || !destino) {
+            return;
+        }
+        var item = document.createElement('li');
+        var caixa = document.createElement('input');
+        caixa.type = 'checkbox';
+        caixa.name = campo.name;
+        caixa.value = id;
+        caixa.checked = true;
+        item.appendChild(caixa);
+        item.appendChild(document.createTextNode(' ' + campo.value));
+        destino.insertBefore(item, destino.firstChild);
+        campo.value = '';
+    }
+
+    document.querySelectorAll('[data-busca]').forEach(function (campo) {
+        var lista = document.getElementById(campo.getAttribute('list'));
+        var resultados = {};
+        var espera = null;
+
+        campo.addEventListener('input', function () {
+            clearTimeout(espera);
+            espera = setTimeout(function () { buscar(campo, lista, resultados); }, 200);
+        });
+        if (campo.hasAttribute('data-multiplo')) {
+            campo.addEventListener('change', function () { adicionarSelecionado(campo, resultados); });
+        }
+    });
+})();
@@ -0,0 +1,26 @@
+(function () {
+    document.querySelectorAll('[data-tarefa]').forEach(function (elemento) {
+        var url = elemento.getAttribute('data-tarefa');
+
+        function consultar() {
+            fetch(url, {headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+                .then(function (resposta) {
+                    return resposta.json();
+                })
+                .then(function (tarefa) {
+                    elemento.querySelector('.tarefa-status').textContent = tarefa.status;
+                    elemento.querySelector('.tarefa-progresso').value = tarefa.progresso;
+                    elemento.querySelector('.tarefa-percentual').textContent = tarefa.progresso + '%';
+                    elemento.querySelector('.tarefa-mensagem').textContent = tarefa.mensagem || '';
+                    if (tarefa.ativa) {
+                        setTimeout(consultar, 1000);
+                    }
+                })
+                .catch(function () {
+                    setTimeout(consultar, 5000);
+                });
+        }
+
+        setTimeout(consultar, 1000);
+    });
+})();
@@ -0,0 +1,94 @@
+from sqlalchemy import delete, or_
+from . import db, cache, standings, importacao, estatisticas, eventos, historico
+from .jobs import fila, ErroDefinitivo
+from .models import Campeonato, Time, Jogo, Classificacao, ClassificacaoHistorico, campeonato_times
+
+LOTE = 500
+
+
+def _remover_jogos(execucao, filtro, etapa, total_etapas):
+    total = db.session.execute(db.select(db.func.count(Jogo.id)).where(filtro)).scalar()
+    removidos, time_ids = 0, set()
+    while True:
+        linhas = db.session.execute(db.select(Jogo.id, Jogo.campeonato_id).where(filtro).limit(LOTE)).all()
+        if not linhas:
+            return time_ids
+        ids = [linha.id for linha in linhas]
+        time_ids |= estatisticas.remover_jogos(ids)
+        eventos.registrar_lote('jogo.removido', ((linha.id, linha._asdict()) for linha in linhas))
+        db.session.execute(delete(Jogo).where(Jogo.id.in_(ids)))
+        removidos += len(ids)
+        execucao.progresso(etapa + removidos / max(total, 1), total_etapas,
+                           f'{removidos} de {total} jogo(s) removido(s)')
+
+
+@fila.tarefa('deletar_campeonato')
+def deletar_campeonato(execucao, campeonato_id):
+    campeonato = db.session.get(Campeonato, campeonato_id)
+    if campeonato is None:
+        return
+    removido = eventos.dados_de(campeonato)
+
+    time_ids = _remover_jogos(execucao, Jogo.campeonato_id == campeonato_id, 0, 2)
+    estatisticas.remover_campeonato(campeonato_id)
+    estatisticas.recalcular_recordes(time_ids)
+
+    db.session.execute(delete(ClassificacaoHistorico).where(ClassificacaoHistorico.campeonato_id == campeonato_id))
+    db.session.execute(delete(Classificacao).where(Classificacao.campeonato_id == campeonato_id))
+    db.session.execute(delete(campeonato_times).where(campeonato_times.c.campeonato_id == campeonato_id))
+    db.session.execute(delete(Campeonato).where(Campeonato.id == campeonato_id))
+    eventos.registrar('campeonato.removido', campeonato_id, removido)
+    execucao.ao_concluir(lambda: cache.invalidar('campeonatos', 'jogos', f'campeonato:{campeonato_id}'))
+
+
+@fila.tarefa('deletar_time')
+def deletar_time(execucao, time_id):
+    time = db.session.get(Time, time_id)
+    if time is None:
+        return
+
+    campeonato_ids = [campeonato.id for campeonato in time.campeonatos]
+    removido = eventos.dados_de(time)
+    for campeonato_id in campeonato_ids:
+        standings.remover_time(campeonato_id, time_id)
+    db.session.execute(delete(campeonato_times).where(campeonato_times.c.time_id == time_id))
+    eventos.registrar_lote('inscricao.removida', ((campeonato_id, {'campeonato_id': campeonato_id, 'time_id': time_id})
+                                                  for campeonato_id in campeonato_ids))
+    execucao.progresso(1, 3, 'Time removido dos campeonatos')
+
+    time_ids = _remover_jogos(execucao, or_(Jogo.time_casa_id == time_id, Jogo.time_visitante_id == time_id), 1, 3)
+    estatisticas.remover_time(time_id)
+    estatisticas.recalcular_recordes(time_ids - {time_id})
+
+    db.session.execute(delete(Time).where(Time.id == time_id))
+    eventos.registrar('time.removido', time_id, removido)
+    execucao.ao_concluir(lambda: cache.invalidar('times', 'jogos', *(f'campeonato:{campeonato_id}'
+                                                                    for campeonato_id in campeonato_ids)))
+    execucao.ao_concluir(lambda: historico.agendar(*campeonato_ids))
+
+
+@fila.tarefa('importar_jogos')
+def importar_jogos(execucao, linhas):
+    try:
+        jogos = importacao.importar_jogos(linhas)
+    except importacao.ErroImportacao as erro:
+        raise ErroDefinitivo('; '.join(f'Linha {numero}: {mensagem}' for numero, mensagem in erro.erros[:20]))
+
+    execucao.ao_concluir(lambda: importacao.publicar_importacao(jogos))
+
+
+@fila.tarefa('reconstruir_tabela')
+def reconstruir_tabela(execucao, campeonato_id):
+    campeonato = db.session.get(Campeonato, campeonato_id)
+    if campeonato is None:
+        return
+
+    standings.reconstruir_tabela(campeonato)
+    execucao.ao_concluir(lambda: cache.invalidar(f'campeonato:{campeonato_id}'))
+    execucao.ao_concluir(lambda: historico.agendar(campeonato_id))
+
+
+@fila.tarefa('atualizar_historico')
+def atualizar_historico(execucao, campeonato_id):
+    if historico.garantir_historico(campeonato_id):
+        execucao.ao_concluir(lambda: cache.invalidar(f'campeonato:{campeonato_id}'))
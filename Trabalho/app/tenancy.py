@@ -0,0 +1,228 @@
+import os
+import re
+import time
+import weakref
+from collections import namedtuple
+from contextlib import contextmanager
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import with_loader_criteria
+from flask import g, request, abort, current_app, has_app_context
+from .database import Motores, Sessao, opcoes_engine, configurar_engine, is_sqlite
+
+Registro = namedtuple('Registro', 'id slug nome dominio banco_url supremo_id')
+
+PADRAO = Registro(1, 'padrao', 'SIGTO', None, None, 1)
+
+# Um único gancho de fork para todas as instâncias: os motores herdados do pai não podem ser usados no filho.
+_instancias = weakref.WeakSet()
+
+
+def _apos_fork():
+    for instancia in list(_instancias):
+        instancia.motores.descartar(fechar=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_apos_fork)
+
+
+class PrefixoCaminho:
+
+    def __init__(self, app, prefixo='/o'):
+        self.app = app
+        self.padrao = re.compile(rf'^{re.escape(prefixo)}/([a-z0-9][a-z0-9-]*)(?=/|$)')
+
+    def __call__(self, environ, start_response):
+        caminho = environ.get('PATH_INFO', '')
+        achado = self.padrao.match(caminho)
+        if achado:
+            environ['SCRIPT_NAME'] = environ.get('SCRIPT_NAME', '') + achado.group(0)
+            environ['PATH_INFO'] = caminho[achado.end():] or '/'
+            environ['sigto.organizacao'] = achado.group(1)
+        return self.app(environ, start_response)
+
+
+class Organizacoes:
+
+    def __init__(self):
+        self.db = None
+        self.modelo = None
+        self.motores = Motores(None)
+        self.ttl = 60
+        self._registros = {}
+
+    def init_app(self, app, db):
+        app.config.setdefault('ORGANIZACAO_PADRAO', 'padrao')
+        app.config.setdefault('ORGANIZACAO_RESOLUCAO', 'nenhuma')
+        app.config.setdefault('ORGANIZACAO_DOMINIO', None)
+        app.config.setdefault('ORGANIZACAO_PREFIXO', '/o')
+        app.config.setdefault('ORGANIZACAO_MODO', 'compartilhado')
+        app.config.setdefault('ORGANIZACAO_BANCO_URL', None)
+        app.config.setdefault('ORGANIZACAO_MAX_MOTORES', 32)
+        app.config.setdefault('ORGANIZACAO_POOL_SIZE', 2)
+        app.config.setdefault('ORGANIZACAO_MAX_OVERFLOW', 3)
+        app.config.setdefault('ORGANIZACAO_CACHE_TTL', 60)
+
+        from .models import PorOrganizacao
+        self.db = db
+        self.modelo = PorOrganizacao
+        self.ttl = app.config['ORGANIZACAO_CACHE_TTL']
+        self.motores = Motores(lambda url: self._criar_motor(app, url), app.config['ORGANIZACAO_MAX_MOTORES'])
+        db.motor_organizacao = self.motor
+
+        event.listen(Sessao, 'do_orm_execute', self._filtrar)
+        _instancias.add(self)
+
+        if app.config['ORGANIZACAO_RESOLUCAO'] == 'caminho':
+            app.wsgi_app = PrefixoCaminho(app.wsgi_app, app.config['ORGANIZACAO_PREFIXO'])
+        app.before_request(self._resolver)
+        app.context_processor(lambda: {'organizacao': self.atual()})
+
+    def _criar_motor(self, app, url):
+        opcoes = opcoes_engine(app.config, url)
+        if not is_sqlite(url):
+            opcoes.update(pool_size=app.config['ORGANIZACAO_POOL_SIZE'],
+                          max_overflow=app.config['ORGANIZACAO_MAX_OVERFLOW'])
+        motor = sa.create_engine(url, **opcoes)
+        configurar_engine(motor, app.config)
+        if app.config['METRICAS_ATIVAS']:
+            from . import metricas
+            metricas.instrumentar_engine(motor)
+        return motor
+
+    def _consultar(self, chave, condicao):
+        agora = time.monotonic()
+        chave = (str(self.db.catalogo.url), chave)
+        em_cache = self._registros.get(chave)
+        if em_cache is not None and em_cache[1] > agora:
+            return em_cache[0]
+
+        tabela = self.modelo_registro().__table__
+        try:
+            with self.db.catalogo.connect() as conn:
+                linha = conn.execute(sa.select(*(tabela.c[campo] for campo in Registro._fields))
+                                     .where(condicao(tabela))).first()
+        except (sa.exc.OperationalError, sa.exc.ProgrammingError):
+            linha = None
+        registro = Registro(*linha) if linha is not None else None
+        self._registros[chave] = (registro, agora + self.ttl)
+        return registro
+
+    def modelo_registro(self):
+        from .models import Organizacao
+        return Organizacao
+
+    def esquecer(self):
+        self._registros.clear()
+
+    def buscar(self, slug):
+        registro = self._consultar(('slug', slug), lambda tabela: tabela.c.slug == slug)
+        if registro is None and slug == PADRAO.slug:
+            return PADRAO
+        return registro
+
+    def por_id(self, organizacao_id):
+        registro = self._consultar(('id', organizacao_id), lambda tabela: tabela.c.id == organizacao_id)
+        if registro is None and organizacao_id == PADRAO.id:
+            return PADRAO
+        return registro
+
+    def por_dominio(self, dominio):
+        return self._consultar(('dominio', dominio), lambda tabela: tabela.c.dominio == dominio)
+
+    def _resolver(self):
+        modo = current_app.config['ORGANIZACAO_RESOLUCAO']
+        slug = None
+        if modo == 'caminho':
+            slug = request.environ.get('sigto.organizacao')
+        elif modo == 'host':
+            host = request.host.rsplit(':', 1)[0].lower()
+            registro = self.por_dominio(host)
+            if registro is not None:
+                g.organizacao = registro
+                return
+            base = current_app.config['ORGANIZACAO_DOMINIO']
+            if base and host.endswith('.' + base):
+                slug = host[:-len(base) - 1]
+
+        if slug is not None:
+            registro = self.buscar(slug)
+            if registro is None:
+                abort(404)
+            g.organizacao = registro
+
+    def atual(self):
+        if 'organizacao' not in g:
+            slug = current_app.config['ORGANIZACAO_PADRAO']
+            registro = self.buscar(slug)
+            if registro is None:
+                raise LookupError(f'Organização desconhecida: {slug}')
+            g.organizacao = registro
+        return g.organizacao
+
+    @contextmanager
+    def ativar(self, organizacao_id):
+        registro = self.por_id(organizacao_id)
+        if registro is None:
+            raise LookupError(f'Organização desconhecida: {organizacao_id}')
+        anterior = g.pop('organizacao', None)
+        g.organizacao = registro
+        try:
+            yield registro
+        finally:
+            g.pop('organizacao', None)
+            if anterior is not None:
+                g.organizacao = anterior
+
+    def espaco(self):
+        return f'o{self.atual().id}:' if has_app_context() else ''
+
+    def motor(self):
+        if not has_app_context():
+            return None
+        registro = self.atual()
+        if registro.banco_url is None:
+            return None
+        return self.motores.obter(registro.banco_url)
+
+    def _filtrar(self, estado):
+        if not (estado.is_select or estado.is_update or estado.is_delete) or estado.is_column_load \
+                or estado.is_relationship_load or estado.execution_options.get('todas_organizacoes', False):
+            return
+        organizacao_id = self.atual().id
+        estado.statement = estado.statement.options(with_loader_criteria(
+            self.modelo, lambda cls: cls.organizacao_id == organizacao_id, include_aliases=True))
+
+    def listar(self):
+        tabela = self.modelo_registro().__table__
+        with self.db.catalogo.connect() as conn:
+            return [Registro(*linha) for linha in conn.execute(
+                sa.select(*(tabela.c[campo] for campo in Registro._fields)).order_by(tabela.c.id))]
+
+    def url_banco(self, slug):
+        modelo = current_app.config['ORGANIZACAO_BANCO_URL'] \
+            or 'sqlite:///' + os.path.join(current_app.instance_path, 'organizacoes', '{slug}.db')
+        url = modelo.format(slug=slug)
+        arquivo = make_url(url).database
+        if is_sqlite(url) and arquivo and arquivo != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+        return url
+
+    def criar(self, slug, nome, dominio=None, banco_url=None):
+        tabela = self.modelo_registro().__table__
+        with self.db.catalogo.begin() as conn:
+            organizacao_id = conn.execute(
+                sa.insert(tabela).values(slug=slug, nome=nome, dominio=dominio, banco_url=banco_url)
+            ).inserted_primary_key[0]
+        self.esquecer()
+        return self.por_id(organizacao_id)
+
+    def definir_supremo(self, organizacao_id, usuario_id):
+        tabela = self.modelo_registro().__table__
+        with self.db.catalogo.begin() as conn:
+            conn.execute(sa.update(tabela).where(tabela.c.id == organizacao_id).values(supremo_id=usuario_id))
+        self.esquecer()
+        if g.get('organizacao') is not None and g.organizacao.id == organizacao_id:
+            g.organizacao = self.por_id(organizacao_id)
@@ -0,0 +1,114 @@
+"""Mede a latência de leitura enquanto um escritor atualiza placares
+continuamente, comparando o journal padrão do SQLite (DELETE) com WAL.
+
+Escritor e leitores rodam em processos separados, como os workers de
+produção, usando a mesma configuração de engine que o create_app aplica.
+
+Uso (dentro da pasta Trabalho):
+    python benchmarks/bench_concorrencia.py --leitores 4 --segundos 5
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, migrations  # noqa: E402
+from app.config import ProductionConfig  # noqa: E402
+
+
+def criar_app(caminho, modo):
+    class Config(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + caminho
+        SQLITE_JOURNAL_MODE = modo
+
+    return create_app(Config)
+
+
+def preparar(caminho, modo, jogos):
+    app = criar_app(caminho, modo)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        with db.engine.begin() as conn:
+            conn.execute(sa.text("INSERT INTO time (id, nome) VALUES (1, 'A'), (2, 'B')"))
+            conn.execute(sa.text("INSERT INTO campeonato (id, nome) VALUES (1, 'C')"))
+            inicio = datetime(2024, 1, 1)
+            conn.execute(sa.text(
+                "INSERT INTO jogo (data_hora, placar_casa, placar_visitante, status, "
+                "time_casa_id, time_visitante_id, campeonato_id) "
+                "VALUES (:data_hora, 0, 0, 'Em Andamento', 1, 2, 1)"),
+                [{'data_hora': inicio + timedelta(minutes=i)} for i in range(jogos)])
+        db.engine.dispose()
+
+
+def escritor(caminho, modo, parar):
+    app = criar_app(caminho, modo)
+    with app.app_context():
+        while not parar.is_set():
+            with db.engine.begin() as conn:
+                conn.execute(sa.text("UPDATE jogo SET placar_casa = placar_casa + 1"))
+
+
+def leitor(caminho, modo, parar, resultados):
+    app = criar_app(caminho, modo)
+    latencias = []
+    with app.app_context():
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            with db.engine.connect() as conn:
+                conn.execute(sa.text(
+                    "SELECT id, placar_casa FROM jogo ORDER BY data_hora DESC, id DESC LIMIT 50"
+                )).fetchall()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+    resultados.put(latencias)
+
+
+def executar(modo, args, pasta):
+    caminho = os.path.join(pasta, f'{modo.lower()}.db')
+    preparar(caminho, modo, args.jogos)
+
+    parar = multiprocessing.Event()
+    resultados = multiprocessing.Queue()
+    processos = [multiprocessing.Process(target=escritor, args=(caminho, modo, parar))]
+    processos += [multiprocessing.Process(target=leitor, args=(caminho, modo, parar, resultados))
+                  for _ in range(args.leitores)]
+
+    for processo in processos:
+        processo.start()
+    time.sleep(args.segundos)
+    parar.set()
+
+    latencias = sorted(l for _ in range(args.leitores) for l in resultados.get())
+    for processo in processos:
+        processo.join()
+
+    return {
+        'leituras': len(latencias),
+        'p50': latencias[len(latencias) // 2],
+        'p99': latencias[int(len(latencias) * 0.99) - 1],
+        'max': latencias[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jogos', type=int, default=200000)
+    parser.add_argument('--leitores', type=int, default=4)
+    parser.add_argument('--segundos', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        for modo in ('DELETE', 'WAL'):
+            r = executar(modo, args, pasta)
+            print(f"{modo:6}  leituras={r['leituras']:7d}  p50={r['p50']:7.2f} ms  "
+                  f"p99={r['p99']:8.2f} ms  max={r['max']:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Compara a importação em lote (uma transação, inserts em lotes) com o
+cadastro jogo a jogo (um commit por jogo, como em novo_jogo).
+
+Gera o turno e returno completo para N times (N=101 produz 10.100 jogos).
+
+Uso (dentro da pasta Trabalho):
+    python benchmarks/bench_importacao.py --times 101 --amostra 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, migrations, importacao, standings  # noqa: E402
+from app.config import ProductionConfig  # noqa: E402
+from app.models import Time, Campeonato, Jogo  # noqa: E402
+
+
+def preparar(caminho, quantidade_times):
+    class Config(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + caminho
+
+    app = create_app(Config)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        campeonato = Campeonato(nome='Benchmark')
+        db.session.add(campeonato)
+        for numero in range(quantidade_times):
+            time_ = Time(nome=f'Time {numero}')
+            db.session.add(time_)
+            campeonato.times.append(time_)
+        db.session.commit()
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--times', type=int, default=101)
+    parser.add_argument('--amostra', type=int, default=500,
+                        help='Jogos cadastrados um a um para estimar o custo do caminho antigo.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        app = preparar(os.path.join(pasta, 'lote.db'), args.times)
+        with app.app_context():
+            campeonato = Campeonato.query.first()
+
+            inicio = time.perf_counter()
+            linhas = importacao.gerar_tabela_de_jogos(campeonato, datetime(2025, 1, 1, 16), 7, True)
+            jogos = importacao.importar_jogos(linhas)
+            db.session.commit()
+            tempo_lote = time.perf_counter() - inicio
+            total = len(jogos)
+
+        app = preparar(os.path.join(pasta, 'individual.db'), args.times)
+        with app.app_context():
+            campeonato = Campeonato.query.first()
+            linhas = importacao.gerar_tabela_de_jogos(campeonato, datetime(2025, 1, 1, 16), 7, True)
+
+            inicio = time.perf_counter()
+            for linha in linhas[:args.amostra]:
+                jogo = Jogo(**linha)
+                db.session.add(jogo)
+                standings.atualizar_jogo(None, standings.resultado(jogo))
+                db.session.commit()
+            tempo_amostra = time.perf_counter() - inicio
+            estimado = tempo_amostra / min(args.amostra, total) * total
+
+    print(f'Jogos gerados: {total}')
+    print(f'Importação em lote:    {tempo_lote:8.2f} s  ({total / tempo_lote:,.0f} jogos/s)')
+    print(f'Jogo a jogo (estimado): {estimado:8.2f} s  ({total / estimado:,.0f} jogos/s, '
+          f'amostra de {min(args.amostra, total)})')
+    print(f'Ganho: {estimado / tempo_lote:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Compara plano de execução e latência das consultas de jogo antes e
+depois da migração de índices (0003), sobre uma base SQLite sintética.
+
+Uso (dentro da pasta Trabalho):
+    python benchmarks/bench_indices.py --jogos 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import migrations  # noqa: E402
+
+CONSULTAS = {
+    'tabela (campeonato + status)': (
+        "SELECT time_casa_id, time_visitante_id, placar_casa, placar_visitante "
+        "FROM jogo WHERE campeonato_id = :campeonato AND status = 'Finalizado'"
+    ),
+    'listagem (data_hora, id)': (
+        "SELECT id FROM jogo ORDER BY data_hora DESC, id DESC LIMIT 51"
+    ),
+    'listagem por time': (
+        "SELECT id FROM jogo WHERE time_casa_id = :time OR time_visitante_id = :time "
+        "ORDER BY data_hora DESC, id DESC LIMIT 51"
+    ),
+    'listagem por campeonato': (
+        "SELECT id FROM jogo WHERE campeonato_id = :campeonato "
+        "ORDER BY data_hora DESC, id DESC LIMIT 51"
+    ),
+}
+
+INSERIR_JOGO = sa.text(
+    "INSERT INTO jogo (id, data_hora, placar_casa, placar_visitante, status, time_casa_id, "
+    "time_visitante_id, campeonato_id) VALUES (:id, :data_hora, :placar_casa, :placar_visitante, "
+    ":status, :time_casa_id, :time_visitante_id, :campeonato_id)"
+)
+
+
+def popular(engine, campeonatos, times, jogos, semente):
+    aleatorio = random.Random(semente)
+    inicio = datetime(2020, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(sa.text("INSERT INTO time (id, nome) VALUES (:id, :nome)"),
+                     [{'id': i, 'nome': f'Time {i}'} for i in range(1, times + 1)])
+        conn.execute(sa.text("INSERT INTO campeonato (id, nome) VALUES (:id, :nome)"),
+                     [{'id': i, 'nome': f'Campeonato {i}'} for i in range(1, campeonatos + 1)])
+
+        lote = []
+        for i in range(1, jogos + 1):
+            casa, visitante = aleatorio.sample(range(1, times + 1), 2)
+            lote.append({
+                'id': i,
+                'data_hora': inicio + timedelta(minutes=aleatorio.randrange(60 * 24 * 365 * 5)),
+                'placar_casa': aleatorio.randrange(5),
+                'placar_visitante': aleatorio.randrange(5),
+                'status': aleatorio.choice(('Finalizado', 'Finalizado', 'Finalizado', 'Agendado')),
+                'time_casa_id': casa,
+                'time_visitante_id': visitante,
+                'campeonato_id': aleatorio.randrange(1, campeonatos + 1),
+            })
+            if len(lote) == 10000:
+                conn.execute(INSERIR_JOGO, lote)
+                lote = []
+        if lote:
+            conn.execute(INSERIR_JOGO, lote)
+        conn.execute(sa.text("ANALYZE"))
+
+
+def medir(engine, parametros, repeticoes):
+    resultados = {}
+    with engine.connect() as conn:
+        for nome, sql in CONSULTAS.items():
+            plano = conn.execute(sa.text('EXPLAIN QUERY PLAN ' + sql), parametros).fetchall()
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                conn.execute(sa.text(sql), parametros).fetchall()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nome] = (statistics.median(tempos), [linha[-1] for linha in plano])
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--campeonatos', type=int, default=100)
+    parser.add_argument('--times', type=int, default=2000)
+    parser.add_argument('--jogos', type=int, default=200000)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        engine = sa.create_engine('sqlite:///' + os.path.join(pasta, 'bench.db'))
+
+        migrations.upgrade(engine, alvo=2)
+        print(f'Populando {args.jogos} jogos...')
+        popular(engine, args.campeonatos, args.times, args.jogos, args.semente)
+
+        parametros = {'campeonato': 1, 'time': 1}
+        antes = medir(engine, parametros, args.repeticoes)
+
+        migrations.upgrade(engine, alvo=3)
+        with engine.begin() as conn:
+            conn.execute(sa.text("ANALYZE"))
+        depois = medir(engine, parametros, args.repeticoes)
+
+        for nome in CONSULTAS:
+            (tempo_antes, plano_antes), (tempo_depois, plano_depois) = antes[nome], depois[nome]
+            print(f'\n== {nome}')
+            print(f'   sem índices: {tempo_antes:8.2f} ms  {" / ".join(plano_antes)}')
+            print(f'   com índices: {tempo_depois:8.2f} ms  {" / ".join(plano_depois)}')
+            if tempo_depois:
+                print(f'   ganho: {tempo_antes / tempo_depois:.1f}x')
+
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
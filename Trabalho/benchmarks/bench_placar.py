@@ -0,0 +1,104 @@
+"""Compara a atualização de placar pelo formulário completo (editar_jogo)
+com o endpoint enxuto /jogos/<id>/placar, variando o número de times e
+campeonatos cadastrados.
+
+Uso (dentro da pasta Trabalho):
+    python benchmarks/bench_placar.py --times 50 5000 --repeticoes 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, bcrypt, migrations  # noqa: E402
+from app.config import TestingConfig  # noqa: E402
+from app.models import Usuario  # noqa: E402
+
+
+def preparar(caminho, quantidade_times):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + caminho
+        CACHE_BACKEND = 'nulo'
+
+    app = create_app(Config)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        db.session.add(Usuario(nome='Admin', email='admin@sigto.com.br', role='Admin',
+                               senha_hash=bcrypt.generate_password_hash('senha').decode('utf-8')))
+        db.session.commit()
+        with db.engine.begin() as conn:
+            conn.execute(sa.text("INSERT INTO time (id, nome) VALUES (:id, :nome)"),
+                         [{'id': i, 'nome': f'Time {i}'} for i in range(1, quantidade_times + 1)])
+            conn.execute(sa.text("INSERT INTO campeonato (id, nome) VALUES (:id, :nome)"),
+                         [{'id': i, 'nome': f'Campeonato {i}'} for i in range(1, quantidade_times // 10 + 2)])
+            conn.execute(sa.text("INSERT INTO campeonato_times (campeonato_id, time_id) VALUES (1, 1), (1, 2)"))
+            conn.execute(sa.text("INSERT INTO classificacao (campeonato_id, time_id) VALUES (1, 1), (1, 2)"))
+            conn.execute(sa.text(
+                "INSERT INTO jogo (id, data_hora, placar_casa, placar_visitante, status, versao, "
+                "time_casa_id, time_visitante_id, campeonato_id) "
+                "VALUES (1, :data_hora, 0, 0, 'Em Andamento', 1, 1, 2, 1)"),
+                {'data_hora': datetime(2025, 1, 1, 16)})
+    return app
+
+
+def medir(app, repeticoes):
+    consultas = [0]
+    with app.app_context():
+        sa.event.listen(db.engine, 'before_cursor_execute', lambda *args: consultas.__setitem__(0, consultas[0] + 1))
+
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': 'admin@sigto.com.br', 'password': 'senha'})
+
+    resultados = {}
+    tempos, contagens = [], []
+    for placar in range(repeticoes):
+        consultas[0] = 0
+        inicio = time.perf_counter()
+        resposta = cliente.post('/jogos/1/editar', data={
+            'campeonato': '1', 'time_casa': '1', 'time_visitante': '2',
+            'data_hora': '2025-01-01T16:00', 'placar_casa': placar + 1, 'placar_visitante': 0,
+            'status': 'Em Andamento'})
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        contagens.append(consultas[0])
+        assert resposta.status_code == 302
+    resultados['formulário (editar_jogo)'] = (statistics.median(tempos), statistics.median(contagens))
+
+    with app.app_context():
+        versao = db.session.execute(sa.text("SELECT versao FROM jogo WHERE id = 1")).scalar()
+
+    tempos, contagens = [], []
+    for placar in range(repeticoes):
+        consultas[0] = 0
+        inicio = time.perf_counter()
+        resposta = cliente.post('/jogos/1/placar', json={
+            'placar_casa': placar, 'placar_visitante': 1, 'status': 'Em Andamento', 'versao': versao})
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        contagens.append(consultas[0])
+        assert resposta.status_code == 200, resposta.get_json()
+        versao += 1
+    resultados['endpoint de placar'] = (statistics.median(tempos), statistics.median(contagens))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--times', type=int, nargs='+', default=[50, 5000])
+    parser.add_argument('--repeticoes', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        for quantidade in args.times:
+            app = preparar(os.path.join(pasta, f'placar_{quantidade}.db'), quantidade)
+            for nome, (mediana, consultas) in medir(app, args.repeticoes).items():
+                print(f'{quantidade:6d} times  {nome:26}  {mediana:8.2f} ms  {consultas:4.0f} consultas')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""Teste de carga reprodutível das rotas principais (tabela, jogos e login).
+
+Popula um banco com dados sintéticos (app/seed.py, semente fixa) e dispara
+requisições concorrentes pelo test client do Flask (sem rede), por um
+servidor waitress no mesmo processo e pelo comando `flask serve --servidor
+prefork` em processos separados. Para cada rota informa p50/p95/p99, vazão e
+consultas SQL por requisição (contadas pela instrumentação de app/metrics.py,
+indisponível no modo prefork). Também mede a partida a frio de `flask serve`
+(do início do processo até a primeira resposta) com waitress e prefork.
+
+Uso (dentro da pasta Trabalho):
+    python benchmarks/carga.py --escala pequena --salvar-base benchmarks/baselines/pequena.json
+    python benchmarks/carga.py --escala pequena --comparar benchmarks/baselines/pequena.json
+
+Com --comparar, o processo termina com código 1 se alguma rota ficar mais
+lenta (p95) ou com menor vazão além da tolerância, se emitir mais consultas
+SQL por requisição do que na base ou se a partida a frio ficar mais lenta.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+PASTA_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PASTA_PROJETO)
+
+from app import create_app, db, migrations, seed, metricas  # noqa: E402
+from app.config import ProductionConfig  # noqa: E402
+
+ESCALAS = {
+    'pequena': {'campeonatos': 10, 'times': 500, 'jogos': 20000},
+    'media': {'campeonatos': 50, 'times': 2000, 'jogos': 100000},
+    'grande': {'campeonatos': 100, 'times': 5000, 'jogos': 500000},
+}
+
+LOGIN = {'email': seed.EMAIL_ADMIN, 'password': seed.SENHA_PADRAO}
+
+# nome, método, caminho, corpo do formulário, status esperado, fração das requisições
+CENARIOS = [
+    ('tabela', 'GET', '/tabelas/1', None, 200, 1),
+    ('jogos', 'GET', '/jogos', None, 200, 1),
+    ('jogos_campeonato', 'GET', '/jogos?campeonato=1', None, 200, 1),
+    ('login', 'POST', '/login', LOGIN, 302, 0.1),
+]
+
+
+def criar_app(caminho, cache):
+    class Config(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + caminho
+        WTF_CSRF_ENABLED = False
+        CACHE_BACKEND = 'memoria' if cache else 'nulo'
+        METRICAS_ATIVAS = True
+        LOGIN_LIMITE_IP = None
+        LOGIN_LIMITE_CONTA = None
+
+    return create_app(Config)
+
+
+def preparar(caminho, escala, cache):
+    app = criar_app(caminho, cache)
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        if seed.banco_vazio():
+            inicio = time.perf_counter()
+            seed.gerar_dados(**ESCALAS[escala])
+            db.session.commit()
+            print(f'Banco populado ({escala}) em {time.perf_counter() - inicio:.1f} s.')
+    return app
+
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(int(round(fracao * (len(ordenados) - 1))), len(ordenados) - 1)]
+
+
+def _executar_em_paralelo(concorrencia, total, requisitar):
+    tempos = []
+    trava = threading.Lock()
+    restantes = [total]
+
+    def trabalhar():
+        enviar = requisitar()
+        while True:
+            with trava:
+                if restantes[0] <= 0:
+                    return
+                restantes[0] -= 1
+            inicio = time.perf_counter()
+            enviar()
+            duracao = time.perf_counter() - inicio
+            with trava:
+                tempos.append(duracao)
+
+    threads = [threading.Thread(target=trabalhar) for _ in range(concorrencia)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return tempos, time.perf_counter() - inicio
+
+
+def via_cliente(app, metodo, caminho, corpo, status):
+
+    def requisitar():
+        cliente = app.test_client(use_cookies=False)
+
+        def enviar():
+            resposta = cliente.open(caminho, method=metodo, data=corpo)
+            assert resposta.status_code == status, (caminho, resposta.status_code)
+        return enviar
+    return requisitar
+
+
+def via_waitress(porta, metodo, caminho, corpo, status):
+    cabecalhos = {'Content-Type': 'application/x-www-form-urlencoded'} if corpo else {}
+    dados = urlencode(corpo) if corpo else None
+
+    def requisitar():
+        conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=60)
+
+        def enviar():
+            conexao.request(metodo, caminho, body=dados, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+            assert resposta.status == status, (caminho, resposta.status)
+        return enviar
+    return requisitar
+
+
+def iniciar_waitress(app, threads):
+    from waitress import create_server
+
+    logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+    servidor = create_server(app, host='127.0.0.1', port=0, threads=threads)
+    threading.Thread(target=servidor.run, daemon=True).start()
+    return servidor
+
+
+def _porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def iniciar_processo(caminho, servidor, concorrencia, cache, workers=2):
+    porta = _porta_livre()
+    comando = [sys.executable, '-m', 'flask', '--app', 'run', 'serve', '--host', '127.0.0.1',
+               '--port', str(porta), '--servidor', servidor, '--threads', str(concorrencia)]
+    if servidor == 'prefork':
+        comando += ['--workers', str(workers)]
+    ambiente = dict(os.environ, DATABASE_URL='sqlite:///' + caminho, SIGTO_CONFIG='production',
+                    SIGTO_WTF_CSRF_ENABLED='false', SIGTO_LOGIN_LIMITE_IP='null', SIGTO_LOGIN_LIMITE_CONTA='null',
+                    CACHE_BACKEND='memoria' if cache else 'nulo')
+
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(comando, cwd=PASTA_PROJETO, env=ambiente,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while True:
+        if processo.poll() is not None:
+            raise RuntimeError(f'flask serve --servidor {servidor} terminou com código {processo.returncode}.')
+        try:
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=5)
+            conexao.request('GET', CENARIOS[0][2])
+            if conexao.getresponse().status == 200:
+                break
+        except OSError:
+            time.sleep(0.01)
+    return processo, porta, time.perf_counter() - inicio
+
+
+def encerrar_processo(processo):
+    processo.terminate()
+    try:
+        processo.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+
+
+def medir_partida_fria(caminho, servidores, concorrencia, cache):
+    resultados = {}
+    for servidor in servidores:
+        processo, _, segundos = iniciar_processo(caminho, servidor, concorrencia, cache)
+        encerrar_processo(processo)
+        resultados[servidor] = segundos
+        print(f'partida a frio ({servidor}): {segundos * 1000:.0f} ms até a primeira resposta')
+    return resultados
+
+
+def medir(requisitar, concorrencia, total, contar_consultas=True):
+    for _ in range(3):
+        requisitar()()
+
+    metricas.limpar()
+    tempos, duracao = _executar_em_paralelo(concorrencia, total, requisitar)
+    consultas = None
+    if contar_consultas:
+        histogramas = metricas.consultas.values()
+        consultas = sum(h.soma for h in histogramas) / max(sum(h.total for h in histogramas), 1)
+    return {
+        'p50_ms': percentil(tempos, 0.50) * 1000,
+        'p95_ms': percentil(tempos, 0.95) * 1000,
+        'p99_ms': percentil(tempos, 0.99) * 1000,
+        'req_s': len(tempos) / duracao,
+        'consultas': consultas,
+    }
+
+
+def executar(app, caminho, modos, concorrencia, requisicoes, cache):
+    resultados = {}
+    servidor = iniciar_waitress(app, concorrencia) if 'waitress' in modos else None
+    processo = None
+    if 'prefork' in modos:
+        processo, porta_prefork, _ = iniciar_processo(caminho, 'prefork', concorrencia, cache)
+
+    try:
+        for modo in modos:
+            resultados[modo] = {}
+            for nome, metodo, caminho, corpo, status, fracao in CENARIOS:
+                if modo == 'cliente':
+                    requisitar = via_cliente(app, metodo, caminho, corpo, status)
+                elif modo == 'waitress':
+                    requisitar = via_waitress(servidor.effective_port, metodo, caminho, corpo, status)
+                else:
+                    requisitar = via_waitress(porta_prefork, metodo, caminho, corpo, status)
+                resultado = medir(requisitar, concorrencia, max(int(requisicoes * fracao), concorrencia),
+                                  contar_consultas=modo != 'prefork')
+                resultados[modo][nome] = resultado
+                consultas = f"{resultado['consultas']:6.1f}" if resultado['consultas'] is not None else '     -'
+                print(f"{modo:9} {nome:18} p50 {resultado['p50_ms']:8.2f} ms  p95 {resultado['p95_ms']:8.2f} ms  "
+                      f"p99 {resultado['p99_ms']:8.2f} ms  {resultado['req_s']:8.1f} req/s  "
+                      f"{consultas} consultas/req")
+    finally:
+        if servidor is not None:
+            servidor.close()
+        if processo is not None:
+            encerrar_processo(processo)
+    return resultados
+
+
+def comparar(resultados, partida_fria, base, tolerancia):
+    regressoes = []
+    for servidor, esperado in base.get('partida_fria', {}).items():
+        obtido = partida_fria.get(servidor)
+        if obtido is not None and obtido > esperado * (1 + tolerancia):
+            regressoes.append(f"partida a frio ({servidor}): {obtido * 1000:.0f} ms > base {esperado * 1000:.0f} ms")
+
+    for modo, cenarios in base['resultados'].items():
+        for nome, esperado in cenarios.items():
+            obtido = resultados.get(modo, {}).get(nome)
+            if obtido is None:
+                continue
+            if obtido['p95_ms'] > esperado['p95_ms'] * (1 + tolerancia):
+                regressoes.append(f"{modo}/{nome}: p95 {obtido['p95_ms']:.2f} ms > base {esperado['p95_ms']:.2f} ms")
+            if obtido['req_s'] < esperado['req_s'] * (1 - tolerancia):
+                regressoes.append(f"{modo}/{nome}: vazão {obtido['req_s']:.1f} req/s < base {esperado['req_s']:.1f} req/s")
+            if None not in (obtido['consultas'], esperado['consultas']) \
+                    and obtido['consultas'] > esperado['consultas'] + 0.5:
+                regressoes.append(f"{modo}/{nome}: {obtido['consultas']:.1f} consultas/req > base {esperado['consultas']:.1f}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escala', choices=sorted(ESCALAS), default='pequena')
+    parser.add_argument('--modo', choices=['cliente', 'waitress', 'prefork', 'todos'], default='todos')
+    parser.add_argument('--concorrencia', type=int, default=4)
+    parser.add_argument('--requisicoes', type=int, default=200, help='Requisições medidas por rota.')
+    parser.add_argument('--sem-partida-fria', action='store_true', help='Não mede a partida a frio de flask serve.')
+    parser.add_argument('--cache', action='store_true', help='Mede com o cache de páginas ligado.')
+    parser.add_argument('--banco', help='Arquivo SQLite a reutilizar entre execuções (criado se não existir).')
+    parser.add_argument('--salvar-base', metavar='ARQUIVO')
+    parser.add_argument('--comparar', metavar='ARQUIVO')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Margem para p95 e vazão (0.25 = 25%%).')
+    args = parser.parse_args()
+
+    servidores = ['waitress', 'prefork'] if hasattr(os, 'fork') else ['waitress']
+    modos = ['cliente', 'waitress'] + servidores[1:] if args.modo == 'todos' else [args.modo]
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.abspath(args.banco) if args.banco else os.path.join(pasta, f'carga_{args.escala}.db')
+        app = preparar(caminho, args.escala, args.cache)
+        partida_fria = {} if args.sem_partida_fria else \
+            medir_partida_fria(caminho, servidores, args.concorrencia, args.cache)
+        resultados = executar(app, caminho, modos, args.concorrencia, args.requisicoes, args.cache)
+
+    if args.salvar_base:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salvar_base)), exist_ok=True)
+        with open(args.salvar_base, 'w') as arquivo:
+            json.dump({
+                'escala': args.escala,
+                'concorrencia': args.concorrencia,
+                'requisicoes': args.requisicoes,
+                'cache': args.cache,
+                'python': platform.python_version(),
+                'partida_fria': partida_fria,
+                'resultados': resultados,
+            }, arquivo, indent=2)
+        print(f'Base salva em {args.salvar_base}.')
+
+    if args.comparar:
+        with open(args.comparar) as arquivo:
+            base = json.load(arquivo)
+        regressoes = comparar(resultados, partida_fria, base, args.tolerancia)
+        for regressao in regressoes:
+            print(f'REGRESSÃO {regressao}')
+        if regressoes:
+            raise SystemExit(1)
+        print('Sem regressões em relação à base.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import event
+from app import create_app, db, seed
+from app.config import TestingConfig
+
+
+class Config(TestingConfig):
+    CACHE_BACKEND = 'nulo'
+    BCRYPT_LOG_ROUNDS = 4
+    LOGIN_LIMITE_IP = None
+    LOGIN_LIMITE_CONTA = None
+
+
+@pytest.fixture
+def app():
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def popular(app):
+    def popular(**quantidades):
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        seed.gerar_dados(informar=None, **quantidades)
+        db.session.commit()
+    return popular
+
+
+@pytest.fixture
+def login(client):
+    def login(email=seed.EMAIL_ADMIN, senha=seed.SENHA_PADRAO):
+        resposta = client.post('/login', data={'email': email, 'password': senha})
+        assert resposta.status_code == 302
+    return login
+
+
+@pytest.fixture
+def consultas(app):
+    contador = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        contador.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    yield contador
+    event.remove(db.engine, 'before_cursor_execute', contar)
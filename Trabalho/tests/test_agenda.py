@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+import pytest
+from app import db, agenda, importacao
+from app.models import Campeonato, Jogo
+
+INICIO = datetime(2030, 3, 2, 16, 0)
+
+
+@pytest.fixture
+def times(app, popular):
+    popular(campeonatos=1, times=5, jogos=0, usuarios=1, times_por_campeonato=5)
+    campeonato = Campeonato.query.one()
+    return campeonato.id, sorted(time.id for time in campeonato.times)
+
+
+def _jogo(campeonato_id, casa, visitante, data_hora):
+    jogo = Jogo(campeonato_id=campeonato_id, time_casa_id=casa, time_visitante_id=visitante, data_hora=data_hora)
+    db.session.add(jogo)
+    db.session.commit()
+    return jogo
+
+
+def _minutos(app, deslocamento):
+    return INICIO + timedelta(minutes=deslocamento(app.config['AGENDA_JANELA_MINUTOS']))
+
+
+# A janela é [início, início + AGENDA_JANELA_MINUTOS): exatamente uma janela de distância não conflita.
+BORDAS = [
+    (lambda janela: -janela, False),
+    (lambda janela: -janela + 1, True),
+    (lambda janela: 0, True),
+    (lambda janela: janela - 1, True),
+    (lambda janela: janela, False),
+]
+
+
+@pytest.mark.parametrize('deslocamento, conflita', BORDAS)
+def test_conflitos_nas_bordas_da_janela(app, times, deslocamento, conflita):
+    campeonato_id, (a, b, c, d, e) = times
+    existente = _jogo(campeonato_id, a, b, INICIO)
+    data_hora = _minutos(app, deslocamento)
+
+    assert [jogo.id for jogo in agenda.conflitos([a, c], data_hora)] == ([existente.id] if conflita else [])
+    assert [jogo.id for jogo in agenda.conflitos([c, b], data_hora)] == ([existente.id] if conflita else [])
+    assert agenda.conflitos([c, d], data_hora) == []
+
+
+def test_conflitos_ignora_o_proprio_jogo(app, times):
+    campeonato_id, (a, b, c, d, e) = times
+    jogo = _jogo(campeonato_id, a, b, INICIO)
+    outro = _jogo(campeonato_id, a, c, INICIO + timedelta(minutes=app.config['AGENDA_JANELA_MINUTOS'] + 60))
+
+    assert [conflito.id for conflito in agenda.conflitos([a, b], INICIO + timedelta(minutes=30))] == [jogo.id]
+    assert agenda.conflitos([a, b], INICIO + timedelta(minutes=30), ignorar_id=jogo.id) == []
+    assert [conflito.id for conflito in agenda.conflitos([a, b], INICIO + timedelta(minutes=120),
+                                                         ignorar_id=jogo.id)] == [outro.id]
+
+
+def _editar(client, jogo, data_hora):
+    return client.post(f'/jogos/{jogo.id}/editar', data={
+        'campeonato': jogo.campeonato_id, 'time_casa': jogo.time_casa_id, 'time_visitante': jogo.time_visitante_id,
+        'data_hora': f'{data_hora:%Y-%m-%dT%H:%M}', 'placar_casa': 0, 'placar_visitante': 0,
+        'status': 'Agendado', 'versao': jogo.versao,
+    })
+
+
+def test_editar_jogo_nao_conflita_consigo(app, client, login, times):
+    campeonato_id, (a, b, c, d, e) = times
+    jogo = _jogo(campeonato_id, a, b, INICIO)
+    janela = app.config['AGENDA_JANELA_MINUTOS']
+    _jogo(campeonato_id, a, c, INICIO + timedelta(minutes=2 * janela))
+    login()
+
+    assert _editar(client, jogo, INICIO + timedelta(minutes=janela + 1)).status_code == 200
+    assert db.session.get(Jogo, jogo.id).data_hora == INICIO
+
+    assert _editar(client, jogo, INICIO + timedelta(minutes=30)).status_code == 302
+    db.session.expire_all()
+    assert db.session.get(Jogo, jogo.id).data_hora == INICIO + timedelta(minutes=30)
+
+
+def _lote(campeonato_id, *jogos):
+    return [(numero, {'campeonato_id': campeonato_id, 'time_casa_id': casa, 'time_visitante_id': visitante,
+                      'data_hora': data_hora})
+            for numero, (casa, visitante, data_hora) in enumerate(jogos, start=1)]
+
+
+@pytest.mark.parametrize('deslocamento, conflita', BORDAS)
+def test_conflitos_lote_dentro_do_arquivo(app, times, deslocamento, conflita):
+    campeonato_id, (a, b, c, d, e) = times
+    lote = _lote(campeonato_id, (a, b, INICIO), (c, a, _minutos(app, deslocamento)), (d, e, INICIO))
+
+    erros = agenda.conflitos_lote(lote)
+    if not conflita:
+        assert erros == []
+    else:
+        assert len(erros) == 1 and 'outro jogo do arquivo' in erros[0][1]
+        assert erros[0][0] in (1, 2)
+
+
+@pytest.mark.parametrize('deslocamento, conflita', BORDAS)
+def test_conflitos_lote_contra_jogos_existentes(app, times, deslocamento, conflita):
+    campeonato_id, (a, b, c, d, e) = times
+    _jogo(campeonato_id, a, b, INICIO)
+    lote = _lote(campeonato_id, (d, e, INICIO), (c, b, _minutos(app, deslocamento)))
+
+    erros = agenda.conflitos_lote(lote)
+    if not conflita:
+        assert erros == []
+    else:
+        assert [numero for numero, _ in erros] == [2]
+        assert 'já tem jogo' in erros[0][1]
+
+
+def test_conflitos_lote_entre_dois_jogos_existentes(app, times):
+    campeonato_id, (a, b, c, d, e) = times
+    janela = timedelta(minutes=app.config['AGENDA_JANELA_MINUTOS'])
+    _jogo(campeonato_id, a, b, INICIO - janela)
+    _jogo(campeonato_id, a, c, INICIO + janela)
+
+    assert agenda.conflitos_lote(_lote(campeonato_id, (a, d, INICIO))) == []
+    # Com mais jogos do time no arquivo a consulta cobre um intervalo maior que a janela.
+    assert agenda.conflitos_lote(_lote(campeonato_id, (a, d, INICIO - 3 * janela), (a, e, INICIO))) == []
+    assert [numero for numero, _ in agenda.conflitos_lote(
+        _lote(campeonato_id, (a, d, INICIO + timedelta(minutes=1))))] == [1]
+
+
+def test_importacao_recusa_conflitos(app, times):
+    campeonato_id, (a, b, c, d, e) = times
+    _jogo(campeonato_id, a, b, INICIO)
+    linhas = [
+        {'campeonato_id': campeonato_id, 'time_casa_id': c, 'time_visitante_id': a, 'data_hora': INICIO.isoformat()},
+        {'campeonato_id': campeonato_id, 'time_casa_id': d, 'time_visitante_id': e, 'data_hora': INICIO.isoformat()},
+        {'campeonato_id': campeonato_id, 'time_casa_id': e, 'time_visitante_id': c,
+         'data_hora': (INICIO + timedelta(minutes=1)).isoformat()},
+    ]
+
+    validos, erros = importacao.validar_jogos(linhas)
+    assert [jogo['time_casa_id'] for jogo in validos] == [d]
+    assert [numero for numero, _ in erros] == [1, 3]
@@ -0,0 +1,75 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import text
+from app import db, busca, migrations
+from app.models import Time, Campeonato, Jogo
+
+TIMES = ('São Paulo', 'Santos', 'Grêmio', 'Atlético Mineiro', 'Paulista')
+
+
+@pytest.fixture
+def migrado(app):
+    # O índice textual só existe em bases criadas pelas migrações.
+    db.session.remove()
+    db.drop_all()
+    migrations.upgrade(db.engine)
+
+
+def _popular():
+    times = {nome: Time(nome=nome) for nome in TIMES}
+    copa = Campeonato(nome='Copa Ipiranga', regras='Pontos corridos')
+    db.session.add_all([*times.values(), copa])
+    db.session.flush()
+    db.session.add(Jogo(campeonato_id=copa.id, time_casa_id=times['São Paulo'].id,
+                        time_visitante_id=times['Grêmio'].id, data_hora=datetime(2030, 3, 2, 16, 0)))
+    db.session.commit()
+
+
+def _nomes(resultados, tipo):
+    if tipo == 'jogos':
+        return sorted(f'{jogo.time_casa} x {jogo.time_visitante}' for jogo in resultados[tipo])
+    return sorted(linha.nome for linha in resultados[tipo])
+
+
+def test_disponibilidade_acompanha_o_esquema(app):
+    assert not busca.indice_disponivel()
+
+    db.session.remove()
+    db.drop_all()
+    migrations.upgrade(db.engine)
+    assert busca.indice_disponivel()
+
+    with db.engine.begin() as conn:
+        conn.execute(text('DROP TABLE busca_jogos'))
+    assert not busca.indice_disponivel()
+    busca.reindexar()
+    assert busca.indice_disponivel()
+
+
+@pytest.mark.parametrize('consulta, tipo, esperado', [
+    ('sao pau', 'times', ['São Paulo']),
+    ('SÃO PAULO', 'times', ['São Paulo']),
+    ('paulo sao', 'times', ['São Paulo']),
+    ('gremio', 'times', ['Grêmio']),
+    ('GRÊM', 'times', ['Grêmio']),
+    ('atle', 'times', ['Atlético Mineiro']),
+    ('mineiro atl', 'times', ['Atlético Mineiro']),
+    ('pau', 'times', ['Paulista', 'São Paulo']),
+    ('sa', 'times', ['Santos', 'São Paulo']),
+    ('sa paulo', 'times', []),
+    ('ipir', 'campeonatos', ['Copa Ipiranga']),
+    ('corridos', 'campeonatos', ['Copa Ipiranga']),
+    ('sao paulo x gre', 'jogos', ['São Paulo x Grêmio']),
+    ('copa ipiranga', 'jogos', ['São Paulo x Grêmio']),
+])
+def test_busca_ignora_acentos_e_maiusculas(migrado, consulta, tipo, esperado):
+    _popular()
+    assert busca.indice_disponivel()
+    assert _nomes(busca.buscar(consulta), tipo) == esperado
+
+
+def test_busca_sem_indice_usa_like(app):
+    _popular()
+    assert not busca.indice_disponivel()
+    assert _nomes(busca.buscar('PAUL'), 'times') == ['Paulista', 'São Paulo']
+    assert _nomes(busca.buscar('são pau x grê'), 'jogos') == ['São Paulo x Grêmio']
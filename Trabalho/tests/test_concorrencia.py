@@ -0,0 +1,139 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from app import create_app, db, standings, bcrypt
+from app.models import Usuario, Time, Campeonato, Jogo, Classificacao
+from conftest import Config
+
+THREADS = 6
+ATUALIZACOES = 15
+LEITURA_MAXIMA = 2
+
+
+@pytest.fixture
+def app_em_arquivo(tmp_path):
+    class ConfigArquivo(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{tmp_path / "concorrencia.db"}'
+        CAMINHO = tmp_path / 'concorrencia.db'
+
+    app = create_app(ConfigArquivo)
+    with app.app_context():
+        db.create_all()
+        senha = bcrypt.generate_password_hash('senha').decode()
+        db.session.add(Usuario(nome='Admin', email='admin@teste.com', senha_hash=senha, role='Admin'))
+        times = [Time(nome=f'Time {numero}') for numero in range(4)]
+        campeonato = Campeonato(nome='Copa', data_inicio=datetime(2025, 1, 1).date(),
+                                data_fim=datetime(2025, 12, 31).date(), times=times)
+        db.session.add(campeonato)
+        db.session.flush()
+        for time in times:
+            standings.inscrever_time(campeonato.id, time.id)
+        inicio = datetime(2025, 2, 1, 16)
+        for numero, (casa, visitante) in enumerate([(0, 1), (2, 3), (0, 2), (1, 3)]):
+            db.session.add(Jogo(campeonato_id=campeonato.id, time_casa_id=times[casa].id,
+                                time_visitante_id=times[visitante].id, status='Agendado',
+                                data_hora=inicio + timedelta(days=numero)))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def _cliente(app):
+    cliente = app.test_client()
+    assert cliente.post('/login', data={'email': 'admin@teste.com', 'password': 'senha'}).status_code == 302
+    return cliente
+
+
+def _versao(app, jogo_id):
+    with app.app_context():
+        return db.session.get(Jogo, jogo_id).versao
+
+
+def test_placares_concorrentes_nao_perdem_atualizacoes(app_em_arquivo):
+    app = app_em_arquivo
+    with app.app_context():
+        jogo_ids = [jogo.id for jogo in Jogo.query.order_by(Jogo.id)]
+
+    gravadas = []
+    falhas = []
+
+    def operador(indice):
+        cliente = _cliente(app)
+        # Metade disputa o mesmo jogo; a outra metade altera jogos diferentes do mesmo campeonato.
+        jogo_id = jogo_ids[0] if indice % 2 == 0 else jogo_ids[indice % len(jogo_ids)]
+        feitas = 0
+        while feitas < ATUALIZACOES:
+            resposta = cliente.post(f'/jogos/{jogo_id}/placar', json={
+                'placar_casa': (indice + feitas) % 5, 'placar_visitante': feitas % 3,
+                'status': 'Finalizado' if feitas % 2 else 'Em Andamento',
+                'versao': _versao(app, jogo_id),
+            })
+            if resposta.status_code == 409:
+                continue
+            if resposta.status_code != 200:
+                falhas.append(resposta.status_code)
+                return
+            gravadas.append(jogo_id)
+            feitas += 1
+
+    operadores = [threading.Thread(target=operador, args=(indice,)) for indice in range(THREADS)]
+    for thread in operadores:
+        thread.start()
+    for thread in operadores:
+        thread.join()
+
+    assert falhas == []
+    with app.app_context():
+        for jogo_id in jogo_ids:
+            assert db.session.get(Jogo, jogo_id).versao == 1 + gravadas.count(jogo_id)
+
+        campeonato = db.session.get(Campeonato, db.session.get(Jogo, jogo_ids[0]).campeonato_id)
+        armazenada = {linha.time_id: {coluna: getattr(linha, coluna) for coluna in standings.COLUNAS}
+                      for linha in Classificacao.query.filter_by(campeonato_id=campeonato.id)}
+        assert armazenada == standings.calcular_tabela(campeonato)
+
+
+def test_versao_desatualizada_recebe_conflito(app_em_arquivo):
+    app = app_em_arquivo
+    cliente = _cliente(app)
+    with app.app_context():
+        jogo_id = Jogo.query.order_by(Jogo.id).first().id
+
+    dados = {'placar_casa': 1, 'placar_visitante': 0, 'status': 'Finalizado', 'versao': 1}
+    assert cliente.post(f'/jogos/{jogo_id}/placar', json=dados).status_code == 200
+    resposta = cliente.post(f'/jogos/{jogo_id}/placar', json=dict(dados, placar_casa=5))
+    assert resposta.status_code == 409
+
+    with app.app_context():
+        jogo = db.session.get(Jogo, jogo_id)
+        assert (jogo.placar_casa, jogo.versao) == (1, 2)
+
+
+def test_leituras_nao_esperam_escrita_aberta(app_em_arquivo):
+    app = app_em_arquivo
+    with app.app_context():
+        assert db.session.execute(db.text('PRAGMA journal_mode')).scalar() == 'wal'
+        campeonato_id = Campeonato.query.first().id
+
+    # Outra conexão segura a escrita durante todas as leituras. Sem WAL, BEGIN EXCLUSIVE bloquearia
+    # os leitores até o busy timeout (SQLITE_BUSY_TIMEOUT_MS).
+    escritor = sqlite3.connect(app.config['CAMINHO'], isolation_level=None)
+    try:
+        escritor.execute('BEGIN EXCLUSIVE')
+        escritor.execute("UPDATE time SET nome = nome || ' (alterado)'")
+        escritor.execute('UPDATE jogo SET placar_casa = 9')
+
+        cliente = app.test_client()
+        for url in (f'/tabelas/{campeonato_id}', '/jogos', '/api/v1/jogos'):
+            inicio = time.perf_counter()
+            resposta = cliente.get(url)
+            corpo = resposta.get_data(as_text=True)
+            assert resposta.status_code == 200
+            assert time.perf_counter() - inicio < LEITURA_MAXIMA
+            assert '(alterado)' not in corpo
+    finally:
+        escritor.execute('ROLLBACK')
+        escritor.close()
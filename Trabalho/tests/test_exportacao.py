@@ -0,0 +1,81 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from app import db, organizacoes, exportacao
+from app.models import Time, Campeonato, Jogo, campeonato_times
+
+
+def _linhas():
+    organizacao_id = organizacoes.atual().id
+    with db.engine.connect() as conn:
+        return {tabela.name: [tuple(linha) for linha in conn.execute(exportacao._consulta(tabela, organizacao_id))]
+                for tabela in exportacao.TABELAS}
+
+
+def _conteudo():
+    # Mesmo conteúdo comparado pelos nomes, independente dos ids.
+    casa, visitante = aliased(Time), aliased(Time)
+    organizacao_id = organizacoes.atual().id
+    jogos = db.session.execute(
+        select(Campeonato.nome, casa.nome, visitante.nome, Jogo.data_hora, Jogo.placar_casa,
+               Jogo.placar_visitante, Jogo.status)
+        .join(Campeonato, Campeonato.id == Jogo.campeonato_id)
+        .join(casa, casa.id == Jogo.time_casa_id)
+        .join(visitante, visitante.id == Jogo.time_visitante_id)
+        .where(Jogo.organizacao_id == organizacao_id)
+    ).all()
+    inscricoes = db.session.execute(
+        select(Campeonato.nome, Time.nome)
+        .join(campeonato_times, campeonato_times.c.campeonato_id == Campeonato.id)
+        .join(Time, Time.id == campeonato_times.c.time_id)
+        .where(Campeonato.organizacao_id == organizacao_id)
+    ).all()
+    return sorted(map(tuple, jogos)), sorted(map(tuple, inscricoes))
+
+
+@pytest.mark.parametrize('formato', exportacao.FORMATOS)
+def test_restaurar_devolve_as_mesmas_linhas(app, popular, tmp_path, formato):
+    popular(campeonatos=2, times=12, jogos=80, usuarios=1, times_por_campeonato=6)
+    antes = _linhas()
+    caminho = tmp_path / f'snapshot.{formato}.zip'
+    exportacao.exportar_para_arquivo(caminho, formato, tamanho_lote=7)
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    manifesto = exportacao.restaurar(caminho, tamanho_lote=7)
+
+    assert manifesto['formato'] == formato
+    assert _linhas() == antes
+    assert all(antes[tabela.name] for tabela in exportacao.TABELAS)
+
+
+def test_restaurar_em_banco_compartilhado_remapeia_ids(app, popular, tmp_path):
+    popular(campeonatos=2, times=12, jogos=80, usuarios=1, times_por_campeonato=6)
+    antes_padrao = _linhas()
+    conteudo = _conteudo()
+    caminho = tmp_path / 'snapshot.zip'
+    exportacao.exportar_para_arquivo(caminho, 'ndjson')
+
+    # A organização padrão só existe implicitamente na base de teste: grava-a para ocupar o id 1.
+    assert organizacoes.criar('padrao', 'SIGTO').id == organizacoes.atual().id
+    outra = organizacoes.criar('outra', 'Outra liga')
+    with organizacoes.ativar(outra.id):
+        exportacao.restaurar(caminho)
+        assert _conteudo() == conteudo
+        ids = {tabela: {linha[0] for linha in linhas} for tabela, linhas in _linhas().items()
+               if tabela != 'campeonato_times'}
+
+    assert _linhas() == antes_padrao
+    for tabela, linhas in antes_padrao.items():
+        if tabela != 'campeonato_times':
+            assert ids[tabela].isdisjoint(linha[0] for linha in linhas)
+
+
+def test_restaurar_recusa_organizacao_com_dados(app, popular, tmp_path):
+    popular(campeonatos=1, times=4, jogos=6, usuarios=1, times_por_campeonato=4)
+    caminho = tmp_path / 'snapshot.zip'
+    exportacao.exportar_para_arquivo(caminho, 'csv')
+
+    with pytest.raises(exportacao.ErroSnapshot):
+        exportacao.restaurar(caminho)
@@ -0,0 +1,104 @@
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+import pytest
+from app import broker, importacao
+from app.models import Campeonato, Jogo, Tarefa
+
+
+def _mandos(rodadas):
+    sequencias = {}
+    for rodada in rodadas:
+        for casa, visitante in rodada:
+            sequencias.setdefault(casa, []).append('C')
+            sequencias.setdefault(visitante, []).append('F')
+    return {time_id: ''.join(sequencia) for time_id, sequencia in sequencias.items()}
+
+
+@pytest.mark.parametrize('quantidade', [2, 3, 4, 5, 6, 7, 10, 15, 20])
+def test_turno_unico(quantidade):
+    time_ids = list(range(1, quantidade + 1))
+    rodadas = importacao.gerar_rodadas(time_ids)
+
+    impar = quantidade % 2
+    assert len(rodadas) == quantidade - 1 + impar
+    for rodada in rodadas:
+        em_campo = [time_id for jogo in rodada for time_id in jogo]
+        assert len(em_campo) == len(set(em_campo)) == quantidade - impar
+
+    confrontos = Counter(frozenset(jogo) for rodada in rodadas for jogo in rodada)
+    assert len(confrontos) == quantidade * (quantidade - 1) // 2
+    assert set(confrontos.values()) == {1}
+
+    for time_id, mandos in _mandos(rodadas).items():
+        assert len(mandos) == quantidade - 1
+        assert abs(mandos.count('C') - mandos.count('F')) <= 1
+        assert not re.search('CCC|FFF', mandos)
+
+
+@pytest.mark.parametrize('quantidade', [4, 5])
+def test_turno_e_returno(quantidade):
+    time_ids = list(range(1, quantidade + 1))
+    turno = importacao.gerar_rodadas(time_ids)
+    rodadas = importacao.gerar_rodadas(time_ids, ida_e_volta=True)
+
+    assert rodadas[:len(turno)] == turno
+    assert rodadas[len(turno):] == [[(visitante, casa) for casa, visitante in rodada] for rodada in turno]
+    mandos = Counter(jogo for rodada in rodadas for jogo in rodada)
+    assert len(mandos) == quantidade * (quantidade - 1)
+    assert set(mandos.values()) == {1}
+    assert all(mando.count('C') == mando.count('F') for mando in _mandos(rodadas).values())
+
+
+def test_folga_com_numero_impar():
+    rodadas = importacao.gerar_rodadas([10, 20, 30, 40, 50])
+    folgas = [({10, 20, 30, 40, 50} - {time_id for jogo in rodada for time_id in jogo}).pop() for rodada in rodadas]
+    assert sorted(folgas) == [10, 20, 30, 40, 50]
+
+
+def test_datas_das_rodadas(popular):
+    popular(campeonatos=1, times=5, jogos=0, usuarios=1, times_por_campeonato=5)
+    campeonato = Campeonato.query.one()
+    inicio = datetime(2030, 3, 2, 16, 0)
+    jogos = importacao.gerar_tabela_de_jogos(campeonato, inicio, intervalo_dias=3, ida_e_volta=True)
+
+    datas = sorted({jogo['data_hora'] for jogo in jogos})
+    assert datas == [inicio + timedelta(days=3 * numero) for numero in range(10)]
+    assert all(jogos_no_dia == 2 for jogos_no_dia in Counter(jogo['data_hora'] for jogo in jogos).values())
+    assert {jogo['campeonato_id'] for jogo in jogos} == {campeonato.id}
+    assert {jogo['status'] for jogo in jogos} == {'Agendado'}
+
+
+def _avisos(campeonato_id):
+    return [evento for _, evento, _ in broker.pendentes([f'{broker.espaco()}campeonato:{campeonato_id}'], None)]
+
+
+def _historicos(campeonato_id):
+    return Tarefa.query.filter_by(tipo='atualizar_historico', chave=f'atualizar_historico:{campeonato_id}').count()
+
+
+def test_comando_gerar_jogos_publica_e_agenda_historico(app, popular):
+    popular(campeonatos=1, times=4, jogos=0, usuarios=1, times_por_campeonato=4)
+    campeonato_id = Campeonato.query.one().id
+
+    resultado = app.test_cli_runner().invoke(args=['gerar-jogos', str(campeonato_id), '--inicio', '2030-03-02 16:00'])
+
+    assert resultado.exit_code == 0, resultado.output
+    assert Jogo.query.count() == 6
+    assert 'novos' in _avisos(campeonato_id)
+    assert _historicos(campeonato_id) == 1
+
+
+def test_comando_import_jogos_publica_e_agenda_historico(app, popular, tmp_path):
+    popular(campeonatos=1, times=4, jogos=0, usuarios=1, times_por_campeonato=4)
+    campeonato = Campeonato.query.one()
+    casa, visitante = sorted(time.nome for time in campeonato.times)[:2]
+    arquivo = tmp_path / 'jogos.csv'
+    arquivo.write_text('campeonato_id,time_casa,time_visitante,data_hora,placar_casa,placar_visitante,status\n'
+                       f'{campeonato.id},{casa},{visitante},2030-03-02T16:00,2,1,Finalizado\n', encoding='utf-8')
+
+    resultado = app.test_cli_runner().invoke(args=['import-jogos', str(arquivo)])
+
+    assert resultado.exit_code == 0, resultado.output
+    assert 'novos' in _avisos(campeonato.id)
+    assert _historicos(campeonato.id) == 1
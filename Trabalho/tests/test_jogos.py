@@ -0,0 +1,80 @@
+import re
+import pytest
+from app import db, cache
+from app.caching import MemoriaBackend
+from app.models import Jogo, Campeonato
+
+PEQUENO = dict(campeonatos=1, times=4, jogos=300, usuarios=1, times_por_campeonato=4)
+GRANDE = dict(campeonatos=4, times=400, jogos=20000, usuarios=1, times_por_campeonato=200)
+
+URLS = (
+    '/jogos',
+    '/jogos?campeonato=1',
+    '/jogos?time={time}',
+    '/jogos?status=Finalizado&de=2024-01-01&ate=2026-12-31',
+)
+
+
+def _proxima_pagina(html):
+    encontrado = re.search(r'href="([^"]*cursor=[^"]*)">Próxima', html)
+    return encontrado.group(1).replace('&amp;', '&') if encontrado else None
+
+
+def _medir(client, consultas, url):
+    consultas.clear()
+    resposta = client.get(url)
+    assert resposta.status_code == 200
+    html = resposta.get_data(as_text=True)
+    return len(consultas), html
+
+
+def _perfil(client, consultas):
+    time = db.session.execute(
+        db.select(Jogo.time_casa_id).group_by(Jogo.time_casa_id).order_by(db.func.count().desc()).limit(1)
+    ).scalar()
+    contagens = {}
+    for modelo in URLS:
+        url = modelo.format(time=time)
+        contagens[modelo], html = _medir(client, consultas, url)
+        proxima = _proxima_pagina(html)
+        assert proxima is not None
+        contagens[modelo + ' (página 2)'], _ = _medir(client, consultas, proxima)
+    return contagens
+
+
+@pytest.mark.parametrize('administrador', [False, True])
+def test_consultas_da_lista_de_jogos_nao_dependem_do_volume(app, client, popular, login, consultas, administrador):
+    contagens = []
+    for quantidades in (PEQUENO, GRANDE):
+        popular(**quantidades)
+        if administrador:
+            login()
+        contagens.append(_perfil(client, consultas))
+    pequeno, grande = contagens
+
+    assert pequeno == grande
+
+
+def test_pagina_traz_no_maximo_um_lote(client, popular, consultas):
+    popular(**GRANDE)
+    _, html = _medir(client, consultas, '/jogos')
+    assert html.count('class="jogo-card"') == 50
+
+
+def test_cursor_invalido(client):
+    assert client.get('/jogos?cursor=invalido').status_code == 400
+
+
+@pytest.mark.parametrize('url', ['/api/v1/jogos/{id}', '/api/v1/jogos', '/jogos'])
+def test_cache_acompanha_renome_do_campeonato(client, popular, monkeypatch, url):
+    popular(**PEQUENO)
+    monkeypatch.setattr(cache, 'backend', MemoriaBackend())
+    jogo = Jogo.query.first()
+    url = url.format(id=jogo.id)
+    assert client.get(url).status_code == 200
+
+    campeonato = db.session.get(Campeonato, jogo.campeonato_id)
+    campeonato.nome = 'Copa Renomeada'
+    db.session.commit()
+    cache.invalidar('campeonatos', f'campeonato:{campeonato.id}')
+    assert 'Copa Renomeada' in client.get(url).get_data(as_text=True)
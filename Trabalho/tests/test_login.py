@@ -0,0 +1,91 @@
+import pytest
+from app import db, seed, limitador
+from app.models import Usuario
+from app.passwords import custo, _gerar
+from app.ratelimit import BaldeMemoria
+
+
+def test_balde_recarrega_com_o_tempo():
+    baldes = BaldeMemoria()
+    regra = {'ip:1': (2, 0.5)}
+
+    assert baldes.consumir(regra, agora=0) == (True, 0)
+    assert baldes.consumir(regra, agora=0) == (True, 0)
+    assert baldes.consumir(regra, agora=0) == (False, 2)
+    assert baldes.consumir(regra, agora=1) == (False, 1)
+    assert baldes.consumir(regra, agora=2) == (True, 0)
+    assert baldes.consumir(regra, agora=100) == (True, 0)
+    assert baldes.consumir(regra, agora=100) == (True, 0)
+    assert baldes.consumir(regra, agora=100)[0] is False
+
+
+def test_balde_que_recusa_nao_gasta_os_outros():
+    baldes = BaldeMemoria()
+    ip, conta = {'ip:1': (1, 0.01)}, {'conta:vitima': (3, 0.01)}
+
+    assert baldes.consumir({**ip, **conta}, agora=0) == (True, 0)
+    for _ in range(10):
+        permitido, espera = baldes.consumir({**ip, **conta}, agora=0)
+        assert not permitido and espera == 100
+
+    # Só a primeira tentativa saiu do balde da conta.
+    assert baldes.consumir(conta, agora=0) == (True, 0)
+    assert baldes.consumir(conta, agora=0) == (True, 0)
+    assert baldes.consumir(conta, agora=0)[0] is False
+
+
+def test_balde_descarta_chaves_antigas():
+    baldes = BaldeMemoria(max_chaves=2)
+    for chave in ('a', 'b', 'c'):
+        baldes.consumir({chave: (1, 0.01)}, agora=0)
+    assert baldes.consumir({'a': (1, 0.01)}, agora=0) == (True, 0)
+    assert baldes.consumir({'c': (1, 0.01)}, agora=0)[0] is False
+
+
+@pytest.fixture
+def limites(app, popular, monkeypatch):
+    popular(campeonatos=1, times=2, jogos=0, usuarios=1, times_por_campeonato=2)
+    monkeypatch.setattr(limitador, 'regras', {'ip': (3, 1), 'conta': (5, 1)})
+    limitador.store.limpar()
+    yield
+    limitador.store.limpar()
+
+
+def _entrar(client, ip, senha):
+    return client.post('/login', data={'email': seed.EMAIL_ADMIN, 'password': senha},
+                       environ_base={'REMOTE_ADDR': ip}).status_code
+
+
+def test_ip_bloqueado_nao_tranca_a_conta_da_vitima(app, limites):
+    atacante = app.test_client()
+    assert [_entrar(atacante, '10.0.0.1', 'errada') for _ in range(20)] == [200] * 3 + [429] * 17
+
+    assert _entrar(app.test_client(), '10.0.0.2', seed.SENHA_PADRAO) == 302
+
+
+def test_conta_limitada_entre_ips(app, limites):
+    codigos = [_entrar(app.test_client(), f'10.0.1.{numero}', 'errada') for numero in range(7)]
+    assert codigos == [200] * 5 + [429] * 2
+
+
+def test_login_refaz_hash_com_custo_antigo(app, client, popular):
+    popular(campeonatos=1, times=2, jogos=0, usuarios=1, times_por_campeonato=2)
+    rounds = app.config['BCRYPT_LOG_ROUNDS']
+    usuario = Usuario.query.filter_by(email=seed.EMAIL_ADMIN).one()
+    usuario.senha_hash = _gerar(seed.SENHA_PADRAO.encode(), rounds + 1, b'2b')
+    db.session.commit()
+    antigo = usuario.senha_hash
+
+    assert client.post('/login', data={'email': seed.EMAIL_ADMIN, 'password': 'errada'}).status_code == 200
+    db.session.expire_all()
+    assert db.session.get(Usuario, usuario.id).senha_hash == antigo
+
+    assert client.post('/login', data={'email': seed.EMAIL_ADMIN, 'password': seed.SENHA_PADRAO}).status_code == 302
+    db.session.expire_all()
+    novo = db.session.get(Usuario, usuario.id).senha_hash
+    assert custo(antigo) == rounds + 1 and custo(novo) == rounds
+
+    client.get('/logout')
+    assert client.post('/login', data={'email': seed.EMAIL_ADMIN, 'password': seed.SENHA_PADRAO}).status_code == 302
+    db.session.expire_all()
+    assert db.session.get(Usuario, usuario.id).senha_hash == novo
@@ -0,0 +1,104 @@
+import os
+from sqlalchemy import select, update, delete, func
+from app import create_app, db, organizacoes, migrations, tenancy, jobs
+from app.jobs import fila
+from app.models import Time, Campeonato, Tarefa
+from conftest import Config
+
+
+def _nomes():
+    return sorted(db.session.execute(select(Time.nome)).scalars())
+
+
+def _criar_times(*nomes):
+    db.session.add_all(Time(nome=nome) for nome in nomes)
+    db.session.commit()
+
+
+def test_organizacoes_nao_veem_nem_alteram_linhas_alheias(app):
+    padrao = organizacoes.criar('padrao', 'SIGTO')
+    outra = organizacoes.criar('outra', 'Outra liga')
+    _criar_times('Azul', 'Verde')
+    with organizacoes.ativar(outra.id):
+        _criar_times('Roxo')
+        roxo_id = Time.query.one().id
+    azul_id = Time.query.filter_by(nome='Azul').one().id
+    db.session.expunge_all()
+
+    assert [time.nome for time in Time.query.order_by(Time.nome)] == ['Azul', 'Verde']
+    assert _nomes() == ['Azul', 'Verde']
+    assert db.session.scalar(select(func.count()).select_from(Time)) == 2
+    assert db.session.get(Time, roxo_id) is None
+
+    with organizacoes.ativar(outra.id):
+        assert _nomes() == ['Roxo']
+        assert db.session.get(Time, azul_id) is None
+        assert Time.query.filter(Time.id == azul_id).first() is None
+
+        assert db.session.execute(update(Time).values(nome=Time.nome + '!')).rowcount == 1
+        assert db.session.execute(update(Time).where(Time.id == azul_id).values(nome='Tomado')).rowcount == 0
+        assert db.session.execute(delete(Time).where(Time.id == azul_id)).rowcount == 0
+        db.session.commit()
+        assert _nomes() == ['Roxo!']
+
+    assert db.session.execute(delete(Time).where(Time.id == roxo_id)).rowcount == 0
+    assert db.session.execute(delete(Time)).rowcount == 2
+    db.session.commit()
+    assert _nomes() == []
+
+    with organizacoes.ativar(outra.id):
+        assert _nomes() == ['Roxo!']
+    todos = db.session.execute(select(Time.nome, Time.organizacao_id).execution_options(todas_organizacoes=True))
+    assert sorted(todos) == [('Roxo!', outra.id)]
+    assert padrao.id != outra.id
+
+
+def test_organizacao_com_banco_proprio(app, tmp_path):
+    organizacoes.criar('padrao', 'SIGTO')
+    url = f"sqlite:///{tmp_path / 'propria.db'}"
+    migrations.upgrade(organizacoes.motores.obter(url))
+    propria = organizacoes.criar('propria', 'Liga própria', banco_url=url)
+
+    _criar_times('Azul')
+    with organizacoes.ativar(propria.id):
+        assert db.engine.url.render_as_string() == url
+        _criar_times('Roxo')
+        db.session.add(Campeonato(nome='Copa'))
+        db.session.commit()
+        assert _nomes() == ['Roxo']
+        db.session.remove()
+
+    assert _nomes() == ['Azul']
+    assert Campeonato.query.count() == 0
+    with organizacoes.motores.obter(url).connect() as conn:
+        assert conn.execute(select(Time.__table__.c.nome)).scalars().all() == ['Roxo']
+
+
+def test_fork_descarta_motores_herdados(app, tmp_path):
+    create_app(Config)
+    organizacoes.motores.obter(f"sqlite:///{tmp_path / 'propria.db'}")
+    assert organizacoes in tenancy._instancias
+
+    leitura, escrita = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(escrita, str(len(organizacoes.motores)).encode())
+        os._exit(0)
+    os.close(escrita)
+    os.waitpid(pid, 0)
+    assert os.read(leitura, 10) == b'0'
+    os.close(leitura)
+    assert len(organizacoes.motores) == 1
+
+
+def test_worker_executa_tarefas_de_outra_organizacao(app, monkeypatch):
+    organizacoes.criar('padrao', 'SIGTO')
+    outra = organizacoes.criar('outra', 'Outra liga')
+    monkeypatch.setattr(fila, 'modo', 'fila')
+    with organizacoes.ativar(outra.id):
+        tarefa_id = fila.enfileirar('atualizar_historico', campeonato_id=1).id
+
+    assert fila._reservar(tarefa_id, 'teste')
+    assert fila.executar(tarefa_id)
+    with organizacoes.ativar(outra.id):
+        assert db.session.get(Tarefa, tarefa_id).status == jobs.CONCLUIDA
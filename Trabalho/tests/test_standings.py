@@ -0,0 +1,92 @@
+from collections import defaultdict
+import pytest
+from sqlalchemy import update
+from app import db, standings
+from app.models import Campeonato, Classificacao
+from app.standings import Pontuacao, PONTUACAO_PADRAO
+
+
+def _linhas(**times):
+    # times: nome -> (pontos, vitorias, saldo_gols, gols_pro, gols_fora)
+    linhas = {}
+    for time_id, (nome, (pontos, vitorias, saldo, gols, fora)) in enumerate(sorted(times.items()), 1):
+        linhas[time_id] = dict(time_id=time_id, nome=nome, pontos=pontos, vitorias=vitorias,
+                               saldo_gols=saldo, gols_pro=gols, fora={'gols_pro': fora})
+    return linhas
+
+
+def _pares(linhas, jogos):
+    ids = {linha['nome']: time_id for time_id, linha in linhas.items()}
+    pares = defaultdict(list)
+    for casa, visitante, placar_casa, placar_visitante in jogos:
+        standings.registrar_confronto(pares, ids[casa], ids[visitante], placar_casa, placar_visitante)
+    return pares
+
+
+EMPATE_TRIPLO = dict(A=(9, 3, 0, 5, 2), B=(9, 3, 0, 5, 2), C=(9, 3, 0, 5, 2), D=(4, 1, -3, 2, 1))
+# Ciclo A > B > C > A: todos com 3 pontos na mini-tabela; B e C empatam no saldo e C marcou mais.
+CICLO = [('A', 'B', 1, 0), ('B', 'C', 2, 0), ('C', 'A', 3, 0), ('D', 'A', 0, 4)]
+
+# X: vitória e derrota; Y: dois empates. Com 3/1/0 X passa Y; com 2/1/0 empatam e Y vence no saldo.
+QUADRANGULAR = dict(W=(7, 2, 0, 4, 1), X=(7, 2, 0, 4, 1), Y=(7, 2, 0, 4, 1), Z=(7, 2, 0, 4, 1))
+CRUZAMENTOS = [('X', 'Z', 1, 0), ('W', 'X', 3, 0), ('Y', 'Z', 1, 1), ('W', 'Y', 2, 2)]
+
+
+@pytest.mark.parametrize('times, jogos, criterios, regra, esperado', [
+    # Empate triplo resolvido pela mini-tabela (pontos, saldo e gols só entre os empatados).
+    (EMPATE_TRIPLO, CICLO, ('confronto_direto',), PONTUACAO_PADRAO, 'CBAD'),
+    # Sem confronto direto o empate vai até o nome.
+    (EMPATE_TRIPLO, CICLO, ('saldo_gols', 'gols_pro'), PONTUACAO_PADRAO, 'ABCD'),
+    # Jogos contra quem não está empatado não entram na mini-tabela.
+    (EMPATE_TRIPLO, CICLO[:3] + [('D', 'C', 0, 9)], ('confronto_direto',), PONTUACAO_PADRAO, 'CBAD'),
+    # A ordem dos critérios decide: saldo antes de gols, ou o contrário.
+    (dict(A=(10, 3, 5, 8, 3), B=(10, 2, 3, 12, 6)), [], ('saldo_gols', 'gols_pro'), PONTUACAO_PADRAO, 'AB'),
+    (dict(A=(10, 3, 5, 8, 3), B=(10, 2, 3, 12, 6)), [], ('gols_pro', 'saldo_gols'), PONTUACAO_PADRAO, 'BA'),
+    (dict(A=(10, 3, 5, 8, 3), B=(10, 2, 3, 12, 6)), [], ('gols_fora', 'vitorias'), PONTUACAO_PADRAO, 'BA'),
+    (dict(A=(10, 3, 5, 8, 3), B=(10, 2, 3, 12, 6)), [], ('vitorias', 'gols_fora'), PONTUACAO_PADRAO, 'AB'),
+    # Confronto direto empatado passa ao critério seguinte.
+    (dict(A=(6, 2, 1, 5, 1), B=(6, 2, 1, 5, 4)), [('A', 'B', 1, 1)], ('confronto_direto', 'gols_fora'),
+     PONTUACAO_PADRAO, 'BA'),
+    # Pontos sempre vêm antes dos critérios.
+    (dict(A=(5, 1, 9, 9, 9), B=(6, 2, 0, 1, 0)), [('A', 'B', 5, 0)], ('confronto_direto',), PONTUACAO_PADRAO, 'BA'),
+    # A pontuação do campeonato vale também na mini-tabela.
+    (QUADRANGULAR, CRUZAMENTOS, ('confronto_direto',), PONTUACAO_PADRAO, 'WXYZ'),
+    (QUADRANGULAR, CRUZAMENTOS, ('confronto_direto',), Pontuacao(2, 1, 0), 'WYXZ'),
+])
+def test_ordenar(times, jogos, criterios, regra, esperado):
+    linhas = _linhas(**times)
+    ordem = standings.ordenar(linhas, criterios, _pares(linhas, jogos), regra)
+    assert ''.join(linha['nome'] for linha in ordem) == esperado
+
+
+def test_ordenar_so_carrega_confrontos_com_empate():
+    carregados = []
+
+    def pares():
+        carregados.append(True)
+        return {}
+
+    linhas = _linhas(A=(3, 1, 1, 1, 0), B=(0, 0, -1, 0, 0))
+    standings.ordenar(linhas, ('confronto_direto',), pares)
+    assert not carregados
+
+    linhas = _linhas(A=(3, 1, 1, 1, 0), B=(3, 1, 1, 1, 0), C=(3, 1, 1, 1, 0))
+    standings.ordenar(linhas, ('confronto_direto',), pares)
+    assert carregados == [True]
+
+
+@pytest.mark.parametrize('criterios', ['saldo_gols,gols_pro', 'vitorias, gols_pro', 'gols_fora',
+                                       'confronto_direto, saldo_gols'])
+def test_tabela_serializada_segue_ordenar(app, popular, criterios):
+    popular(campeonatos=2, times=10, jogos=60, usuarios=1, times_por_campeonato=5)
+    # Empata pontos e saldo de todos para que os critérios seguintes (e o nome) decidam.
+    db.session.execute(update(Classificacao).values(pontos=10, saldo_gols=0))
+    for campeonato in Campeonato.query:
+        campeonato.criterios_desempate = criterios
+        db.session.commit()
+
+        tabela = standings.tabela_serializada(campeonato.id)
+        linhas = {linha['time_id']: linha for linha in tabela}
+        esperado = standings.ordenar(linhas, standings.criterios(campeonato),
+                                     standings.confrontos(campeonato.id), standings.pontuacao(campeonato))
+        assert [linha['time_id'] for linha in tabela] == [linha['time_id'] for linha in esperado]